@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compare the single-pass block scanner with the original regex-based one.
+
+Usage:
+
+    python benchmarks/blocks.py [input ...]
+
+Without arguments, examples/nenv.inp is used. Each input is checked with both
+'\\n' and '\\r\\n' new-lines.
+"""
+
+import sys
+from os import path
+from timeit import repeat
+
+root = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, root)
+
+from mip.blocks import get_block_positions, get_block_positions_re
+
+
+def best(f, txt, number=20):
+    """
+    Return the best time of one call f(txt), in seconds.
+    """
+    return min(repeat(lambda: f(txt), number=number, repeat=5)) / number
+
+
+if __name__ == '__main__':
+    fnames = sys.argv[1:] or [path.join(root, 'examples', 'nenv.inp')]
+    for fname in fnames:
+        txt = open(fname, 'r').read()
+        for nl in ('\n', '\r\n'):
+            t = txt.replace('\n', nl)
+            if get_block_positions(t) != get_block_positions_re(t):
+                print 'Results differ for', fname, repr(nl)
+            t1 = best(get_block_positions_re, t)
+            t2 = best(get_block_positions, t)
+            print '{:30s} {:6s} regex: {:8.3f} ms  single-pass: {:8.3f} ms  '\
+                  'speedup: {:5.1f}'.format(path.basename(fname), repr(nl),
+                                            t1*1e3, t2*1e3, t1/t2)
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compare the built-in geometry parser with the tatsu-based one.
+
+Usage:
+
+    python benchmarks/parsegeom.py [input ...]
+
+Without arguments, examples/env.inp is used. Requires tatsu.
+"""
+
+import sys
+from os import path
+from time import time
+
+root = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, root)
+
+from mip import MIP
+from geom.parsegeom import get_ast, get_ast_tatsu
+
+
+def parse_all(f, geoms):
+    """
+    Return list of parsed geometries and time needed, in seconds.
+    """
+    t = time()
+    res = map(f, geoms)
+    return res, time() - t
+
+
+if __name__ == '__main__':
+    fnames = sys.argv[1:] or [path.join(root, 'examples', 'env.inp')]
+    for fname in fnames:
+        i = MIP(fname)
+        geoms = []
+        for c in i.cards(blocks='c', skipcomments=True):
+            geoms.append(c.parts()[2])
+        r1, t1 = parse_all(get_ast_tatsu, geoms)
+        r2, t2 = parse_all(get_ast, geoms)
+        if r1 != r2:
+            print 'Results differ for', fname
+        print '{:20s} {:6d} cells  tatsu: {:8.3f} s  built-in: {:8.3f} s  '\
+              'speedup: {:6.1f}'.format(path.basename(fname), len(geoms),
+                                        t1, t2, t1/t2)
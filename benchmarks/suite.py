@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Time the parsing stages on the example decks and on synthetic decks.
+
+Usage:
+
+    python benchmarks/suite.py [-o result.json] [--sizes 1000,1000000]
+                               [--repeat 3] [--compare old.json] [input ...]
+
+Without inputs, the env, nenv, fmr and bp decks from examples/ are used.
+Synthetic decks with the given numbers of cards (1/3 cells, 1/3 surfaces and
+1/3 data cards) are generated in a temporary directory.
+
+Stages are get_block_positions, get_cards, Card.content, cellcard.split,
+surfacecard.split, parsegeom.get_ast and forcad.translate (surface types
+unknown to forcad are skipped). The best of `repeat` runs is taken; decks
+with more than 10^5 cards are timed once.
+
+The result is written as JSON to stdout or to the -o file. With --compare,
+the ratio new/old of each stage time is printed for decks present in both
+results.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+from os import path
+from time import time
+
+root = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, path.join(root, 'geom'))
+
+from mip import __version__
+from mip.blocks import get_block_positions
+from mip.cards import get_cards
+from mip.main import Card
+from mip import cellcard, surfacecard
+from parsegeom import get_ast
+from main import extract
+from forcad import translate, mcnp2cad
+
+examples = ['env.inp', 'nenv.inp', 'fmr.inp', 'bp.inp', 'bp.gq.inp',
+            'bp.nogq.inp']
+
+# Surfaces of synthetic decks. The first parameter is shifted for each card.
+_surfaces = [('so', '5'), ('px', '1'), ('cz', '2'), ('c/x', '1 2 3'),
+             ('k/y', '1 2 3 0.25 1'), ('s', '1 2 3 4'), ('p', '1 1 1 4'),
+             ('tz', '1 2 3 10 2 2')]
+
+
+def synthetic(fname, n):
+    """
+    Write deck with about `n` cards to `fname`.
+    """
+    k = max(n // 3, 1)
+    with open(fname, 'w') as f:
+        f.write('synthetic deck, {} cards\n'.format(3 * k))
+        for j in range(1, k + 1):
+            s = j % (k - 2) + 1 if k > 3 else 1
+            if j % 10 == 0:
+                f.write('c cell {}\n'.format(j))
+            mat = '{} -1.0'.format(j % 5) if j % 5 else '0'
+            # complement of the previous cell
+            compl = ' #{}'.format(j - 1) if j > 1 else ''
+            f.write('{} {} -{} {} ({}:-{}){}\n'.format(
+                j, mat, s, s + 1, s + 2, s, compl))
+            f.write('     imp:n=1 $ comment\n')
+        f.write('\n')
+        for j in range(1, k + 1):
+            t, pars = _surfaces[j % len(_surfaces)]
+            tr = ' {}'.format(j % 10 + 1) if j % 7 == 0 else ''
+            p1, pars = (pars + ' ').split(' ', 1)
+            f.write('{}{} {} {:.3f} {}\n'.format(j, tr, t,
+                                                float(p1) + 0.1 * (j % 13),
+                                                pars))
+        f.write('\n')
+        for j in range(1, k + 1):
+            if j <= 10:
+                f.write('tr{} {} 0 0\n'.format(j, j))
+            else:
+                f.write('m{} 1001.80c 2 8016.80c 1\n'.format(j))
+    return
+
+
+def best(f, setup, runs):
+    """
+    Return result of f(setup()) and the best time of `runs` calls. setup()
+    is not timed.
+    """
+    t = None
+    for r in range(runs):
+        a = setup()
+        t0 = time()
+        res = f(a)
+        dt = time() - t0
+        t = dt if t is None else min(t, dt)
+    return res, t
+
+
+def run(fname, repeat=3):
+    """
+    Return dictionary with stage timings for the deck `fname`.
+    """
+    text = open(fname, 'r').read()
+    res = {'bytes': len(text)}
+    stages = res['stages'] = {}
+
+    def add(stage, count, t, nbytes=0):
+        stages[stage] = {'count': count, 'seconds': t, 'bytes': nbytes,
+                         'per_item_us': 1e6 * t / count if count else 0.0}
+
+    bi, t = best(get_block_positions, lambda: text, repeat)
+    add('get_block_positions', 1, t, len(text))
+    runs = repeat
+
+    def split(a):
+        res = {}
+        for b in 'csd':
+            if b in bi:
+                (i1, i2), n = bi[b]
+                res[b] = [l for l, _, tp in get_cards(text[i1:i2], True)
+                          if tp == 'card']
+        return res
+
+    blocks, t = best(split, lambda: None, runs)
+    n = sum(len(v) for v in blocks.values())
+    res['cards'] = n
+    if n > 1e5:
+        runs = 1
+    add('get_cards', n, t, sum(i2 - i1 for (i1, i2), l in bi.values()))
+
+    cards = [(b, l) for b in 'csd' for l in blocks.get(b, ())]
+    contents, t = best(lambda cs: [c.content() for c in cs],
+                       lambda: [Card(l, type=b) for b, l in cards], runs)
+    add('Card.content', n, t, sum(map(len, contents)))
+    nc = len(blocks.get('c', ()))
+    ns = len(blocks.get('s', ()))
+    cc = contents[:nc]
+    sc = contents[nc:nc + ns]
+
+    parts, t = best(lambda cs: map(cellcard.split, cs), lambda: cc, runs)
+    add('cellcard.split', nc, t, sum(map(len, cc)))
+    r, t = best(lambda cs: map(surfacecard.split, cs), lambda: sc, runs)
+    add('surfacecard.split', ns, t, sum(map(len, sc)))
+
+    geoms = [p[2] for p in parts]
+    r, t = best(lambda gs: map(get_ast, gs), lambda: geoms, runs)
+    add('parsegeom.get_ast', nc, t, sum(map(len, geoms)))
+
+    from mip import MIP
+    d = extract(MIP(fname))
+    surfs = d['surfaces'].__class__(
+        (k, v) for k, v in d['surfaces'].items() if v[2] in mcnp2cad)
+    # translate() prints diagnostics for some surface types
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        r, t = best(lambda a: translate(*a),
+                    lambda: (surfs, d['transforms']), runs)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    add('forcad.translate', len(surfs), t)
+    res['skipped_surfaces'] = len(d['surfaces']) - len(surfs)
+    return res
+
+
+def compare(new, old):
+    """
+    Print ratios new/old of stage times.
+    """
+    for deck, r in sorted(new['decks'].items()):
+        if deck not in old['decks']:
+            continue
+        o = old['decks'][deck]['stages']
+        for stage, s in sorted(r['stages'].items()):
+            if stage in o and o[stage]['seconds'] > 0:
+                print '{:20s} {:20s} {:10.4f} s {:6.2f}'.format(
+                    deck, stage, s['seconds'],
+                    s['seconds'] / o[stage]['seconds'])
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    ap.add_argument('inputs', nargs='*')
+    ap.add_argument('-o', '--output')
+    ap.add_argument('--sizes', default='1000,10000,100000,1000000')
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--compare')
+    args = ap.parse_args()
+
+    fnames = args.inputs or [path.join(root, 'examples', e) for e in examples]
+    result = {'version': __version__,
+              'python': platform.python_version(),
+              'platform': platform.platform(),
+              'date': datetime.now().isoformat(),
+              'decks': {}}
+    for fname in fnames:
+        result['decks'][path.basename(fname)] = run(fname, args.repeat)
+    tmp = tempfile.mkdtemp()
+    try:
+        for n in filter(None, args.sizes.split(',')):
+            n = int(float(n))
+            fname = path.join(tmp, 'synthetic{}.inp'.format(n))
+            synthetic(fname, n)
+            result['decks'][path.basename(fname)] = run(fname, args.repeat)
+            os.remove(fname)
+    finally:
+        shutil.rmtree(tmp)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=1, sort_keys=True)
+    else:
+        json.dump(result, sys.stdout, indent=1, sort_keys=True)
+        print
+    if args.compare:
+        compare(result, json.load(open(args.compare)))
@@ -0,0 +1,444 @@
+"""
+Bounding boxes of cells.
+
+A box is the pair of arrays (lo, hi) with the minimal and maximal x, y and z
+coordinates. Unbounded directions have infinite limits, empty regions have
+lo > hi.
+
+Boxes of the regions with negative and positive sense with respect to each
+surface are found analytically, in the surface's local coordinate system (see
+quadrics.py):
+
+* Half-spaces of planes normal to a coordinate axis are bounded along this
+  axis. Other planes are kept as linear constraints, see below.
+
+* Inside of spheres, ellipsoids, cylinders and other quadrics with positive
+  semi-definite quadratic part, the region is
+
+    (x - x0)^T A (x - x0) <= r,
+
+  and its extent along axis k is x0_k +- sqrt(r A+_kk), where A+ is the
+  pseudo-inverse of A. The extent is infinite, if the axis is not normal to
+  the null space of A (e.g. along the cylinder axis).
+
+* Inside of one-sheet cones is bounded by the apex along the cone axis. Other
+  regions with indefinite or negative semi-definite quadratic part are not
+  bounded.
+
+* Inside of tori is bounded by the major and minor radii.
+
+* Only paraboloids (general quadrics with positive semi-definite quadratic
+  part and linear term not in its range) are bounded numerically, with
+  scipy.optimize. Without scipy, or with optimize=False, they are considered
+  unbounded.
+
+The box of a transformed surface is transformed to the main system with
+interval arithmetic. Boxes of surfaces are combined according to the cell
+geometry (see rpn.py): intersection of boxes for intersection of regions, and
+union for union. Linear constraints of planes are accumulated in
+intersections and used to tighten their box, by interval constraint
+propagation, and, if the box remains infinite, from vertices of the polytope.
+Resulting boxes are not smaller than the cells, but can be larger.
+
+Boxes of many cells can be computed in a pool of processes, see get_boxes().
+"""
+
+from collections import OrderedDict
+from multiprocessing import Pool
+
+import numpy as np
+
+from points import get_rpn, get_shapes
+from rpn import SURF, CELL, AND
+
+_inf = float('inf')
+
+# Relative tolerance to detect zero eigenvalues and matrix elements
+_eps = 1e-10
+
+# Coordinate limit for numerical optimization. Larger results are considered
+# infinite.
+_limit = 1e9
+
+
+def unbounded():
+    return np.array((-_inf,)*3), np.array((_inf,)*3)
+
+
+def empty():
+    return np.array((_inf,)*3), np.array((-_inf,)*3)
+
+
+def is_empty(box):
+    return (box[0] > box[1]).any()
+
+
+def is_finite(box):
+    return np.isfinite(box[0]).all() and np.isfinite(box[1]).all()
+
+
+def _optimize(Q):
+    """
+    Return box of the convex region x Q x <= 0, found numerically. Without
+    scipy, the region is considered unbounded.
+    """
+    try:
+        from scipy.optimize import minimize
+    except ImportError:
+        return unbounded()
+    A = Q[:3, :3]
+    b = 2 * Q[:3, 3]
+    c = Q[3, 3]
+    cons = {'type': 'ineq',
+            'fun': lambda x: -(x.dot(A).dot(x) + b.dot(x) + c),
+            'jac': lambda x: -(2 * A.dot(x) + b)}
+    lo, hi = unbounded()
+    for k in range(3):
+        for s, lim in ((1.0, lo), (-1.0, hi)):
+            e = np.zeros(3)
+            e[k] = s
+            r = minimize(lambda x: e.dot(x), np.zeros(3), jac=lambda x: e,
+                         bounds=((-_limit, _limit), )*3, constraints=cons,
+                         method='SLSQP')
+            if r.success and abs(r.x[k]) < 0.99 * _limit:
+                lim[k] = r.x[k]
+    return lo, hi
+
+
+def quadric_region(Q, optimize=True):
+    """
+    Return box and linear constraints of the region x Q x <= 0.
+
+    Linear constraints are returned as array N of shape (m, 3) and array d of
+    length m, meaning N x <= d. They are returned only for planes not normal
+    to a coordinate axis; otherwise m = 0.
+
+    Paraboloids are bounded with _optimize() only if `optimize` is True.
+    """
+    A = Q[:3, :3]
+    b = 2 * Q[:3, 3]
+    c = Q[3, 3]
+    lo, hi = unbounded()
+    N = np.zeros((0, 3))
+    d = np.zeros(0)
+    if not A.any():
+        # Half-space b x <= -c
+        nz = np.abs(b) > _eps * np.abs(b).max()
+        if not b.any():
+            return (unbounded() if c <= 0 else empty()), N, d
+        if nz.sum() == 1:
+            k = nz.argmax()
+            if b[k] > 0:
+                hi[k] = -c / b[k]
+            else:
+                lo[k] = -c / b[k]
+            return (lo, hi), N, d
+        return (lo, hi), b.reshape(1, 3), np.array((-c, ))
+
+    w, V = np.linalg.eigh(A)
+    tol = _eps * np.abs(w).max()
+    if w[0] < -tol:
+        # Indefinite or negative semi-definite: the region contains lines in
+        # all directions.
+        return (lo, hi), N, d
+    rng = w > tol
+    Vr = V[:, rng]
+    Vn = V[:, ~rng]
+    if Vn.size and (np.abs(Vn.T.dot(b)) > _eps * np.abs(b).max()).any():
+        # Paraboloid
+        return (_optimize(Q) if optimize else unbounded()), N, d
+    Ap = (Vr / w[rng]).dot(Vr.T)
+    x0 = -0.5 * Ap.dot(b)
+    r = -(c + 0.5 * b.dot(x0))
+    if r < 0:
+        return empty(), N, d
+    bounded = (np.abs(Vn) < _eps).all(axis=1)
+    h = np.sqrt(r * Ap.diagonal())
+    lo[bounded] = (x0 - h)[bounded]
+    hi[bounded] = (x0 + h)[bounded]
+    return (lo, hi), N, d
+
+
+def transform_box(box, o, R):
+    """
+    Return box in the main system for the box given in the local system of
+    the transformation (o, R), see quadrics.py.
+    """
+    lo, hi = box
+    if is_empty(box):
+        return empty()
+    M = R.T.copy()
+    M[np.abs(M) < _eps] = 0.0
+    with np.errstate(invalid='ignore'):
+        a = M * lo
+        b = M * hi
+    a[M == 0] = 0.0
+    b[M == 0] = 0.0
+    return o + np.minimum(a, b).sum(axis=1), o + np.maximum(a, b).sum(axis=1)
+
+
+def shape_regions(shape, optimize=True):
+    """
+    Return boxes and linear constraints, in the main system, of the regions
+    with negative and positive sense with respect to `shape`, an instance of
+    quadrics.Shape.
+
+    Each region is returned as tuple (lo, hi, N, d), see quadric_region().
+    """
+    res = []
+    if shape.torus is not None:
+        k, v, A, B, C = shape.torus
+        h = np.array((A + C, )*3, dtype=float)
+        h[k] = B
+        regions = [((v - h, v + h), np.zeros((0, 3)), np.zeros(0)),
+                   (unbounded(), np.zeros((0, 3)), np.zeros(0))]
+    else:
+        regions = [quadric_region(shape.Q, optimize),
+                   quadric_region(-shape.Q, optimize)]
+        if shape.sheet is not None:
+            # One-sheet cones: only the negative region is bounded by apex
+            k, a0, s = shape.sheet
+            lo, hi = regions[0][0]
+            if s > 0:
+                lo[k] = max(lo[k], a0)
+            else:
+                hi[k] = min(hi[k], a0)
+            regions[1] = (unbounded(), ) + regions[1][1:]
+    for box, N, d in regions:
+        if shape.o is not None:
+            box = transform_box(box, shape.o, shape.R)
+            # local = R (x - o)
+            N = N.dot(shape.R)
+            d = d + N.dot(shape.o)
+        res.append((box[0], box[1], N, d))
+    return tuple(res)
+
+
+def propagate(lo, hi, N, d, passes=20):
+    """
+    Tighten box (lo, hi) in place using linear constraints N x <= d.
+    """
+    if len(d) == 0 or (lo > hi).any():
+        return
+    nz = N != 0
+    for i in range(passes):
+        with np.errstate(invalid='ignore'):
+            t = np.minimum(N * lo, N * hi)
+        t[~nz] = 0.0
+        ninf = np.isinf(t).sum(axis=1)
+        sfin = np.where(np.isinf(t), 0.0, t).sum(axis=1)
+        # Minimum of the constraint's terms, except the k-th one
+        other = np.where(np.isinf(t),
+                         np.where(ninf[:, None] == 1, sfin[:, None], -_inf),
+                         np.where(ninf[:, None] == 0, (sfin[:, None] - t),
+                                  -_inf))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            lim = (d[:, None] - other) / N
+        upper = np.where(nz & (N > 0), lim, _inf).min(axis=0)
+        lower = np.where(nz & (N < 0), lim, -_inf).max(axis=0)
+        nhi = np.minimum(hi, upper)
+        nlo = np.maximum(lo, lower)
+        changed = not (np.allclose(nhi, hi, _eps, _eps) and
+                       np.allclose(nlo, lo, _eps, _eps))
+        hi[:] = nhi
+        lo[:] = nlo
+        if (lo > hi).any():
+            lo[:], hi[:] = empty()
+            return
+        if not changed:
+            return
+    return
+
+
+class Boxes(object):
+    """
+    Computes bounding boxes of cells.
+
+    `cells` is the dictionary of cells with geometry parsed to tree (see
+    main.get_geom()) or to RPN. `surfaces` and `transforms` are dictionaries
+    as returned by surfaces.get_surfaces() and transforms.get_transforms().
+
+    Regions of surfaces are computed once and reused for all cells.
+    """
+    def __init__(self, cells, surfaces, transforms, optimize=True):
+        self.cells = get_rpn(cells)
+        used = set()
+        for g in self.cells.values():
+            used.update(g.surfaces())
+        self.shapes = get_shapes(surfaces, transforms, used)
+        self.optimize = optimize
+        self.regions = {}
+        self.boxes = {}
+        return
+
+    def region(self, s):
+        """
+        Return tuple (lo, hi, N, d) of the region with negative (s < 0) or
+        positive sense with respect to surface abs(s).
+        """
+        n = abs(s)
+        if n not in self.regions:
+            self.regions[n] = shape_regions(self.shapes[n], self.optimize)
+        return self.regions[n][0 if s < 0 else 1]
+
+    def box(self, name, stack=()):
+        """
+        Return box of cell `name`.
+        """
+        if name in self.boxes:
+            return self.boxes[name]
+        if name in stack:
+            raise ValueError('Circular reference to cell {}'.format(name))
+        stack = stack + (name, )
+        # Stack elements are lists [lo, hi, N list, d list]. Constraints are
+        # applied to the box when the element is used in union, or at the end.
+        st = []
+        for o, i in zip(self.cells[name].ops, self.cells[name].ids):
+            if o == SURF:
+                lo, hi, N, d = self.region(i)
+                st.append([lo.copy(), hi.copy(), [N], [d]])
+            elif o == CELL:
+                if i < 0 and -i in self.cells:
+                    lo, hi = self.box(-i, stack)
+                else:
+                    # complement of a cell, or unknown cell
+                    lo, hi = unbounded()
+                st.append([lo.copy(), hi.copy(), [], []])
+            else:
+                r = st.pop()
+                l = st.pop()
+                if o == AND:
+                    l[0] = np.maximum(l[0], r[0])
+                    l[1] = np.minimum(l[1], r[1])
+                    l[2].extend(r[2])
+                    l[3].extend(r[3])
+                else:
+                    for e in (l, r):
+                        _apply(e)
+                    l[0] = np.minimum(l[0], r[0])
+                    l[1] = np.maximum(l[1], r[1])
+                st.append(l)
+        e = st[0]
+        _apply(e)
+        res = (e[0], e[1])
+        if is_empty(res):
+            res = empty()
+        self.boxes[name] = res
+        return res
+
+    def all(self, names=None):
+        """
+        Return dictionary of boxes for cells in `names`, or for all cells.
+        """
+        if names is None:
+            names = self.cells.keys()
+        res = OrderedDict()
+        for c in names:
+            res[c] = self.box(c)
+        return res
+
+
+def polytope(lo, hi, N, d, maxplanes=40):
+    """
+    Tighten box (lo, hi) in place to the box of its intersection with the
+    polytope N x <= d, found from the polytope vertices.
+
+    Infinite box limits are replaced by artificial planes at +-_limit. If the
+    intersection has vertices on them, or there are more than `maxplanes`
+    planes, the box is not changed.
+    """
+    if len(d) == 0 or len(d) > maxplanes or (lo > hi).any():
+        return
+    E = np.vstack((np.eye(3), -np.eye(3)))
+    b = np.hstack((np.where(np.isinf(hi), _limit, hi),
+                   np.where(np.isinf(lo), _limit, -lo)))
+    N = np.vstack((N, E))
+    d = np.hstack((d, b))
+    # All triples of planes
+    m = len(d)
+    i, j, k = np.array([(i, j, k) for i in range(m) for j in range(i + 1, m)
+                        for k in range(j + 1, m)]).T
+    A = np.stack((N[i], N[j], N[k]), axis=1)
+    good = abs(np.linalg.det(A)) > _eps * (abs(A).max(axis=(1, 2))**3)
+    A = A[good]
+    rhs = np.stack((d[i], d[j], d[k]), axis=1)[good]
+    if len(A) == 0:
+        return
+    v = np.linalg.solve(A, rhs[:, :, np.newaxis])[:, :, 0]
+    tol = 1e-7 * (1 + abs(d))
+    v = v[(v.dot(N.T) <= d + tol).all(axis=1)]
+    if len(v) == 0:
+        lo[:], hi[:] = empty()
+        return
+    if (abs(v) >= _limit * (1 - 1e-7)).any():
+        return
+    lo[:] = np.maximum(lo, v.min(axis=0))
+    hi[:] = np.minimum(hi, v.max(axis=0))
+    return
+
+
+def _apply(e):
+    """
+    Apply linear constraints to the box of stack element e.
+    """
+    N = [n for n in e[2] if len(n)]
+    if N:
+        N = np.vstack(N)
+        d = np.hstack(e[3])
+        propagate(e[0], e[1], N, d)
+        if not (np.isfinite(e[0]).all() and np.isfinite(e[1]).all()):
+            polytope(e[0], e[1], N, d)
+    del e[2][:]
+    del e[3][:]
+
+
+# Boxes instance used by _boxes(). In worker processes it is set by _init().
+_engine = None
+
+
+def _init(cells, surfaces, transforms, optimize):
+    global _engine
+    _engine = Boxes(cells, surfaces, transforms, optimize)
+
+
+def _boxes(names):
+    return _engine.all(names).items()
+
+
+def get_boxes(cells, surfaces, transforms, names=None, optimize=True,
+              workers=None):
+    """
+    Return dictionary of cell bounding boxes. See Boxes.
+
+    If `workers` is greater than 1, cells are processed in chunks in a pool
+    of `workers` processes. Each process computes the regions of surfaces it
+    needs once.
+    """
+    if not workers > 1:
+        return Boxes(cells, surfaces, transforms, optimize).all(names)
+    if names is None:
+        names = cells.keys()
+    # Several chunks per worker, to balance their load
+    n = len(names) // (4 * workers) + 1
+    chunks = [names[j:j+n] for j in range(0, len(names), n)]
+    pool = Pool(workers, _init, (cells, surfaces, transforms, optimize))
+    try:
+        results = pool.map(_boxes, chunks)
+    finally:
+        pool.close()
+        pool.join()
+    res = OrderedDict()
+    for r in results:
+        res.update(r)
+    return res
+
+
+def union(boxes):
+    """
+    Return union of boxes.
+    """
+    lo, hi = empty()
+    for b in boxes:
+        lo = np.minimum(lo, b[0])
+        hi = np.maximum(hi, b[1])
+    return lo, hi
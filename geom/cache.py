@@ -0,0 +1,129 @@
+"""
+On-disk cache of parsed input files.
+
+Results of parsing an input file are pickled to files in the cache directory.
+The input entry is named by the hash of the input file content and the package
+version, result entries -- by the hash of the input entry name and of the
+arguments that influence the result (e.g. `lim`). Thus, cache entries become
+invalid as soon as the input file or the package changes.
+
+Entries are dictionaries. The input entry can contain the following items:
+
+    'bi'    -- block positions, see mip.blocks.get_block_positions()
+    'index' -- positions of cards, see mip.index.CardIndex
+    'cards' -- card splits, see mip.MIP.preset()
+
+A result entry can contain:
+
+    'raw'   -- cells, surfaces and transforms returned by main.get_raw_geom()
+    'geom'  -- cells, surfaces and transforms returned by main.get_geom()
+"""
+
+import os
+from os import path
+import hashlib
+import cPickle as pickle
+
+from mip import __version__, MIP
+
+
+def get_text(i):
+    """
+    Return content of the input file. `i` is either the file name, or an
+    instance of mip.MIP.
+    """
+    if isinstance(i, str):
+        return open(i, 'rb').read()
+    return i.text
+
+
+class ParseCache(object):
+    """
+    Directory with pickled results of input file parsing.
+    """
+    def __init__(self, cachedir):
+        self.cachedir = cachedir
+        if not path.isdir(cachedir):
+            os.makedirs(cachedir)
+        return
+
+    def keys(self, i, *args):
+        """
+        Return keys (cache file names) of the input entry for input `i`, and of
+        the result entry for arguments `args`. The input text is hashed once.
+        """
+        h = hashlib.sha1()
+        h.update(__version__)
+        h.update(get_text(i))
+        ikey = h.hexdigest()
+        key = hashlib.sha1(ikey + repr(args)).hexdigest()
+        return (path.join(self.cachedir, ikey + '.pickle'),
+                path.join(self.cachedir, key + '.pickle'))
+
+    def load(self, key):
+        """
+        Return cache entry. If there is no entry, or it cannot be read, an
+        empty dictionary is returned.
+        """
+        if not path.exists(key):
+            return {}
+        try:
+            with open(key, 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            # A broken or incompatible entry is the same as no entry.
+            return {}
+
+    def dump(self, key, entry):
+        """
+        Write cache entry.
+        """
+        # Write to a temporary file first, to avoid broken entries when
+        # several processes write the same entry.
+        tmp = '{}.{}'.format(key, os.getpid())
+        with open(tmp, 'wb') as f:
+            pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+        if path.exists(key):
+            os.remove(key)
+        os.rename(tmp, key)
+        return
+
+    def update(self, key, **items):
+        """
+        Add items to the cache entry.
+        """
+        entry = self.load(key)
+        entry.update(items)
+        self.dump(key, entry)
+        return
+
+    def update_input(self, key, i, splits=()):
+        """
+        Store block and card positions of the input `i` and card `splits` in
+        the input entry, if `i` is an instance of mip.MIP. The entry is
+        written only if it has no card positions yet, or less card splits.
+        """
+        if not isinstance(i, MIP):
+            return
+        entry = self.load(key)
+        if 'index' in entry and len(splits) <= len(entry.get('cards', ())):
+            return
+        entry['bi'] = i.bi
+        entry['index'] = i.index()
+        if len(splits) > len(entry.get('cards', ())):
+            entry['cards'] = splits
+        self.dump(key, entry)
+        return
+
+    def restore(self, i, entry):
+        """
+        Set card positions and splits of the input `i` from the input entry,
+        if `i` is an instance of mip.MIP.
+        """
+        if not isinstance(i, MIP):
+            return
+        if 'index' in entry and i._index is None:
+            i._index = entry['index']
+        if 'cards' in entry:
+            i.preset(entry['cards'])
+        return
@@ -1,5 +1,15 @@
 # return dictionary describing cells
 from collections import OrderedDict
+import re
+
+# Tokens of cell options: entries in parentheses, equal signs and other words
+re_token = re.compile(r'\([^)]*\)|=|[^\s=()]+')
+# Option keywords, with optional particle designators, e.g. imp:n,p or *fill
+re_keyword = re.compile(r'^\*?[a-z][a-z0-9]*(:[a-z,*#|]+)?$', re.IGNORECASE)
+# Jumps and repeats (j, 2j, r, 3r) are entries, not keywords
+re_entry = re.compile(r'^\d*[jr]$', re.IGNORECASE)
+# Geometry part of "like n but" cells, see mip.cellcard.split()
+re_like = re.compile(r'^\s*like\s+(\d+)\s+but\s*$', re.IGNORECASE)
 
 
 def get_cells(input, lim=None):
@@ -9,15 +19,157 @@ def get_cells(input, lim=None):
     d = OrderedDict()
     n = 0
     for c in input.cards(blocks='c', skipcomments=True):
-        name, mat, geom, opts = c.parts()
-        name = int(name)
-        d[name] = (mat, geom, opts)
+        name, v = get_cell(c)
+        d[name] = v
         n += 1
         if lim and n > lim:
             break
     return d
 
 
+def get_cell(c):
+    """
+    Return name and (material, geometry, options) tuple for cell card c.
+    """
+    name, mat, geom, opts = c.parts()
+    return int(name), (mat, geom, opts)
+
+
+def parse_options(s):
+    """
+    Return ordered dictionary of cell options in the string s (the options
+    part of get_cell()). Keys are lower-case keywords, e.g. 'imp:n', 'u',
+    'fill' or '*trcl', values are lists of entries. Entries in parentheses,
+    e.g. fill transformations, are kept as one string with the parentheses.
+    """
+    d = OrderedDict()
+    v = None
+    for t in re_token.findall(s):
+        if t == '=':
+            continue
+        if re_keyword.match(t) and not re_entry.match(t):
+            v = d[t.lower()] = []
+        elif v is None:
+            raise ValueError('Cell option entry without keyword: {}'.format(s))
+        else:
+            v.append(t)
+    return d
+
+
+def format_options(d):
+    """
+    Return string of cell options for the dictionary d, see parse_options().
+    """
+    return ' '.join('{}={}'.format(k, ' '.join(v)) if v else k
+                    for k, v in d.items())
+
+
+def get_universe(options):
+    """
+    Return universe of the cell, given its options dictionary (see
+    parse_options()). Cells without the u option are in universe 0; negative
+    u only tells that the cell is not truncated.
+    """
+    return abs(int(options['u'][0])) if 'u' in options else 0
+
+
+def cell_universes(cells):
+    """
+    Return ordered dictionary with the universe of each cell. `cells` is the
+    dictionary of (material, geometry, options) tuples, see get_cell().
+    """
+    return OrderedDict((k, get_universe(parse_options(v[2])))
+                       for k, v in cells.items())
+
+
+def get_like(geom):
+    """
+    Return name of the referenced cell, if geom is the geometry part of a
+    "like n but" cell. Otherwise return None.
+    """
+    m = re_like.match(geom)
+    return int(m.group(1)) if m else None
+
+
+def like_bases(likes):
+    """
+    Return dictionary with the base cell (i.e. not a "like n but" one) of
+    each cell in `likes`, the dictionary of like cells and the cells they
+    reference. Chains of like cells are followed, loops raise ValueError.
+    """
+    res = {}
+    for k in likes:
+        chain = [k]
+        b = likes[k]
+        while b in likes and b not in res:
+            if b in chain:
+                raise ValueError('Loop of like n but cells: {}'.format(chain))
+            chain.append(b)
+            b = likes[b]
+        b = res.get(b, b)
+        for c in chain:
+            res[c] = b
+    return res
+
+
+def like_but(v, but):
+    """
+    Return (material, geometry, options) of cell v, changed by the options
+    after "but". Keywords mat and rho give the material and density, other
+    options replace those of v. The geometry string of v is not copied.
+    """
+    mat, geom, opts = v
+    o = parse_options(opts)
+    m, rho = (mat.split() + [None])[:2]
+    for k, e in parse_options(but).items():
+        if k == 'mat':
+            m = e[0]
+        elif k == 'rho':
+            rho = e[0]
+        else:
+            o[k] = e
+    if int(m) == 0:
+        mat = ' 0'
+    elif rho is None:
+        mat = ' ' + m
+    else:
+        mat = ' {} {}'.format(m, rho)
+    return mat, geom, format_options(o)
+
+
+def resolve_like(cells):
+    """
+    Return ordered dictionary of cells (see get_cells()), where "like n but"
+    cells are replaced by their referenced cells changed by like_but().
+
+    Like cells share the geometry string of their base cell, thus its parsed
+    geometry can be shared too, see main.get_geom().
+    """
+    likes = OrderedDict()
+    for k, (mat, geom, opts) in cells.items():
+        n = get_like(geom)
+        if n is not None:
+            likes[k] = n
+    if not likes:
+        return cells
+    for k, b in like_bases(likes).items():
+        if b not in cells:
+            raise ValueError('Cell {} is like cell {}, which is not '
+                             'found'.format(k, b))
+    res = cells.__class__(cells)
+    done = {}
+    for k in likes:
+        chain = []
+        c = k
+        while c in likes and c not in done:
+            chain.append(c)
+            c = likes[c]
+        v = done.get(c, cells[c])
+        for c in reversed(chain):
+            v = done[c] = res[c] = like_but(v, cells[c][2])
+    return res
+
+
 def parse_mat(s):
     mat, den = (s + ' 0').split()[:2]
     mat = int(mat)
@@ -20,11 +20,36 @@ The world's center can be improved by searching min/max values of x, y and z
 used in definition of the MCNP surfaces (similar to definition of the source for
 volume calculations in numjuggler).
 
+General quadrics (gq, sq, p by 3 points, x, y, z by 3 pairs) are reduced to
+their canonical form, see quadrics2cad(). Besides planes 'p', spheres 's',
+cylinders 'c' and cones 'k', they can result in surfaces without rotational
+symmetry, whose frame has a third element: the direction u of the first local
+axis. With the frame axis w and v = w x u, the canonical equations in local
+coordinates are:
+
+    'e'   ellipsoid              x^2/a^2 + y^2/b^2 + z^2/c^2 = 1, srf (a, b, c)
+    'h'   hyperboloid            x^2/a^2 + y^2/b^2 - z^2/c^2 = 1 (n = 1) or -1
+                                 (n = 2 sheets), srf (a, b, c, n)
+    'ke'  elliptic cone          x^2/a^2 + y^2/b^2 = z^2, srf (a, b)
+    'ce'  elliptic cylinder      x^2/a^2 + y^2/b^2 = 1, srf (a, b)
+    'ch'  hyperbolic cylinder    x^2/a^2 - y^2/b^2 = 1, srf (a, b)
+    'pe'  elliptic paraboloid    x^2/a + y^2/b = z, srf (a, b)
+    'ph'  hyperbolic paraboloid  x^2/a - y^2/b = z, srf (a, b)
+    'pc'  parabolic cylinder     x^2/a = z, srf (a, )
+
+The frame point is the center, apex or vertex.
 """
 
+import sys
+from collections import OrderedDict
 from transforms import transform_point, transform_vector
 from math import atan
 
+import numpy as np
+
+from quadrics import get_quadric
+from mip.timing import instrument
+
 # module main entry. This is a dictionary of functions that take MCNP surface
 # parameters and return parameters needed to build CAD surface.
 mcnp2cad = {}
@@ -271,6 +296,9 @@ def p(p):
 
         p0 = n D/(n, n)
     """
+    if len(p) == 9:
+        # Plane defined by 3 points
+        return quadrics2cad([get_quadric('p', p)[0]])[0]
     # normalize parameters:
     A, B, C, D = p
     c = _norm(A, B, C)
@@ -422,8 +450,7 @@ def xx(p):
             print 'xx', p, tana
             return _cone(x0, 0, 0, abs(tana), 1, 0, 0, log=True)
     else:
-        raise NotImplementedError('Not implemented for more than 2 pairs of '
-                                  'axis-symmetric surface')
+        return quadrics2cad([get_quadric('x', p)[0]])[0]
 
 
 def zz(p):
@@ -450,8 +477,222 @@ def zz(p):
             print 'xx', p, tana
             return _cone(0, 0, z0, abs(tana), 0, 0, 1, log=True)
     else:
-        raise NotImplementedError('Not implemented for more than 2 pairs of '
-                                  'axis-symmetric surface')
+        return quadrics2cad([get_quadric('z', p)[0]])[0]
+
+
+def yy(p):
+    """
+    Surface defined by `y` surface.
+    """
+    # The meaning depends on lentgth of p and their relative position, as for
+    # the x and z surfaces.
+    if len(p) == 2:
+        return py(p)
+    elif len(p) == 4:
+        if p[0] == p[2]:
+            return py(p)
+        elif p[1] == p[3]:
+            return cy((p[1], ))
+        else:
+            tana = (p[1] - p[3]) / (p[0] - p[2])  # half-angle tan
+            y0 = p[0] - p[1]/tana
+            return _cone(0, y0, 0, abs(tana), 0, 1, 0)
+    else:
+        return quadrics2cad([get_quadric('y', p)[0]])[0]
+
+
+################################################################################
+# General quadrics.
+#
+# Let A, b and c be parts of the quadric matrix Q (see quadrics.py), so that
+#
+#     f(x) = x^T A x + 2 b x + c,
+#
+# and A = U diag(l) U^T be the eigen-decomposition of A. In the coordinates
+# y = U^T x, f = sum(l_i y_i^2 + 2 b'_i y_i) + c, where b' = U^T b. Linear
+# terms of non-zero eigenvalues are removed by shifting the origin to the
+# center y0_i = -b'_i / l_i. Linear terms of zero eigenvalues remain only for
+# paraboloids.
+
+# Tolerance for zero eigenvalues and linear terms and for equal semi-axes,
+# relative to the largest eigenvalue.
+_qtol = 1e-6
+
+
+def _fq(Q, x):
+    """
+    Value of the surface function of quadric Q at point x.
+    """
+    return Q[:3, :3].dot(x).dot(x) + 2*Q[:3, 3].dot(x) + Q[3, 3]
+
+
+def _degenerate(Q):
+    raise NotImplementedError('Cannot convert degenerate quadric {}'.format(
+        Q.tolist()))
+
+
+def _quadric2cad(Q, l, U):
+    """
+    Return type, frame, parameters and inside point for quadric Q with
+    eigenvalues l and eigenvectors U (columns) of Q[:3, :3]. Lengths in Q are
+    in cm, the result in m.
+    """
+    b = Q[:3, 3]
+    c = Q[3, 3]
+    s = abs(l).max()
+    if s == 0:
+        # plane 2 b x + c = 0
+        nb = _norm(*b)
+        if nb == 0:
+            _degenerate(Q)
+        n = b / nb
+        return _plane(*(tuple(-c/(2*nb)*n) + tuple(n)))
+    Q = Q / s
+    l = l / s
+    b = b / s
+    c = c / s
+    nz = abs(l) > _qtol
+    bl = U.T.dot(b)
+    y0 = np.where(nz, -bl / np.where(nz, l, 1), 0.0)
+    x0 = U.dot(y0)
+    h = c + (bl * y0).sum()
+    # Linear term in the null space of A
+    g = U[:, ~nz].dot(bl[~nz])
+    beta = _norm(*g)
+    i = np.nonzero(nz)[0]
+    # Result for surfaces with rotational symmetry
+    cad = None
+    if beta > _qtol * (1 + _norm(*b)):
+        # paraboloids and parabolic cylinder, with vertex shifted along g
+        w = g / beta
+        x0 = x0 - h / (2*beta) * w
+        # The surface is z = sum(k_i y_i^2), z along w. Orient w so that the
+        # first term is positive.
+        k = -l[i] / (2*beta)
+        if k.max() <= 0:
+            w = -w
+            k = -k
+        order = np.argsort(-k)
+        i = i[order]
+        a = 1 / abs(k[order])
+        u = U[:, i[0]]
+        if len(i) == 1:
+            t = 'pc'
+        else:
+            t = 'pe' if k.min() > 0 else 'ph'
+        srf = tuple(a.tolist())
+        lengths = (1.0, ) + srf
+    elif len(i) == 3 and abs(h) <= _qtol * (1 + abs(c) +
+                                            (bl**2 / abs(l)).sum()):
+        # cone, axis along the eigenvalue of the other sign
+        pos = l > 0
+        k = np.nonzero(pos != (pos.sum() >= 2))[0][0]
+        j = [m for m in range(3) if m != k]
+        w = U[:, k]
+        u = U[:, j[0]]
+        ab = (-l[k] / l[j])**0.5
+        if abs(ab[0] - ab[1]) <= _qtol * ab.max():
+            cad = _cone(*(tuple(x0) + (ab.mean(), ) + tuple(w)))
+        t = 'ke'
+        srf = tuple(ab.tolist())
+        lengths = (1.0, )
+    elif len(i) == 3:
+        mu = -l / h
+        if (mu < 0).all():
+            _degenerate(Q)
+        a = abs(mu)**-0.5
+        if (mu > 0).all():
+            if a.max() - a.min() <= _qtol * a.max():
+                cad = _sphere(*(tuple(x0) + (a.mean(), )))
+            t = 'e'
+            j = [0, 1, 2]
+            srf = tuple(a.tolist())
+        else:
+            # axis along the eigenvalue of the other sign
+            k = np.nonzero((mu > 0) != ((mu > 0).sum() >= 2))[0][0]
+            j = [m for m in range(3) if m != k] + [k]
+            t = 'h'
+            srf = tuple(a[j].tolist()) + (3 - int((mu > 0).sum()), )
+        w = U[:, j[2]]
+        u = U[:, j[0]]
+        lengths = tuple(2*a)
+    elif len(i) == 2 and h != 0:
+        w = U[:, ~nz][:, 0]
+        mu = -l[i] / h
+        if (mu < 0).all():
+            _degenerate(Q)
+        a = abs(mu)**-0.5
+        if mu[0] < 0:
+            # hyperbolic cylinder, the positive term first
+            i = i[::-1]
+            a = a[::-1]
+        t = 'ce' if (mu > 0).all() else 'ch'
+        if t == 'ce' and a.max() - a.min() <= _qtol * a.max():
+            cad = _cylinder(*(tuple(x0) + (a.mean(), ) + tuple(w)))
+        u = U[:, i[0]]
+        srf = tuple(a.tolist())
+        lengths = tuple(2*a)
+    else:
+        # pairs of planes or nothing
+        _degenerate(Q)
+
+    # Inside point: the one of the rotational surface, the frame point or a
+    # point along one of the axes
+    first = [x0] if cad is None else [np.array(cad[3]) * 1e2]
+    for pin in first + [x0 + d*e for d in lengths
+                        for e in (U[:, 0], U[:, 1], U[:, 2],
+                                  -U[:, 0], -U[:, 1], -U[:, 2])]:
+        if _fq(Q, pin) < 0:
+            break
+    else:
+        raise ValueError('Cannot find point inside quadric {}'.format(
+            Q.tolist()))
+    pin = tuple((pin/1e2).tolist())
+    if cad is not None:
+        return cad[:3] + (pin, )
+
+    # Right-handed frame
+    v = np.cross(w, u)
+    w = np.cross(u, v)
+    # Lengths to m. Parameters of 'ke' are slopes, the last one of 'h' is the
+    # number of sheets.
+    if t == 'h':
+        srf = tuple((np.array(srf[:3]) / 1e2).tolist()) + srf[3:]
+    elif t != 'ke':
+        srf = tuple((np.array(srf) / 1e2).tolist())
+    frm = (tuple((x0/1e2).tolist()), tuple(w.tolist()), tuple(u.tolist()))
+    return t, frm, srf, pin
+
+
+def quadrics2cad(Q):
+    """
+    Return list of (type, frame, parameters, inside point) tuples for
+    quadrics Q, a sequence of 4x4 matrices (see quadrics.get_quadric()) in cm.
+
+    Eigenvalues of all quadrics are found at once. Quadrics with rotational
+    symmetry result in the same types as the mcnp2cad functions, other ones in
+    the types described in the module docstring. Degenerate quadrics (pairs of
+    planes, empty sets) raise NotImplementedError.
+    """
+    Q = np.asarray(Q, dtype=float).reshape(-1, 4, 4)
+    if len(Q) == 0:
+        return []
+    l, U = np.linalg.eigh(Q[:, :3, :3])
+    return [_quadric2cad(*a) for a in zip(Q, l, U)]
+
+
+def gq(p):
+    """
+    Surface defined by `gq` surface.
+    """
+    return quadrics2cad([get_quadric('gq', p)[0]])[0]
+
+
+def sq(p):
+    """
+    Surface defined by `sq` surface.
+    """
+    return quadrics2cad([get_quadric('sq', p)[0]])[0]
 
 
 mcnp2cad['so'] = so
@@ -479,40 +720,260 @@ mcnp2cad['tx'] = tx
 mcnp2cad['ty'] = ty
 mcnp2cad['tz'] = tz
 mcnp2cad['x'] = xx
+mcnp2cad['y'] = yy
 mcnp2cad['z'] = zz
+mcnp2cad['gq'] = gq
+mcnp2cad['sq'] = sq
 
 
 def apply_transform(frm, pin, tr):
     """
     Return transformed frame frm and point pin according to transformation tr
     """
-    tr[0] = tr[0]/1e2
-    tr[1] = tr[1]/1e2
-    tr[2] = tr[2]/1e2
-    p, v = frm
+    # Origin in m. The list tr is not changed, it can be shared by surfaces.
+    tr = [tr[0]/1e2, tr[1]/1e2, tr[2]/1e2] + list(tr[3:12])
+    p, v = frm[:2]
     pp = transform_point(p, tr)
     vp = transform_vector(v, tr)
     pinp = transform_point(pin, tr)
+    if len(frm) > 2:
+        return (pp, vp, transform_vector(frm[2], tr)), pinp
     return (pp, vp), pinp
 
 
-def translate(surfaces, transform):
+################################################################################
+# Batched versions of _sphere(), _plane(), ... They take arrays (or scalars) of
+# the same arguments and return type, arrays of frame points, frame vectors and
+# surface parameters and inside points. Operations are done in the same order
+# as in the scalar functions, thus the results are identical.
+def _spheres(x, y, z, R):
+    x, y, z, R = np.broadcast_arrays(x/1e2, y/1e2, z/1e2, R/1e2)
+    p = np.column_stack((x, y, z))
+    v = np.zeros(p.shape)
+    v[:, 2] = 1
+    return 's', p, v, R[:, np.newaxis], p
+
+
+def _planes(x, y, z, A, B, C):
+    x, y, z, A, B, C = np.broadcast_arrays(x/1e2, y/1e2, z/1e2, A, B, C)
+    p = np.column_stack((x, y, z))
+    v = np.column_stack((A, B, C)).astype(float)
+    pin = p + v*(-_offset)
+    return 'p', p, v, np.zeros((len(p), 0)), pin
+
+
+def _cylinders(x, y, z, r, A, B, C):
+    x, y, z, r, A, B, C = np.broadcast_arrays(x/1e2, y/1e2, z/1e2, r/1e2, A,
+                                              B, C)
+    p = np.column_stack((x, y, z))
+    v = np.column_stack((A, B, C)).astype(float)
+    return 'c', p, v, r[:, np.newaxis], p
+
+
+def _cones(x, y, z, tana, A, B, C):
+    x, y, z, tana, A, B, C = np.broadcast_arrays(x/1e2, y/1e2, z/1e2, tana, A,
+                                                 B, C)
+    v = np.column_stack((A, B, C)).astype(float)
+    p = np.column_stack((x, y, z)) + v*_offset
+    srf = np.column_stack((tana*_offset, np.arctan(tana)))
+    return 'k', p, v, srf, p
+
+
+def _tori(x, y, z, A, B, C, r1, r2):
+    x, y, z, A, B, C, r1, r2 = np.broadcast_arrays(x/1e2, y/1e2, z/1e2, A, B,
+                                                   C, r1/1e2, r2/1e2)
+    p = np.column_stack((x, y, z))
+    v = np.column_stack((A, B, C)).astype(float)
+    # Normal to (A, B, C), as in _normal()
+    n = np.column_stack((-v[:, 2], np.zeros(len(v)), v[:, 0]))
+    n[v[:, 1] != 0] = np.column_stack((0*v[:, 0], v[:, 2], -v[:, 1]))[
+        v[:, 1] != 0]
+    n[v[:, 0] != 0] = np.column_stack((v[:, 1], -v[:, 0], 0*v[:, 0]))[
+        v[:, 0] != 0]
+    c = r1 / np.power(np.power(n, 2).sum(axis=1), 0.5)
+    pin = p + c[:, np.newaxis]*n
+    return 't', p, v, np.column_stack((r1, r2)), pin
+
+
+def _tparams(P):
+    bad = P[:, 4] != P[:, 5]
+    if bad.any():
+        _check_torus(P[bad][0])
+    return P[:, 0], P[:, 1], P[:, 2]
+
+
+def _pparams(P):
+    A, B, C, D = P.T
+    c = np.power(np.power(A, 2) + np.power(B, 2) + np.power(C, 2), 0.5)
+    A = A/c
+    B = B/c
+    C = C/c
+    D = D/c
+    return 0 + A*D, 0 + B*D, 0 + C*D, A, B, C
+
+
+# Batched translation: for each surface type, the number of parameters, the
+# batched function and function returning its arguments from the (N, k) array
+# of surface parameters. Types not listed here are translated with mcnp2cad.
+batch2cad = {}
+batch2cad['so'] = 1, _spheres, lambda P: (0, 0, 0, P[:, 0])
+batch2cad['sx'] = 2, _spheres, lambda P: (P[:, 0], 0, 0, P[:, 1])
+batch2cad['sy'] = 2, _spheres, lambda P: (0, P[:, 0], 0, P[:, 1])
+batch2cad['sz'] = 2, _spheres, lambda P: (0, 0, P[:, 0], P[:, 1])
+batch2cad['s'] = 4, _spheres, lambda P: P.T
+batch2cad['px'] = 1, _planes, lambda P: (P[:, 0], 0, 0, 1, 0, 0)
+batch2cad['py'] = 1, _planes, lambda P: (0, P[:, 0], 0, 0, 1, 0)
+batch2cad['pz'] = 1, _planes, lambda P: (0, 0, P[:, 0], 0, 0, 1)
+batch2cad['p'] = 4, _planes, _pparams
+batch2cad['cx'] = 1, _cylinders, lambda P: (0, 0, 0, P[:, 0], 1, 0, 0)
+batch2cad['cy'] = 1, _cylinders, lambda P: (0, 0, 0, P[:, 0], 0, 1, 0)
+batch2cad['cz'] = 1, _cylinders, lambda P: (0, 0, 0, P[:, 0], 0, 0, 1)
+batch2cad['c/x'] = 3, _cylinders, lambda P: (0, P[:, 0], P[:, 1], P[:, 2],
+                                             1, 0, 0)
+batch2cad['c/y'] = 3, _cylinders, lambda P: (P[:, 0], 0, P[:, 1], P[:, 2],
+                                             0, 1, 0)
+batch2cad['c/z'] = 3, _cylinders, lambda P: (P[:, 0], P[:, 1], 0, P[:, 2],
+                                             0, 0, 1)
+batch2cad['kx'] = 2, _cones, lambda P: (P[:, 0], 0, 0, np.power(P[:, 1], 0.5),
+                                        1, 0, 0)
+batch2cad['ky'] = 2, _cones, lambda P: (0, P[:, 0], 0, np.power(P[:, 1], 0.5),
+                                        0, 1, 0)
+batch2cad['kz'] = 2, _cones, lambda P: (0, 0, P[:, 0], np.power(P[:, 1], 0.5),
+                                        0, 0, 1)
+batch2cad['k/x'] = 4, _cones, lambda P: (P[:, 0], P[:, 1], P[:, 2],
+                                         np.power(P[:, 3], 0.5), 1, 0, 0)
+batch2cad['k/y'] = 4, _cones, lambda P: (P[:, 0], P[:, 1], P[:, 2],
+                                         np.power(P[:, 3], 0.5), 0, 1, 0)
+batch2cad['k/z'] = 4, _cones, lambda P: (P[:, 0], P[:, 1], P[:, 2],
+                                         np.power(P[:, 3], 0.5), 0, 0, 1)
+batch2cad['tx'] = 6, _tori, lambda P: _tparams(P) + (1, 0, 0, P[:, 3],
+                                                     P[:, 4])
+batch2cad['ty'] = 6, _tori, lambda P: _tparams(P) + (0, 1, 0, P[:, 3],
+                                                     P[:, 4])
+batch2cad['tz'] = 6, _tori, lambda P: _tparams(P) + (0, 0, 1, P[:, 3],
+                                                     P[:, 4])
+
+
+def _translate_group(stype, params):
+    """
+    Return types, arrays of frame points and vectors, list of surface
+    parameters, array of inside points and array of the third frame vectors
+    (nan, if the frame has two elements) for surfaces of type `stype` with
+    parameters `params`.
+    """
+    if stype in ('gq', 'sq'):
+        res = quadrics2cad([get_quadric(stype, pl)[0] for pl in params])
+    elif stype in batch2cad:
+        n, f, args = batch2cad[stype]
+        P = np.array(params)
+        if P.ndim == 2 and P.shape[1] == n:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                t, p, v, s, pin = f(*args(P))
+            good = (np.isfinite(p).all(axis=1) & np.isfinite(v).all(axis=1) &
+                    np.isfinite(s).all(axis=1) & np.isfinite(pin).all(axis=1))
+            if good.all():
+                s = zip(*s.T.tolist()) or [()] * len(P)
+                return [t] * len(P), p, v, s, pin, np.full(p.shape, np.nan)
+        # Scalar functions, also to raise their exceptions for invalid
+        # parameters
+        res = [mcnp2cad[stype](pl) for pl in params]
+    else:
+        res = [mcnp2cad[stype](pl) for pl in params]
+    p = np.array([f[0] for t, f, s, pin in res], dtype=float).reshape(-1, 3)
+    v = np.array([f[1] for t, f, s, pin in res], dtype=float).reshape(-1, 3)
+    u = np.array([f[2] if len(f) > 2 else (np.nan, ) * 3
+                  for t, f, s, pin in res], dtype=float).reshape(-1, 3)
+    pin = np.array([r[3] for r in res], dtype=float).reshape(-1, 3)
+    return [r[0] for r in res], p, v, [r[2] for r in res], pin, u
+
+
+def _transform_rows(a, M, origin=True):
     """
-    Return a dictionary of surfaces, suitable for passing to CAD.
+    Apply transformations M, (N, 12) array, to rows of a, as
+    transforms.transform_point() or transform_vector().
     """
-    res = surfaces.__class__()  # surfaces can be an OrderedDict
-    for k, v in surfaces.items():
-        bc, tr, stype, pl = v
-        t, f, s, p = mcnp2cad[stype](pl)
-        if tr:
-            trpl = transform[int(tr)]
-            f, p = apply_transform(f, p, trpl)
-        res[k] = t, f, s, p
-    return res
+    B = M[:, 3:]
+    x, y, z = a.T
+    r = np.column_stack((B[:, 0]*x + B[:, 3]*y + B[:, 6]*z,
+                         B[:, 1]*x + B[:, 4]*y + B[:, 7]*z,
+                         B[:, 2]*x + B[:, 5]*y + B[:, 8]*z))
+    if origin:
+        r = M[:, :3]/1e2 + r
+    return r
+
 
+def translate(surfaces, transform):
+    """
+    Return a dictionary of surfaces, suitable for passing to CAD.
 
-def get_dimensions(surfaces):
-    return 10.0
+    Surfaces of the same type are translated together with NumPy (see
+    batch2cad); transformations are applied to all transformed surfaces at
+    once. The `transform` dictionary is not changed.
+    """
+    keys = surfaces.keys()
+    values = surfaces.values()
+    groups = OrderedDict()
+    for j, val in enumerate(values):
+        groups.setdefault(val[2], []).append(j)
+
+    n = len(keys)
+    t = [None] * n
+    p = np.empty((n, 3))
+    v = np.empty((n, 3))
+    s = [None] * n
+    pin = np.empty((n, 3))
+    u = np.empty((n, 3))
+    for stype, rows in groups.items():
+        gt, gp, gv, gs, gpin, gu = _translate_group(
+            stype, [values[j][3] for j in rows])
+        for j, a, b in zip(rows, gt, gs):
+            t[j] = a
+            s[j] = b
+        p[rows] = gp
+        v[rows] = gv
+        pin[rows] = gpin
+        u[rows] = gu
+
+    rows = [j for j, val in enumerate(values) if val[1]]
+    if rows:
+        M = np.array([transform[int(values[j][1])] for j in rows], dtype=float)
+        p[rows] = _transform_rows(p[rows], M)
+        v[rows] = _transform_rows(v[rows], M, False)
+        pin[rows] = _transform_rows(pin[rows], M)
+        u[rows] = _transform_rows(u[rows], M, False)
+
+    frm = zip(zip(*p.T.tolist()), zip(*v.T.tolist()))
+    # Frames with the third vector, see quadrics2cad()
+    for j in np.nonzero(~np.isnan(u[:, 0]))[0].tolist():
+        frm[j] += (tuple(u[j].tolist()), )
+    # surfaces can be an OrderedDict
+    return surfaces.__class__(zip(keys, zip(t, frm, s,
+                                            zip(*pin.T.tolist()))))
+
+
+instrument(sys.modules[__name__], 'translate', 'CAD translation')
+
+
+def get_dimensions(surfaces, cells=None, transforms=None):
+    """
+    Return the world's radius, in meters.
+
+    Without `cells`, the default radius 10.0 is returned. Otherwise, this is
+    the distance from the origin to the farthest corner of bounding boxes of
+    finite cells (see bbox.py). Infinite cells, usually the outer void, are
+    not considered.
+    """
+    if cells is None:
+        return 10.0
+    from bbox import get_boxes, is_finite, is_empty
+    r = 0.0
+    for b in get_boxes(cells, surfaces, transforms or {}).values():
+        if is_finite(b) and not is_empty(b):
+            r = max(r, sum(max(abs(l), abs(h))**2
+                           for l, h in zip(b[0], b[1]))**0.5)
+    if r == 0.0:
+        return 10.0
+    return r / 1e2 + _offset
 
 
 def extract_intersections():
@@ -0,0 +1,137 @@
+"""
+Incremental parsing of an edited input file.
+
+Results of a previous parse are kept in an instance of GeomState, together with
+fingerprints of the cards. When the input file is parsed again, only cards with
+changed fingerprints are split and their geometry is parsed. Other cards are
+taken from the previous state.
+
+Example::
+
+    cells, surfs, trans, state, changes = update_geom(MIP(fname))
+    # ... edit the input file ...
+    cells, surfs, trans, state, changes = update_geom(MIP(fname), state)
+    print changes['c']['modified']
+"""
+
+from collections import OrderedDict
+
+from cells import get_cell, get_like, like_bases
+from surfaces import get_surface
+from transforms import get_transform
+from parsegeom import get_ast
+from main import extract_surfaces
+
+
+class GeomState(object):
+    """
+    Fingerprints of cards and results of their parsing.
+
+    Both are dictionaries with (block, name) keys, see mip.MIP.index().
+    Instances can be pickled to keep the state between runs.
+    """
+    def __init__(self):
+        self.fingerprints = {}
+        self.cards = {}
+        return
+
+
+def parse_card(i, key):
+    """
+    Return parsed card specified by key.
+
+    For cells, this is the geometry ast, set of surfaces used in it and the
+    cell referenced by a "like n but" cell (ast and surfaces are then None and
+    the empty set) or None; for surfaces -- the tuple returned by
+    surfaces.get_surface(); for data cards -- the result of
+    transforms.get_transform() or None, if this is not a tr card.
+    """
+    b, name = key
+    if b == 'd' and name[0] != 'tr':
+        # Other data cards are not needed for geometry
+        return None
+    c = i.card(b, name)
+    if b == 'c':
+        name, (mat, geom, opts) = get_cell(c)
+        like = get_like(geom)
+        if like is not None:
+            return None, set(), like
+        ast = get_ast(geom)
+        return ast, extract_surfaces(ast), None
+    elif b == 's':
+        return get_surface(c)[1]
+    else:
+        return get_transform(c)
+
+
+def compare(old, new):
+    """
+    Compare two dictionaries of fingerprints.
+
+    Returns a dictionary with keys 'c', 's' and 'd' (blocks). Each value is a
+    dictionary with lists of 'added', 'removed' and 'modified' card names.
+    """
+    changes = {}
+    for b in 'csd':
+        changes[b] = {'added': [], 'removed': [], 'modified': []}
+    for k, fp in new.items():
+        if k not in old:
+            changes[k[0]]['added'].append(k[1])
+        elif old[k] != fp:
+            changes[k[0]]['modified'].append(k[1])
+    for k in old:
+        if k not in new:
+            changes[k[0]]['removed'].append(k[1])
+    for d in changes.values():
+        for l in d.values():
+            l.sort()
+    return changes
+
+
+def update_geom(i, state=None):
+    """
+    Return cells, surfaces and transforms (the same as main.get_geom()), new
+    state and changes with respect to the previous `state`.
+
+    `i` is an instance of mip.MIP. Only cards, whose fingerprints differ from
+    those in `state`, are parsed. Changes are described by the dictionary
+    returned by compare().
+    """
+    if state is None:
+        state = GeomState()
+    new = GeomState()
+    new.fingerprints = i.fingerprints()
+    keys = i.index().keys()
+    for key in keys:
+        if state.fingerprints.get(key) == new.fingerprints[key]:
+            new.cards[key] = state.cards[key]
+        else:
+            new.cards[key] = parse_card(i, key)
+
+    # Put results together in the order of the input file
+    cells = OrderedDict()
+    surfs = {}
+    trans = OrderedDict()
+    used = set()
+    likes = {}
+    for key in keys:
+        b, name = key
+        v = new.cards[key]
+        if b == 'c':
+            cells[name], u, like = v
+            used.update(u)
+            if like is not None:
+                likes[name] = like
+        elif b == 's':
+            surfs[name] = v
+        elif v is not None:
+            tname, params = v
+            trans[tname] = params
+    # Like cells share the geometry of their base cells
+    for name, base in like_bases(likes).items():
+        cells[name] = cells[base]
+    usurf = {}
+    for s in used:
+        usurf[s] = surfs[s]
+    return cells, usurf, trans, new, compare(state.fingerprints,
+                                             new.fingerprints)
@@ -7,59 +7,238 @@ One dictionary contains cells, with geometry parsed to ast.
 The other dictionary contains surfaces, mentioned in the cells.
 """
 
-from surfaces import get_surfaces
-from cells import get_cells
-from transforms import get_transforms
+from collections import OrderedDict
+from multiprocessing import Pool
+
+from surfaces import get_surface
+from cells import get_cell, resolve_like
+from transforms import get_transform
+from materials import get_material
 from parsegeom import get_ast
 from semantics import Surface, Cell
+from cache import ParseCache
+from mip import MIP
 
 
 def extract_surfaces(ast):
     """
     Return set of surfaces used in ast.
     """
-    if isinstance(ast, Surface):
-        return set((abs(ast), ))
-    elif isinstance(ast, Cell):
-        return set()
-
     s = set()
-    if isinstance(ast[1], tuple):
-        s.update(extract_surfaces(ast[1]))
-    else:
-        s.add(abs(ast[1]))
-    if isinstance(ast[2], tuple):
-        s.update(extract_surfaces(ast[2]))
-    else:
-        s.add(abs(ast[2]))
+    # Explicit stack instead of recursion, which is limited for long
+    # expressions. See also rpn.RPN.surfaces().
+    todo = [ast]
+    while todo:
+        e = todo.pop()
+        if isinstance(e, Surface):
+            s.add(abs(e))
+        elif not isinstance(e, Cell):
+            todo.append(e[1])
+            todo.append(e[2])
     return s
 
 
-def get_raw_geom(i, lim=None):
-    if isinstance(i, str):
-        from mcrp_splitters import InputSplitter
-        i = InputSplitter(i)
+# Extractors used by extract(): name of the resulting dictionary, block and
+# function that returns (name, value) for a card of the block, or None if the
+# card is not relevant. See register().
+extractors = [('cells', 'c', get_cell),
+              ('surfaces', 's', get_surface),
+              ('transforms', 'd', get_transform)]
+
+# Extractor of materials, not used by default. To read materials in the same
+# pass: extract(i, extractors=extractors + [material_extractor]).
+material_extractor = ('materials', 'd', get_material)
+
+
+def register(key, block, func):
+    """
+    Add extractor `func` for cards of `block`, whose results are collected by
+    extract() to the dictionary `key`.
+    """
+    extractors.append((key, block, func))
+
+
+def extract(i, lim=None, extractors=extractors, splits=None):
+    """
+    Return dictionary with ordered dictionaries of cells, surfaces,
+    transforms and of any other registered extractor (e.g. materials, see
+    material_extractor).
+
+    Cards of all blocks are read in a single pass; each card is split once and
+    passed to all extractors of its block. If `lim` is given, only the first
+    lim + 1 cells are extracted.
+
+    If `splits` is a list, (position, type, span, skipcomments, parts) of the
+    extracted cards are appended to it, see mip.MIP.preset().
+    """
+    res = OrderedDict((k, OrderedDict()) for k, b, f in extractors)
+    handlers = {}
+    for k, b, f in extractors:
+        handlers.setdefault(b, []).append((k, f))
+    blocks = ''.join(b for b in 'csd' if b in handlers)
+    for c in i.cards(blocks=blocks, skipcomments=True):
+        for k, f in handlers.get(c.type, ()):
+            if lim and k == 'cells' and len(res[k]) > lim:
+                continue
+            r = f(c)
+            if r:
+                name, v = r
+                res[k][name] = v
+        if splits is not None and c._parts is not None:
+            splits.append((c.position, c.type, c.span, c.skipcomments,
+                           c._parts))
+    return res
+
+
+def _load_cache(i, lim, cachedir):
+    """
+    Return ParseCache for `cachedir`, keys of the input entry and of the
+    result entry for `lim`, and the result entry.
+    """
+    cache = ParseCache(cachedir)
+    ikey, key = cache.keys(i, lim)
+    return cache, ikey, key, cache.load(key)
+
+
+def _raw_geom(i, lim=None, splits=None):
+    """
+    Return cells, surfaces and transformations of the input `i`, see
+    get_raw_geom(). Splits of the cards are added to `splits`, see extract().
+    """
     # read cells, surfaces and transformations from input
-    cells = get_cells(i, lim=lim)
-    surfs = get_surfaces(i)
-    trans = get_transforms(i)
+    d = extract(i, lim, splits=splits)
+    cells = resolve_like(d['cells'])
+    surfs = d['surfaces']
+    trans = d['transforms']
     return cells, surfs, trans
 
 
-def get_geom(i, lim=None):
-    cells, surfs, trans = get_raw_geom(i, lim)
+def get_raw_geom(i, lim=None, cachedir=None):
+    """
+    Return dictionaries of cells, surfaces and transformations. The "like n
+    but" cells are resolved, see cells.resolve_like().
+
+    `i` is an instance of mip.MIP or the input file name.
+
+    If `cachedir` is given, the result is taken from the cache directory, when
+    available, and stored there otherwise. See cache.py.
+    """
+    if isinstance(i, str):
+        i = MIP(i)
+    if not cachedir:
+        return _raw_geom(i, lim)
+    cache, ikey, key, entry = _load_cache(i, lim, cachedir)
+    if 'raw' in entry:
+        return entry['raw']
+    # Card positions and splits are needed only when the result is missing
+    cache.restore(i, cache.load(ikey))
+    splits = []
+    raw = _raw_geom(i, lim, splits)
+    cache.update(key, raw=raw)
+    cache.update_input(ikey, i, splits)
+    return raw
+
+
+def parse_cells(items):
+    """
+    Parse geometry of cells.
+
+    `items` is a list of (name, geom) tuples. Returned is a list of (name,
+    ast, used surfaces, error) tuples, where error is the message of the
+    exception raised while parsing geom, or None.
+
+    This function is called in worker processes by get_geom(), therefore
+    exceptions are not raised here.
+    """
+    res = []
+    for name, geom in items:
+        try:
+            ast = get_ast(geom)
+            res.append((name, ast, extract_surfaces(ast), None))
+        except Exception as e:
+            err = '{}: {}'.format(type(e).__name__, e)
+            res.append((name, None, None, err))
+    return res
+
+
+def _cell_line(i, name):
+    """
+    Return line, where cell `name` is defined in the input `i`, or None.
+    """
+    try:
+        return i.index()['c', name][2]
+    except (AttributeError, KeyError):
+        return None
+
+
+def get_geom(i, lim=None, cachedir=None, workers=None):
+    """
+    Return dictionary of cells with parsed geometry, and dictionaries of
+    surfaces used in these cells and of transformations.
+
+    If `cachedir` is given, the result is taken from the cache directory, when
+    available, and stored there otherwise. See cache.py.
+
+    If `workers` is greater than 1, geometry of cells is parsed in a pool of
+    `workers` processes.
+
+    Cells with the same geometry string, e.g. "like n but" cells and their
+    base cells, are parsed once and share the parsed geometry.
+    """
+    if isinstance(i, str):
+        i = MIP(i)
+    splits = []
+    if cachedir:
+        cache, ikey, key, entry = _load_cache(i, lim, cachedir)
+        if 'geom' in entry:
+            return entry['geom']
+        raw = entry.get('raw')
+        if raw is None:
+            cache.restore(i, cache.load(ikey))
+            raw = _raw_geom(i, lim, splits)
+    else:
+        raw = _raw_geom(i, lim)
+    cells, surfs, trans = raw
+
+    # The first cell with each geometry string
+    first = {}
+    items = []
+    for k, v in cells.items():
+        if v[1] not in first:
+            first[v[1]] = k
+            items.append((k, v[1]))
+    if workers > 1:
+        # Several chunks per worker, to balance their load
+        n = len(items) // (4 * workers) + 1
+        chunks = [items[j:j+n] for j in range(0, len(items), n)]
+        pool = Pool(workers)
+        try:
+            results = pool.map(parse_cells, chunks)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [parse_cells(items)]
 
     # extract only surfaces, used in cells
     used = set()
-    for k, v in cells.items():
-        mat, geom, opts = v
-        ast = get_ast(geom)
-        cells[k] = ast
-        used.update(extract_surfaces(ast))
+    asts = {}
+    for res in results:
+        for k, ast, u, err in res:
+            if err:
+                raise ValueError('Cell {} on line {}: {}'.format(
+                    k, _cell_line(i, k), err))
+            asts[k] = ast
+            used.update(u)
+    # cells of the raw result are kept unchanged for the cache
+    cells = cells.__class__((k, asts[first[v[1]]]) for k, v in cells.items())
     usurf = {}
     for s in used:
         usurf[s] = surfs[s]
 
+    if cachedir:
+        cache.update(key, raw=raw, geom=(cells, usurf, trans))
+        cache.update_input(ikey, i, splits)
     return cells, usurf, trans
 
 ###############################################################################
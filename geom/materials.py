@@ -0,0 +1,60 @@
+# Return dictionary describing materials
+from collections import OrderedDict
+
+
+def get_materials(input, lim=None):
+    """
+    input is an instance of mip.MIP class.
+    """
+    d = OrderedDict()
+    n = 0
+    for c in input.cards(blocks='d', skipcomments=True):
+        r = get_material(c)
+        if r:
+            name, v = r
+            d[name] = v
+            n += 1
+            if lim and n > lim:
+                break
+    return d
+
+
+def get_material(c):
+    """
+    Return name and (components, options) tuple for data card c, if it is an
+    m card. Otherwise return None.
+
+    Components is the list of (zaid, fraction) tuples, options -- the
+    dictionary of keyword entries, e.g. {'nlib': '80c'}. ValueError is raised
+    for malformed m cards.
+    """
+    name, dtype, params = c.parts()
+    if dtype.lower() != 'm' or not name:
+        return None
+    comp = []
+    opts = OrderedDict()
+    words = params.replace('=', ' = ').split()
+    j = 0
+    try:
+        while j < len(words):
+            if j + 1 < len(words) and words[j + 1] == '=':
+                opts[words[j].lower()] = words[j + 2]
+                j += 3
+            else:
+                comp.append((words[j], float(words[j + 1])))
+                j += 2
+        return int(name), (comp, opts)
+    except (IndexError, ValueError):
+        raise ValueError('Wrong entries of material card m{} at {}: {}'.format(
+            name, ' '.join(words[j:j + 3]) or 'end', params.strip()))
+
+
+if __name__ == '__main__':
+    from sys import argv
+    from mcrp_splitters import InputSplitter
+
+    i = InputSplitter(argv[1])
+    d = get_materials(i, lim=None)
+    print d.items()[0]
+    print d.items()[-1]
+    print len(d)
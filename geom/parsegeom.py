@@ -2,18 +2,31 @@
 # -*- coding: utf-8 -*-
 
 import re
+import sys
 from codecs import open
-import tatsu
-from tatsu.ast import AST
 
-from semantics import GeomSemantics
+from semantics import GeomSemantics, GeomExpression, Surface, Cell
+from mip.timing import instrument
 
 from os import path
 ebnf = path.join(path.dirname(__file__), 'grammars/geom.ebnf')
 # print '*** ebnf', ebnf
 
-grammar = open(ebnf, 'r').read()
-parser = tatsu.compile(grammar)  # , left_recurion=False)
+# tatsu is needed only for get_ast_tatsu(). The tatsu parser is compiled on
+# first use.
+try:
+    import tatsu
+except ImportError:
+    tatsu = None
+parser = None
+
+# Tokens of the geometry description: signed surface, complement of a cell,
+# complement of an expression in parentheses, operators and parentheses. Any
+# other non-space character is an error.
+re_token = re.compile(r'([-+]?\d+)|#\s*(\d+)|(#\s*\()|([:()])|(\S)')
+
+# Binary operators and their precedence
+precedence = {'*': 2, ':': 1}
 
 # patterns to replace space denoting intersection with '*'
 re_union = re.compile('\s*:\s*')
@@ -44,13 +57,99 @@ def normalize(geom):
 
 
 def get_ast(geom):
+    """
+    Return geometry description `geom` of a cell parsed into a tree of
+    semantics.GeomExpression, with semantics.Surface and semantics.Cell leaves.
+
+    For the "like n but" cells, string n is returned; such cells are resolved
+    to the geometry of cell n by cells.resolve_like().
+    """
+    if 'like' in geom.lower():
+        return geom.split()[1]
+    return parse(geom)
+
+
+def get_ast_tatsu(geom):
+    """
+    The same as get_ast(), but uses the tatsu parser generated from
+    grammars/geom.ebnf. It is kept as reference for benchmarks; ImportError
+    is raised if tatsu is not installed.
+    """
+    global parser
     if 'like' in geom.lower():
         return geom.split()[1]
+    if tatsu is None:
+        raise ImportError('tatsu is not installed, the reference parser '
+                          'get_ast_tatsu() is not available')
+    if parser is None:
+        grammar = open(ebnf, 'r').read()
+        parser = tatsu.compile(grammar)  # , left_recurion=False)
     g = normalize(geom)
     ast = parser.parse(g, semantics=GeomSemantics())
     return ast
 
 
+def _reduce(ops, operands):
+    """
+    Apply the last operator in ops to the last two operands.
+    """
+    r = operands.pop()
+    l = operands.pop()
+    operands.append(GeomExpression((ops.pop(), l, r)))
+
+
+def parse(geom):
+    """
+    Parse the geometry description of a cell (without normalization).
+
+    Operator-precedence parser: intersection (denoted by spaces or by absence
+    of any delimiter) has precedence over union. Both are left-associative.
+    The parser works without recursion, thus the depth of parentheses and the
+    length of expression are not limited.
+    """
+    operands = []
+    ops = []          # binary operators and opening parentheses
+    operand = False   # True if the last token completes an operand
+    for s, c, cp, p, err in re_token.findall(geom):
+        if s or c or cp or p == '(':
+            if operand:
+                # Implicit intersection
+                while ops and ops[-1] == '*':
+                    _reduce(ops, operands)
+                ops.append('*')
+            if s:
+                operands.append(Surface(s))
+                operand = True
+            elif c:
+                operands.append(Cell(c))
+                operand = True
+            else:
+                ops.append(cp and '#(' or '(')
+                operand = False
+        elif p == ':' and operand:
+            while ops and ops[-1] in precedence:
+                _reduce(ops, operands)
+            ops.append(':')
+            operand = False
+        elif p == ')' and operand:
+            while ops and ops[-1] in precedence:
+                _reduce(ops, operands)
+            if not ops:
+                raise ValueError('Unbalanced parentheses: ' + repr(geom))
+            if ops.pop() == '#(':
+                operands[-1] = operands[-1].inverse()
+        else:
+            raise ValueError('Unexpected {} in geometry {}'.format(
+                repr(p or err), repr(geom)))
+    if not operand:
+        raise ValueError('Incomplete geometry: ' + repr(geom))
+    while ops and ops[-1] in precedence:
+        _reduce(ops, operands)
+    if ops:
+        raise ValueError('Unbalanced parentheses: ' + repr(geom))
+    return operands[0]
+
+
 def modify_ast(ast, d):
     """
     Assume ast is a recursive tuple with integers as terminal elements (signed
@@ -72,6 +171,10 @@ def modify_ast(ast, d):
     return map(mapping, ast)
 
 
+instrument(sys.modules[__name__], 'get_ast', 'geometry parsing',
+           lambda a, r: len(a[0]))
+
+
 if __name__ == '__main__':
     from sys import argv
     from mcrp_splitters import InputSplitter
@@ -0,0 +1,349 @@
+"""
+Plot slices of the geometry model without MCNP.
+
+A slice is defined as in the MCNP plot commands: origin `or`, basis vectors
+`bas` and extent `ext`. The pixel grid of the slice is located in cells
+tile by tile (see Plotter), the resulting raster of cell names or materials is
+written to PNG or to a NumPy .npy file.
+
+Example, similar to examples/simple3.sh::
+
+    python plot.py simple3.inp simple3.cmd simple3
+
+writes simple3.1.png, simple3.2.png, ... for each plot command in
+simple3.cmd.
+"""
+
+import struct
+import zlib
+
+import numpy as np
+
+from bbox import get_boxes
+from cells import parse_mat
+from points import Locator
+
+# Initial values of the plot parameters, as in MCNP
+defaults = {'or': (0.0, 0.0, 0.0),
+            'bas': (1.0, 0.0, 0.0, 0.0, 1.0, 0.0),
+            'ext': (100.0, 100.0)}
+
+# Basis vectors set by px, py and pz commands
+_pbas = {'px': (0.0, 1.0, 0.0, 0.0, 0.0, 1.0),
+         'py': (1.0, 0.0, 0.0, 0.0, 0.0, 1.0),
+         'pz': (1.0, 0.0, 0.0, 0.0, 1.0, 0.0)}
+
+# Full names of the plot parameters
+_names = {'or': 'origin', 'bas': 'basis', 'ext': 'extent'}
+
+# Number of values of the plot parameters
+_sizes = {'or': (3, ), 'bas': (6, ), 'ext': (1, 2)}
+
+
+def _keyword(t):
+    """
+    Return 'or', 'bas' or 'ext' for the plot parameter t given by its MCNP
+    name or abbreviation (at least two letters, e.g. 'orig', 'ba', 'ex'),
+    lowercase t otherwise.
+    """
+    t = t.lower()
+    if len(t) >= 2:
+        for k, name in _names.items():
+            if name.startswith(t):
+                return k
+    return t
+
+
+def parse_plot(text):
+    """
+    Return list of slices for the MCNP plot commands in `text`. Each slice is
+    a dictionary with keys 'or', 'bas' and 'ext'.
+
+    As in MCNP, each command (line, with continuation lines ending with &)
+    makes a plot, parameters not given in the command are kept from the
+    previous one. Commands other than or, bas, ext (or their full names
+    origin, basis, extent and abbreviations), px, py and pz are ignored.
+    ValueError is raised for or and bas without 3 and 6 values.
+    """
+    res = []
+    cur = dict(defaults)
+    cmd = []
+    for l in text.splitlines():
+        l = l.split('$')[0].strip()
+        if l.endswith('&'):
+            cmd.extend(l[:-1].split())
+            continue
+        cmd.extend(l.split())
+        if not cmd:
+            continue
+        if cmd[0].lower() == 'end':
+            break
+        # Keywords with their numerical parameters
+        kw = None
+        for t in cmd:
+            try:
+                v = float(t)
+            except ValueError:
+                kw = _keyword(t)
+                if kw in _sizes:
+                    cur[kw] = ()
+                continue
+            if kw in _sizes:
+                cur[kw] += (v, )
+            elif kw in _pbas:
+                o = list(cur['or'])
+                o['xyz'.index(kw[1])] = v
+                cur['or'] = tuple(o)
+                cur['bas'] = _pbas[kw]
+        for k, n in _sizes.items():
+            if len(cur[k]) not in n:
+                raise ValueError('Plot parameter {} needs {} values, {} '
+                                 'given: {}'.format(_names[k], n[-1],
+                                                    len(cur[k]),
+                                                    ' '.join(cmd)))
+        if len(cur['ext']) == 1:
+            cur['ext'] *= 2
+        res.append(dict(cur))
+        cmd = []
+    return res
+
+
+def frame(basis):
+    """
+    Return unit vectors u (to the right) and v (upwards) of the slice. As in
+    MCNP, the second basis vector is made perpendicular to the first one.
+    """
+    u = np.array(basis[:3], dtype=float)
+    v = np.array(basis[3:6], dtype=float)
+    u /= np.sqrt(u.dot(u))
+    v -= v.dot(u) * u
+    v /= np.sqrt(v.dot(v))
+    return u, v
+
+
+def grid(extent, res=(1000, 1000)):
+    """
+    Return coordinates of pixel centers along u and v, see frame(). `extent`
+    gives the half-widths of the slice, `res` -- number of pixels (nx, ny).
+    """
+    a, b = (tuple(extent) * 2)[:2]
+    nx, ny = res
+    x = (np.arange(nx) + 0.5) * (2.0 * a / nx) - a
+    y = b - (np.arange(ny) + 0.5) * (2.0 * b / ny)
+    return x, y
+
+
+def pixels(origin, basis, extent, res=(1000, 1000)):
+    """
+    Return (ny, nx, 3) array with coordinates of pixel centers. See frame()
+    and grid() for the arguments.
+    """
+    u, v = frame(basis)
+    x, y = grid(extent, res)
+    return (np.array(origin, dtype=float) + x[np.newaxis, :, np.newaxis] * u +
+            y[:, np.newaxis, np.newaxis] * v)
+
+
+def slice_quadrics(shapes, origin, u, v):
+    """
+    Return names and (S, 3, 3) array of 2D quadrics q, so that the surface
+    function at the point origin + x u + y v is (x, y, 1) q (x, y, 1)^T.
+
+    Only quadric surfaces without sheets are considered.
+    """
+    names = [k for k, sh in shapes.items()
+             if sh.Qm is not None and sh.sheet is None]
+    M = np.zeros((4, 3))
+    M[:3, 0] = u
+    M[:3, 1] = v
+    M[:3, 2] = origin
+    M[3, 2] = 1.0
+    Q = np.array([shapes[k].Qm for k in names]).reshape(-1, 4, 4)
+    return names, np.einsum('ai,sab,bj->sij', M, Q, M)
+
+
+def constant_sign(q, x0, x1, y0, y1):
+    """
+    Return two boolean arrays: True for quadrics q (see slice_quadrics()),
+    which are negative, resp. positive, in the whole rectangle [x0, x1] x
+    [y0, y1].
+
+    The extrema of a quadratic function in a rectangle are at its corners,
+    or at stationary points on its edges or inside.
+    """
+    a = q[:, 0, 0]
+    b = q[:, 0, 1]
+    c = q[:, 1, 1]
+    d = q[:, 0, 2]
+    e = q[:, 1, 2]
+    f = q[:, 2, 2]
+    x = [np.full(len(q), x0), np.full(len(q), x1)] * 2
+    y = [np.full(len(q), y0)] * 2 + [np.full(len(q), y1)] * 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for yy in (y0, y1):
+            x.append(np.where(a != 0, -(b*yy + d) / a, x0))
+            y.append(np.full(len(q), yy))
+        for xx in (x0, x1):
+            x.append(np.full(len(q), xx))
+            y.append(np.where(c != 0, -(b*xx + e) / c, y0))
+        det = a*c - b*b
+        x.append(np.where(det != 0, (b*e - c*d) / det, x0))
+        y.append(np.where(det != 0, (b*d - a*e) / det, y0))
+    x = np.clip(np.array(x), x0, x1)
+    y = np.clip(np.array(y), y0, y1)
+    val = a*x*x + 2*b*x*y + c*y*y + 2*d*x + 2*e*y + f
+    return val.max(axis=0) < 0, val.min(axis=0) > 0
+
+
+class Plotter(object):
+    """
+    Renders slices of the model.
+
+    `cells` is the dictionary of cells with geometry parsed to tree (see
+    main.get_geom()) or to RPN. `surfaces` and `transforms` are dictionaries
+    as returned by surfaces.get_surfaces() and transforms.get_transforms().
+
+    The slice is rendered in tiles of `tile` x `tile` pixels. In each tile,
+    only cells whose bounding boxes (see bbox.py) cross the tile are checked,
+    and quadrics that do not cross the tile are not computed for its pixels.
+    """
+    def __init__(self, cells, surfaces, transforms, tile=64):
+        self.locator = Locator(cells, surfaces, transforms)
+        self.names = self.locator.cells.keys()
+        boxes = get_boxes(self.locator.cells, surfaces, transforms)
+        self.lo = np.array([boxes[c][0] for c in self.names]).reshape(-1, 3)
+        self.hi = np.array([boxes[c][1] for c in self.names]).reshape(-1, 3)
+        self.tile = tile
+        return
+
+    def render(self, origin=defaults['or'], basis=defaults['bas'],
+               extent=defaults['ext'], res=(1000, 1000)):
+        """
+        Return (ny, nx) array with names of cells at pixel centers, 0 for
+        undefined regions. See pixels() for the arguments.
+        """
+        p = pixels(origin, basis, extent, res)
+        ny, nx = p.shape[:2]
+        u, v = frame(basis)
+        xs, ys = grid(extent, res)
+        o = np.array(origin, dtype=float)
+        snames, q = slice_quadrics(self.locator.shapes, o, u, v)
+        snames = np.array(snames)
+        names = np.array(self.names)
+        result = np.zeros((ny, nx), dtype=int)
+        for i0 in range(0, ny, self.tile):
+            for j0 in range(0, nx, self.tile):
+                i1 = min(i0 + self.tile, ny)
+                j1 = min(j0 + self.tile, nx)
+                tp = p[i0:i1, j0:j1].reshape(-1, 3)
+                neg, pos = constant_sign(q, xs[j0], xs[j1 - 1], ys[i1 - 1],
+                                         ys[i0])
+                # Senses of quadrics not crossing the tile
+                const = neg | pos
+                senses = dict(zip(snames[const].tolist(), neg[const]))
+                # Cells whose boxes cross the tile
+                c = np.array([p[i0, j0], p[i0, j1 - 1], p[i1 - 1, j0],
+                              p[i1 - 1, j1 - 1]])
+                cand = ((self.lo <= c.max(axis=0)).all(axis=1) &
+                        (self.hi >= c.min(axis=0)).all(axis=1))
+                r = np.zeros(len(tp), dtype=int)
+                for name in names[cand].tolist():
+                    inside = self.locator.inside(name, tp, senses)
+                    if np.ndim(inside) == 0:
+                        if inside:
+                            r[r == 0] = name
+                            break
+                    else:
+                        r[(r == 0) & inside] = name
+                        if r.all():
+                            break
+                result[i0:i1, j0:j1] = r.reshape(i1 - i0, j1 - j0)
+        return result
+
+
+def materials(raster, cells):
+    """
+    Return raster of material numbers for the raster of cell names. `cells` is
+    the dictionary of cells returned by main.get_raw_geom(). Undefined regions
+    get -1.
+    """
+    names, inv = np.unique(raster, return_inverse=True)
+    mats = np.array([parse_mat(cells[n][0])[0] if n in cells else -1
+                     for n in names.tolist()])
+    return mats[inv].reshape(raster.shape)
+
+
+def boundaries(raster):
+    """
+    Return boolean array, True for pixels whose right or lower neighbour has
+    different value.
+    """
+    res = np.zeros(raster.shape, dtype=bool)
+    res[:, :-1] |= raster[:, 1:] != raster[:, :-1]
+    res[:-1, :] |= raster[1:, :] != raster[:-1, :]
+    return res
+
+
+def colors(raster, edges=None):
+    """
+    Return (ny, nx, 3) array of RGB colors for the raster of cell or material
+    names. Each name gets a pseudo-random color, undefined regions (0 or -1)
+    are white. Pixels, where `edges` is True, are black.
+    """
+    c = raster.astype(np.uint32) * np.uint32(2654435761)
+    rgb = np.empty(raster.shape + (3, ), dtype=np.uint8)
+    for i in range(3):
+        rgb[..., i] = 64 + (c >> (8*i + 5)) % 192
+    rgb[raster <= 0] = 255
+    if edges is not None:
+        rgb[edges] = 0
+    return rgb
+
+
+def write_png(fname, rgb):
+    """
+    Write (ny, nx, 3) array of uint8 RGB values to PNG file.
+    """
+    h, w = rgb.shape[:2]
+
+    def chunk(tag, data):
+        return (struct.pack('!I', len(data)) + tag + data +
+                struct.pack('!I', zlib.crc32(tag + data) & 0xffffffff))
+
+    raw = np.zeros((h, w*3 + 1), dtype=np.uint8)  # filter type 0 per row
+    raw[:, 1:] = np.asarray(rgb, dtype=np.uint8).reshape(h, w*3)
+    with open(fname, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('!2I5B', w, h, 8, 2, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(raw.tostring(), 6)))
+        f.write(chunk(b'IEND', b''))
+    return
+
+
+def save(fname, raster, edges=False):
+    """
+    Save raster to a .npy file, or as image to PNG file. If `edges` is True,
+    cell boundaries are drawn on the image.
+    """
+    if fname.endswith('.npy'):
+        np.save(fname, raster)
+    else:
+        write_png(fname, colors(raster, boundaries(raster) if edges else None))
+    return
+
+
+if __name__ == '__main__':
+    from sys import argv
+    from mip import MIP
+    from main import get_raw_geom, get_geom
+
+    i = MIP(argv[1])
+    prefix = argv[3] if len(argv) > 3 else 'plot'
+    p = Plotter(*get_geom(i))
+    rawcells = get_raw_geom(i)[0]
+    for n, s in enumerate(parse_plot(open(argv[2]).read()), 1):
+        r = p.render(s['or'], s['bas'], s['ext'])
+        save('{}.{}.png'.format(prefix, n), r, edges=True)
+        save('{}.{}.mat.png'.format(prefix, n), materials(r, rawcells),
+             edges=True)
+        print n, s
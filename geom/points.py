@@ -0,0 +1,235 @@
+"""
+Location of points in the geometry model.
+
+Senses of points with respect to surfaces are computed with NumPy for arrays of
+points at once, and combined according to the cell geometry (see rpn.py). There
+is no loop over points in Python.
+
+Example::
+
+    cells, surfs, trans = get_geom(MIP(fname))
+    points = numpy.random.rand(10**6, 3) * 100
+    c = find_cells(cells, surfs, trans, points)
+"""
+
+import numpy as np
+
+from quadrics import Shape
+from rpn import RPN
+from semantics import Cell
+
+
+def get_shapes(surfaces, transforms, names=None):
+    """
+    Return dictionary of quadrics.Shape instances for surfaces.
+
+    `surfaces` and `transforms` are dictionaries returned by
+    surfaces.get_surfaces() and transforms.get_transforms(). If `names` is
+    given, only these surfaces are considered.
+    """
+    if names is None:
+        names = surfaces.keys()
+    res = {}
+    for k in names:
+        bc, tr, stype, pl = surfaces[k]
+        # Negative tr denotes periodic boundary, not transformation
+        tr = int(tr) if tr.strip() else 0
+        res[k] = Shape(stype, pl, transforms[tr] if tr > 0 else None)
+    return res
+
+
+def surface_senses(surfaces, transforms, points):
+    """
+    Return dictionary with boolean arrays for all surfaces. An array element is
+    True when the point has negative sense with respect to the surface.
+
+    `points` is an array of shape (N, 3).
+    """
+    points = np.asarray(points, dtype=float)
+    res = {}
+    for k, s in get_shapes(surfaces, transforms).items():
+        res[k] = s.sense(points)
+    return res
+
+
+def get_rpn(cells):
+    """
+    Return dictionary with RPN representation of cells, whose geometry is
+    given as tree or as RPN. Cells with other geometry representation (e.g.
+    not resolved "like n but" cells) are not included.
+    """
+    res = cells.__class__()
+    for k, v in cells.items():
+        if isinstance(v, RPN):
+            res[k] = v
+        elif isinstance(v, (tuple, int, Cell)):
+            res[k] = RPN.from_tree(v)
+    return res
+
+
+class Senses(object):
+    """
+    Senses of `points` with respect to surfaces (quadrics.Shape instances in
+    `shapes`), computed only for the requested rows and kept for later
+    requests. See Locator.inside().
+    """
+    def __init__(self, shapes, points):
+        self.shapes = shapes
+        self.points = points
+        self.values = {}
+        self.known = {}
+        return
+
+    def get(self, s, rows):
+        """
+        Return senses of points `rows` (an index array) for surface s.
+        """
+        v = self.values.get(s)
+        if v is None:
+            v = self.values[s] = np.empty(len(self.points), dtype=bool)
+            self.known[s] = np.zeros(len(self.points), dtype=bool)
+            new = rows
+        else:
+            new = rows[~self.known[s][rows]]
+        k = self.known[s]
+        if len(new) > 0:
+            v[new] = self.shapes[s].sense(self.points[new])
+            k[new] = True
+        return v[rows]
+
+
+class Locator(object):
+    """
+    Finds cells containing points.
+
+    `cells` is the dictionary of cells with geometry parsed to tree (see
+    main.get_geom()) or to RPN. `surfaces` and `transforms` are dictionaries
+    as returned by surfaces.get_surfaces() and transforms.get_transforms().
+
+    `universes` is the dictionary with the universe of each cell, see
+    cells.cell_universes(). If given, find() checks only cells of universe 0
+    (the real world) by default. Otherwise, as the geometry does not tell the
+    universes, all cells are checked: with filled universes, a point can be
+    found in a cell of a filled universe, at its coordinates before the fill
+    transformation, instead of the real world cell containing it. See
+    universes.py for the flattened geometry.
+    """
+    def __init__(self, cells, surfaces, transforms, universes=None):
+        self.cells = get_rpn(cells)
+        self.universes = universes
+        used = set()
+        for g in self.cells.values():
+            used.update(g.surfaces())
+        self.shapes = get_shapes(surfaces, transforms, used)
+        return
+
+    def inside(self, name, points, senses=None, rows=None):
+        """
+        Return boolean array, True for points inside cell `name`.
+
+        `senses` is a dictionary used to store computed senses of all points,
+        or a Senses instance for `points`; `rows` is an index array to select
+        from them the points to be checked (all points if None).
+        """
+        if senses is None:
+            senses = {}
+        if rows is None:
+            rows = Ellipsis
+
+        if isinstance(senses, Senses):
+            def sense(s):
+                return senses.get(s, rows)
+        else:
+            def sense(s):
+                if s not in senses:
+                    senses[s] = self.shapes[s].sense(points)
+                return senses[s][rows]
+
+        def cells(c):
+            if c in stack:
+                raise ValueError('Circular reference to cell {}'.format(c))
+            stack.add(c)
+            r = self.cells[c].contains(sense, cells)
+            stack.remove(c)
+            return r
+
+        stack = set((name, ))
+        return self.cells[name].contains(sense, cells)
+
+    def find(self, points, names=None, chunk=2**16, index=None):
+        """
+        Return array of names of cells containing points, an (N, 3) array.
+        Zero is returned for points not found in any cell.
+
+        If several cells contain a point, the first one (in the order of
+        `names`, or of cells in the input file) is returned. By default,
+        `names` are all cells, or cells of universe 0 if the universes of
+        cells are known (see the class description). Points are
+        processed in chunks of `chunk` elements, to limit memory usage.
+
+        If `index`, a spatial.GridIndex, is given, each cell is checked only
+        for points in its bounding box.
+        """
+        points = np.asarray(points, dtype=float)
+        if names is None:
+            names = self.cells.keys()
+            if self.universes is not None:
+                names = [k for k in names if self.universes.get(k, 0) == 0]
+        if index is not None:
+            return self._find_indexed(points, names, index, chunk)
+        res = np.zeros(len(points), dtype=int)
+        for i1 in range(0, len(points), chunk):
+            p = points[i1:i1 + chunk]
+            r = res[i1:i1 + chunk]
+            senses = {}
+            # Cells are checked only for points not found yet. Rows of these
+            # points are selected from senses only when there are few of them,
+            # since the selection is more expensive than the check.
+            todo = np.ones(len(p), dtype=bool)
+            rows = None
+            for c in names:
+                inside = self.inside(c, p, senses, rows)
+                if rows is None:
+                    inside &= todo
+                    r[inside] = c
+                    todo &= ~inside
+                    if not todo.any():
+                        break
+                    if todo.sum() < len(p) / 4:
+                        rows = todo.nonzero()[0]
+                else:
+                    r[rows[inside]] = c
+                    rows = rows[~inside]
+                    if len(rows) == 0:
+                        break
+        return res
+
+    def _find_indexed(self, points, names, index, chunk):
+        res = np.zeros(len(points), dtype=int)
+        pos = dict((n, i) for i, n in enumerate(index.names.tolist()))
+        for i1 in range(0, len(points), chunk):
+            p = points[i1:i1 + chunk]
+            r = res[i1:i1 + chunk]
+            rows = index.cell_points(p)
+            # Senses of surfaces shared by several cells are computed once,
+            # only for points in the boxes of these cells
+            senses = Senses(self.shapes, p)
+            for c in names:
+                if c in pos:
+                    k = rows(pos[c])
+                else:
+                    k = np.arange(len(p))
+                k = k[r[k] == 0]
+                if len(k) > 0:
+                    r[k[self.inside(c, p, senses, k)]] = c
+        return res
+
+
+def find_cells(cells, surfaces, transforms, points, chunk=2**16, index=None,
+               universes=None):
+    """
+    Return array of names of cells containing points. See Locator.find() and
+    the Locator class description for `universes`.
+    """
+    return Locator(cells, surfaces, transforms, universes).find(
+        points, chunk=chunk, index=index)
@@ -0,0 +1,333 @@
+"""
+Numerical models of MCNP surfaces.
+
+All MCNP surfaces, except tori, are quadrics. A quadric is defined in its local
+coordinate system by the symmetric 4x4 matrix Q, so that the surface function
+is
+
+    f(x, y, z) = (x, y, z, 1) Q (x, y, z, 1)^T.
+
+Points with f < 0 have negative sense with respect to the surface. Tori are
+described by their center, axis and radii.
+
+Coordinates of a point in the surface's local system are obtained from the
+main (global) ones as
+
+    local = R (main - o),
+
+where o and R are the translation vector and the rotation matrix from the tr
+card (see transforms.get_transforms()). This is the inverse of
+transforms.transform_point().
+
+Lengths are in cm, as in the MCNP input.
+
+Distances from points to surfaces along rays are the roots of a quadratic
+equation, or of a quartic one for tori. Quartic equations of all rays are
+solved at once, as eigenvalues of the stacked companion matrices.
+"""
+
+import numpy as np
+
+
+def quadric(A, v=(0, 0, 0), g=(0, 0, 0), h=0.0):
+    """
+    Return matrix Q for the surface function
+
+        f(x) = (x - v)^T A (x - v) + g (x - v) + h.
+    """
+    A = np.array(A, dtype=float)
+    v = np.array(v, dtype=float)
+    g = np.array(g, dtype=float)
+    Q = np.zeros((4, 4))
+    Q[:3, :3] = A
+    b = -2 * A.dot(v) + g
+    Q[:3, 3] = b / 2
+    Q[3, :3] = b / 2
+    Q[3, 3] = v.dot(A).dot(v) - g.dot(v) + h
+    return Q
+
+
+def _plane(n, d):
+    """
+    Plane n x - d = 0.
+    """
+    return quadric(np.zeros((3, 3)), g=n, h=-d)
+
+
+def _axis(k):
+    """
+    Return unit vector along axis k (0, 1 or 2 for x, y and z)
+    """
+    e = np.zeros(3)
+    e[k] = 1.0
+    return e
+
+
+def _sphere(v, r):
+    return quadric(np.eye(3), v, h=-r**2)
+
+
+def _cylinder(k, v, r):
+    """
+    Cylinder parallel to axis k, passing through point v.
+    """
+    e = _axis(k)
+    return quadric(np.eye(3) - np.outer(e, e), v, h=-r**2)
+
+
+def _cone(k, v, t2):
+    """
+    Cone with axis parallel to axis k, apex at v and t2 = tan^2 of half-angle.
+    """
+    e = _axis(k)
+    return quadric(np.eye(3) - (1 + t2) * np.outer(e, e), v)
+
+
+def _plane3(p):
+    """
+    Plane through three points. The origin has negative sense. If the plane
+    passes the origin, the point (0, 0, inf), (0, inf, 0) or (inf, 0, 0) has
+    positive sense, in this order of preference.
+    """
+    p1, p2, p3 = np.reshape(p, (3, 3))
+    n = np.cross(p2 - p1, p3 - p1)
+    d = n.dot(p1)
+    if d < 0 or (d == 0 and tuple(n[::-1]) < (0, 0, 0)):
+        n = -n
+        d = -d
+    return _plane(n, d)
+
+
+def _points(k, p):
+    """
+    Axisymmetric surface around axis k, defined by 1, 2 or 3 pairs of
+    coordinates (axial, radial). Returns Q and sheet.
+    """
+    p = np.array(p, dtype=float)
+    a = p[0::2]  # axial coordinates
+    r = p[1::2]  # radii
+    e = _axis(k)
+    if len(p) == 2 or (len(p) == 4 and a[0] == a[1]):
+        return _plane(e, a[0]), None
+    elif len(p) == 4 and r[0] == r[1]:
+        return _cylinder(k, (0, 0, 0), r[0]), None
+    elif len(p) == 4:
+        # cone. Only the sheet containing the points.
+        s = (r[1] - r[0]) / (a[1] - a[0])
+        a0 = a[0] - r[0]/s
+        return _cone(k, e*a0, s**2), (k, a0, np.sign(a[0] - a0))
+    elif len(p) == 6:
+        # r^2 = c2 a^2 + c1 a + c0
+        c2, c1, c0 = np.linalg.solve(np.vander(a, 3), r**2)
+        Q = quadric(np.eye(3) - (1 + c2)*np.outer(e, e), g=-c1*e, h=-c0)
+        return Q, None
+    raise ValueError('Wrong number of parameters for surface defined by '
+                     'points: {}'.format(len(p)))
+
+
+def quartic_roots(c):
+    """
+    Return real roots of polynomials with coefficients c, an (N, 5) array,
+    highest power first. The leading coefficients must not be zero. Result is
+    an (N, 4) array, complex roots are replaced by nan.
+    """
+    c = np.asarray(c, dtype=float)
+    n = len(c)
+    M = np.zeros((n, 4, 4))
+    M[:, 0, :] = -c[:, 1:] / c[:, :1]
+    M[:, 1, 0] = M[:, 2, 1] = M[:, 3, 2] = 1.0
+    r = np.linalg.eigvals(M)
+    real = abs(r.imag) <= 1e-7 * (1 + abs(r.real))
+    return np.where(real, r.real, np.nan)
+
+
+def get_quadric(stype, p):
+    """
+    Return Q and sheet for the MCNP surface of type `stype` with parameters p.
+
+    For one-sheet cones, `sheet` is the tuple (k, a0, s), where k is the axis,
+    a0 is the apex coordinate along it and s = +1 or -1 is the sheet. Points
+    with s*(x_k - a0) < 0 have positive sense. For other surfaces, sheet is
+    None.
+    """
+    sheet = None
+    if stype == 'p' and len(p) == 4:
+        Q = _plane(p[:3], p[3])
+    elif stype == 'p':
+        Q = _plane3(p)
+    elif stype in ('px', 'py', 'pz'):
+        Q = _plane(_axis('xyz'.index(stype[1])), p[0])
+    elif stype == 'so':
+        Q = _sphere((0, 0, 0), p[0])
+    elif stype == 's':
+        Q = _sphere(p[:3], p[3])
+    elif stype in ('sx', 'sy', 'sz'):
+        Q = _sphere(_axis('xyz'.index(stype[1])) * p[0], p[1])
+    elif stype in ('cx', 'cy', 'cz'):
+        Q = _cylinder('xyz'.index(stype[1]), (0, 0, 0), p[0])
+    elif stype in ('c/x', 'c/y', 'c/z'):
+        k = 'xyz'.index(stype[2])
+        v = list(p[:2])
+        v.insert(k, 0.0)
+        Q = _cylinder(k, v, p[2])
+    elif stype in ('kx', 'ky', 'kz'):
+        k = 'xyz'.index(stype[1])
+        Q = _cone(k, _axis(k) * p[0], p[1])
+        if len(p) > 2 and p[2] != 0:
+            sheet = (k, p[0], np.sign(p[2]))
+    elif stype in ('k/x', 'k/y', 'k/z'):
+        k = 'xyz'.index(stype[2])
+        Q = _cone(k, p[:3], p[3])
+        if len(p) > 4 and p[4] != 0:
+            sheet = (k, p[k], np.sign(p[4]))
+    elif stype == 'sq':
+        A, B, C, D, E, F, G, x, y, z = p
+        Q = quadric(np.diag((A, B, C)), (x, y, z), (2*D, 2*E, 2*F), G)
+    elif stype == 'gq':
+        A, B, C, D, E, F, G, H, J, K = p
+        M = ((A, D/2., F/2.),
+             (D/2., B, E/2.),
+             (F/2., E/2., C))
+        Q = quadric(M, g=(G, H, J), h=K)
+    elif stype in ('x', 'y', 'z'):
+        Q, sheet = _points('xyz'.index(stype), p)
+    else:
+        raise NotImplementedError(
+            'Surface type {} is not supported'.format(stype))
+    return Q, sheet
+
+
+class Shape(object):
+    """
+    Numerical model of an MCNP surface.
+
+    `stype` and `params` are the surface type and list of parameters, `tr` --
+    optional list of 12 transformation parameters, see
+    transforms.get_transforms().
+    """
+    def __init__(self, stype, params, tr=None):
+        self.stype = stype
+        self.Q = None
+        self.sheet = None
+        self.torus = None
+        if stype in ('tx', 'ty', 'tz'):
+            x, y, z, A, B, C = params
+            self.torus = ('xyz'.index(stype[1]), np.array((x, y, z)), A, B, C)
+        else:
+            self.Q, self.sheet = get_quadric(stype, params)
+            # Q is not needed for linear and constant terms only:
+            self.linear = not self.Q[:3, :3].any()
+        if tr is None:
+            self.o = None
+            self.R = None
+        else:
+            self.o = np.array(tr[:3], dtype=float)
+            self.R = np.reshape(np.array(tr[3:12], dtype=float), (3, 3))
+        # Quadric in the main system, Qm = T^T Q T, where T transforms
+        # homogeneous coordinates from the main system to the local one.
+        self.Qm = self.Q
+        if self.Q is not None and self.o is not None:
+            T = np.eye(4)
+            T[:3, :3] = self.R
+            T[:3, 3] = -self.R.dot(self.o)
+            self.Qm = T.T.dot(self.Q).dot(T)
+        return
+
+    def local(self, points):
+        """
+        Return coordinates of points (N x 3 array) in the local system.
+        """
+        if self.o is None:
+            return points
+        return (points - self.o).dot(self.R.T)
+
+    def direction(self, d):
+        """
+        Return directions d (N x 3 array) in the local system.
+        """
+        if self.R is None:
+            return d
+        return d.dot(self.R.T)
+
+    def f(self, points):
+        """
+        Return values of the surface function at points, an N x 3 array of
+        coordinates in the main system.
+        """
+        points = np.asarray(points, dtype=float)
+        if self.torus is not None:
+            k, v, A, B, C = self.torus
+            d = self.local(points) - v
+            a = d[:, k].copy()
+            d[:, k] = 0
+            rho = np.sqrt((d**2).sum(axis=1))
+            return a**2/B**2 + (rho - A)**2/C**2 - 1.0
+        Q = self.Qm
+        res = points.dot(2*Q[:3, 3]) + Q[3, 3]
+        if not self.linear:
+            res += np.einsum('ij,ij->i', points.dot(Q[:3, :3]), points)
+        return res
+
+    def sense(self, points):
+        """
+        Return boolean array, True for points with negative sense.
+        """
+        neg = self.f(points) < 0
+        if self.sheet is not None:
+            k, a0, s = self.sheet
+            a = self.local(np.asarray(points, dtype=float))[:, k]
+            neg &= s*(a - a0) >= 0
+        return neg
+
+    def intersect(self, o, d):
+        """
+        Return distances from points o along directions d (both N x 3 arrays)
+        to the surface. The result is an (N, 2) array, or (N, 4) for tori,
+        with positive distances sorted in increasing order; missing
+        intersections are inf.
+
+        Distances are in units of d. The result can contain distances, where
+        the sense of points does not change, e.g. to the second sheet of a
+        one-sheet cone.
+        """
+        o = np.asarray(o, dtype=float)
+        d = np.asarray(d, dtype=float)
+        if self.torus is not None:
+            k, v, A, B, C = self.torus
+            p = self.local(o) - v
+            D = self.direction(d).copy()
+            pk = p[:, k].copy()
+            dk = D[:, k].copy()
+            p[:, k] = 0
+            D[:, k] = 0
+            e = C**2 / B**2
+            # rho^2 and g = rho^2 + e a^2 + A^2 - C^2 as polynomials of t
+            r2 = np.array(((D*D).sum(axis=1), 2*(p*D).sum(axis=1),
+                           (p*p).sum(axis=1))).T
+            g = r2 + e * np.array((dk**2, 2*pk*dk, pk**2)).T
+            g[:, 2] += A**2 - C**2
+            c = np.zeros((len(o), 5))
+            for i in range(3):
+                for j in range(3):
+                    c[:, i + j] += g[:, i] * g[:, j]
+            c[:, 2:] -= 4 * A**2 * r2
+            t = quartic_roots(c)
+        else:
+            Q = self.Qm
+            A = Q[:3, :3]
+            q = Q[:3, 3]
+            oA = o.dot(A)
+            a = np.einsum('ij,ij->i', d.dot(A), d)
+            b = 2 * np.einsum('ij,ij->i', d, oA + q)
+            c = np.einsum('ij,ij->i', oA, o) + 2 * o.dot(q) + Q[3, 3]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                lin = abs(a) <= 1e-12 * (abs(b) + abs(c))
+                s = np.sqrt(b**2 - 4*a*c)
+                h = -0.5 * (b + np.where(b < 0, -s, s))
+                t1 = np.where(lin, -c / b, h / a)
+                t2 = np.where(lin, np.inf, c / h)
+            t = np.array((t1, t2)).T
+        with np.errstate(invalid='ignore'):
+            t[~(t > 0)] = np.inf
+        t.sort(axis=1)
+        return t
@@ -0,0 +1,221 @@
+"""
+Ray tracing through the geometry model.
+
+Distances from ray origins to all surfaces of the model are computed with
+NumPy for batches of rays (see quadrics.Shape.intersect()). Between two
+consecutive intersections a ray does not cross any surface, thus the whole
+segment belongs to the same cells. Cells containing the segment are found by
+locating its middle point (see points.py).
+
+Segments not belonging to any cell are undefined regions (where particles get
+lost), segments belonging to several cells are overlaps.
+
+Cells are located as they are in the input: cells of different universes
+overlap.
+
+Example::
+
+    cells, surfs, trans = get_geom(MIP(fname))
+    d = isotropic(10**4, numpy.random.RandomState(0))
+    segments, errors = trace(cells, surfs, trans, (0, 0, 0), d, workers=4)
+    for kind, ray, cells, p1, p2 in errors:
+        print kind, ray, cells, p1, p2
+"""
+
+from multiprocessing import Pool
+
+import numpy as np
+
+from points import Locator
+
+# Relative tolerance for zero-length segments
+_eps = 1e-9
+
+
+def isotropic(n, rng):
+    """
+    Return (n, 3) array of isotropically distributed unit vectors. `rng` is an
+    instance of numpy.random.RandomState.
+    """
+    d = rng.normal(size=(n, 3))
+    d /= np.sqrt((d**2).sum(axis=1))[:, np.newaxis]
+    return d
+
+
+class RayTracer(object):
+    """
+    Traces rays through cells.
+
+    `cells` is the dictionary of cells with geometry parsed to tree (see
+    main.get_geom()) or to RPN. `surfaces` and `transforms` are dictionaries
+    as returned by surfaces.get_surfaces() and transforms.get_transforms().
+    `index` is an optional spatial.GridIndex, to locate segments faster.
+    """
+    def __init__(self, cells, surfaces, transforms, index=None):
+        self.locator = Locator(cells, surfaces, transforms)
+        self.index = index
+        return
+
+    def crossings(self, o, d, tmax=np.inf):
+        """
+        Return distances from o along d to all surfaces, as an (N, M) array
+        sorted along rows. Distances larger than `tmax` are replaced by inf.
+        """
+        t = [s.intersect(o, d) for s in self.locator.shapes.values()]
+        if not t:
+            return np.zeros((len(o), 0))
+        t = np.hstack(t)
+        t[t > tmax] = np.inf
+        t.sort(axis=1)
+        # Only columns with at least one intersection are needed
+        return t[:, :np.isfinite(t).sum(axis=1).max()]
+
+    def locate(self, points):
+        """
+        Return number of cells containing points and names of the first two
+        of them (0 if there are less cells).
+        """
+        n = np.zeros(len(points), dtype=int)
+        first = np.zeros(len(points), dtype=int)
+        other = np.zeros(len(points), dtype=int)
+        if self.index is not None:
+            rows = self.index.cell_points(points)
+            pos = dict((c, i) for i, c in enumerate(self.index.names.tolist()))
+        for c in self.locator.cells.keys():
+            if self.index is not None and c in pos:
+                r = rows(pos[c])
+                r = r[self.locator.inside(c, points[r])]
+            else:
+                r = np.nonzero(self.locator.inside(c, points))[0]
+            n[r] += 1
+            other[r[(first[r] != 0) & (other[r] == 0)]] = c
+            first[r[first[r] == 0]] = c
+        return n, first, other
+
+    def segments(self, o, d, tmax=np.inf, probe=1.0):
+        """
+        Return segments of rays from points o along directions d (both N x 3
+        arrays) up to the distance `tmax`.
+
+        The result is a record array with fields ray (index of the ray), t1
+        and t2 (distances to the segment ends), n (number of cells containing
+        the segment), cell and other (names of the first two of these cells, or
+        0). Consecutive segments of a ray with equal cells are merged.
+
+        If `tmax` is infinite, the last segment of each ray is infinite; its
+        cells are found at the distance `probe` after its beginning.
+        """
+        o = np.asarray(o, dtype=float).reshape(-1, 3)
+        d = np.asarray(d, dtype=float).reshape(-1, 3)
+        o = np.broadcast_to(o, d.shape) if len(o) == 1 else o
+        t = self.crossings(o, d, tmax)
+        z = np.zeros((len(d), 1))
+        t1 = np.hstack((z, t))
+        # Crossings beyond tmax are inf, segment ends are capped by tmax
+        t2 = np.minimum(np.hstack((t, z + np.inf)), tmax)
+        with np.errstate(invalid='ignore'):
+            valid = (t1 < tmax) & (t2 - t1 > _eps * (1 + abs(t1)))
+        ray = np.nonzero(valid)[0]
+        t1 = t1[valid]
+        t2 = t2[valid]
+        mid = np.where(np.isinf(t2), t1 + probe, 0.5 * (t1 + t2))
+        n, first, other = self.locate(o[ray] + mid[:, np.newaxis] * d[ray])
+
+        # Merge consecutive segments of the same ray with the same cells
+        new = np.ones(len(ray), dtype=bool)
+        new[1:] = ((ray[1:] != ray[:-1]) | (n[1:] != n[:-1]) |
+                   (first[1:] != first[:-1]) | (other[1:] != other[:-1]))
+        i1 = np.nonzero(new)[0]
+        i2 = np.append(i1[1:], len(ray)) - 1
+        return np.rec.fromarrays((ray[i1], t1[i1], t2[i2], n[i1], first[i1],
+                                  other[i1]),
+                                 names='ray,t1,t2,n,cell,other')
+
+    def errors(self, segments, o, d):
+        """
+        Return list of undefined regions and overlaps in `segments`, as
+        returned by segments() for rays o, d.
+
+        Each element is the tuple (kind, ray, cells, p1, p2), where kind is
+        'undefined' or 'overlap', `cells` is the tuple of overlapping cells,
+        p1 and p2 -- coordinates of the segment ends.
+        """
+        o = np.asarray(o, dtype=float).reshape(-1, 3)
+        d = np.asarray(d, dtype=float).reshape(-1, 3)
+        o = np.broadcast_to(o, d.shape) if len(o) == 1 else o
+        bad = np.nonzero(segments.n != 1)[0]
+        s = segments[bad]
+        with np.errstate(invalid='ignore'):
+            p1 = o[s.ray] + s.t1[:, np.newaxis] * d[s.ray]
+            p2 = o[s.ray] + s.t2[:, np.newaxis] * d[s.ray]
+        # All cells of overlaps, when there are more than two
+        cells = [[] for e in s]
+        many = np.nonzero(s.n > 2)[0]
+        if len(many) > 0:
+            mid = 0.5 * (s.t1[many] + np.minimum(s.t2[many], s.t1[many] + 2))
+            pm = o[s.ray[many]] + mid[:, np.newaxis] * d[s.ray[many]]
+            for c in self.locator.cells.keys():
+                for j in np.nonzero(self.locator.inside(c, pm))[0]:
+                    cells[many[j]].append(c)
+        res = []
+        for j, e in enumerate(s):
+            if e.n == 0:
+                res.append(('undefined', e.ray, (), p1[j], p2[j]))
+            else:
+                c = tuple(cells[j]) if cells[j] else (e.cell, e.other)
+                res.append(('overlap', e.ray, c, p1[j], p2[j]))
+        return res
+
+
+# Ray tracer used by _trace(). In worker processes it is set by _init().
+_tracer = None
+
+
+def _init(cells, surfaces, transforms, index):
+    global _tracer
+    _tracer = RayTracer(cells, surfaces, transforms, index)
+
+
+def _trace(args):
+    o, d, tmax = args
+    s = _tracer.segments(o, d, tmax)
+    return s, _tracer.errors(s, o, d)
+
+
+def trace(cells, surfaces, transforms, o, d, tmax=np.inf, batch=1000,
+          workers=None, index=None):
+    """
+    Trace rays from points o along directions d, and return their segments
+    and errors, see RayTracer.segments() and RayTracer.errors(). Ray indices
+    in the result refer to the whole array of rays.
+
+    `o` is an (N, 3) array, or a single point for all rays. Rays are traced in
+    batches of `batch` rays, in a pool of `workers` processes if it is
+    greater than 1.
+    """
+    d = np.asarray(d, dtype=float).reshape(-1, 3)
+    o = np.asarray(o, dtype=float).reshape(-1, 3)
+    if len(o) == 1:
+        o = np.repeat(o, len(d), axis=0)
+    args = []
+    for i in range(0, len(d), batch):
+        args.append((o[i:i + batch], d[i:i + batch], tmax))
+    if workers > 1:
+        pool = Pool(workers, _init, (cells, surfaces, transforms, index))
+        try:
+            results = pool.map(_trace, args)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        _init(cells, surfaces, transforms, index)
+        results = map(_trace, args)
+
+    segments = []
+    errors = []
+    for i, (s, e) in zip(range(0, len(d), batch), results):
+        s.ray += i
+        segments.append(s)
+        for kind, ray, c, p1, p2 in e:
+            errors.append((kind, ray + i, c, p1, p2))
+    return np.hstack(segments).view(np.recarray), errors
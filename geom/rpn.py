@@ -0,0 +1,183 @@
+"""
+Flat representation of the cell geometry in postfix (reverse Polish) notation.
+
+The geometry tree, returned by parsegeom.get_ast(), is stored as two arrays of
+equal length: opcodes and signed ids. Operands are pushed to a stack, operators
+take two operands from the stack and push the result. For example, the tree
+('*', 1, (':', -2, 3)) is represented as:
+
+    ops:  SURF SURF SURF OR AND
+    ids:  1    -2   3    0  0
+
+All operations on this representation are loops over the arrays, without
+recursion.
+"""
+
+from array import array
+
+from semantics import GeomExpression, Surface, Cell
+
+# Opcodes
+SURF = 0   # surface, the id is the signed surface name
+CELL = 1   # cell, id n > 0 means complement of cell n (#n), id -n -- cell n
+AND = 2    # intersection
+OR = 3     # union
+
+# Opcodes for the tree operators, and vice versa
+_opcode = {'*': AND, ':': OR}
+_operator = {AND: '*', OR: ':'}
+
+
+class RPN(object):
+    """
+    Cell geometry as arrays of opcodes and ids in postfix order.
+    """
+    __slots__ = ('ops', 'ids')
+
+    def __init__(self, ops=None, ids=None):
+        self.ops = array('b', ops or [])
+        self.ids = array('l', ids or [])
+        return
+
+    def __getstate__(self):
+        return self.ops, self.ids
+
+    def __setstate__(self, state):
+        self.ops, self.ids = state
+
+    def __len__(self):
+        return len(self.ops)
+
+    def __eq__(self, other):
+        return self.ops == other.ops and self.ids == other.ids
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'RPN({})'.format(self.evaluate())
+
+    @classmethod
+    def from_tree(cls, ast):
+        """
+        Return RPN for the tree returned by parsegeom.get_ast().
+        """
+        res = cls()
+        ops = res.ops
+        ids = res.ids
+        # Post-order traversal with explicit stack. Operators are put on the
+        # stack as strings.
+        todo = [ast]
+        while todo:
+            e = todo.pop()
+            if isinstance(e, GeomExpression):
+                todo.append(e[0])
+                todo.append(e[2])
+                todo.append(e[1])
+            elif isinstance(e, Surface):
+                ops.append(SURF)
+                ids.append(e)
+            elif isinstance(e, Cell):
+                ops.append(CELL)
+                ids.append(int(e))
+            elif e in _opcode:
+                ops.append(_opcode[e])
+                ids.append(0)
+            else:
+                raise TypeError('Cannot convert {} to RPN'.format(repr(e)))
+        return res
+
+    def to_tree(self):
+        """
+        Return geometry as tree of semantics.GeomExpression.
+        """
+        stack = []
+        for o, i in zip(self.ops, self.ids):
+            if o == SURF:
+                stack.append(Surface(i))
+            elif o == CELL:
+                if i < 0:
+                    raise ValueError('Cell {} cannot be represented as '
+                                     'tree'.format(-i))
+                stack.append(Cell(i))
+            else:
+                r = stack.pop()
+                l = stack.pop()
+                stack.append(GeomExpression((_operator[o], l, r)))
+        return stack[0]
+
+    def surfaces(self):
+        """
+        Return set of surfaces used in the geometry.
+        """
+        return set(abs(i) for o, i in zip(self.ops, self.ids) if o == SURF)
+
+    def cells(self):
+        """
+        Return set of cells referred in the geometry.
+        """
+        return set(abs(i) for o, i in zip(self.ops, self.ids) if o == CELL)
+
+    def complement(self):
+        """
+        Return complement of the geometry.
+
+        According to De Morgan's laws, this is the same expression with
+        inverted operands and swapped operators. The order of tokens is not
+        changed.
+        """
+        swap = {SURF: SURF, CELL: CELL, AND: OR, OR: AND}
+        ops = [swap[o] for o in self.ops]
+        ids = [-i for i in self.ids]
+        return self.__class__(ops, ids)
+
+    def evaluate(self):
+        """
+        Return string representation, the same as returned by
+        semantics.GeomExpression.evaluate().
+        """
+        stack = []
+        for o, i in zip(self.ops, self.ids):
+            if o == SURF or o == CELL:
+                stack.append(str(i))
+            else:
+                r = stack.pop()
+                l = stack.pop()
+                stack.append('({} {} {})'.format(l, _operator[o], r))
+        return stack[0]
+
+    def contains(self, sense, cells=None):
+        """
+        Return True for points inside the cell.
+
+        `sense(s)` must return True for points with negative sense with
+        respect to surface s > 0. `cells(n)` must return True for points
+        inside cell n; it is needed only if the geometry refers to other cells.
+
+        Results of sense() and cells() can be booleans or boolean numpy arrays
+        (then the geometry is evaluated for all points at once).
+        """
+        stack = []
+        for o, i in zip(self.ops, self.ids):
+            if o == SURF:
+                v = sense(abs(i))
+                stack.append(v if i < 0 else v ^ True)
+            elif o == CELL:
+                v = cells(abs(i))
+                stack.append(v if i < 0 else v ^ True)
+            else:
+                r = stack.pop()
+                l = stack.pop()
+                stack.append(l & r if o == AND else l | r)
+        return stack[0]
+
+
+def from_cells(cells):
+    """
+    Return dictionary with RPN representation of cells, where `cells` is the
+    dictionary returned by main.get_geom().
+    """
+    res = cells.__class__()
+    for k, v in cells.items():
+        res[k] = RPN.from_tree(v)
+    return res
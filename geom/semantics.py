@@ -1,5 +1,3 @@
-from tatsu.ast import AST
-
 class Cell(str):
     def evaluate(self):
         return str(self)
@@ -12,18 +10,36 @@ class Surface(int):
         return str(self)
 
 
+# Operator, complementary to the given one.
+_inv = {'*': ':', ':': '*'}
+
+
 class GeomExpression(tuple):
     """
     Any binary operation. Can be inversed.
     """
 
     def inverse(self):
-        if self[0] == '*':
-            return GeomExpression((':', self[1].inverse(), self[2].inverse()))
-        elif self[0] == ':':
-            return GeomExpression(('*', self[1].inverse(), self[2].inverse()))
-        else:
+        if self[0] not in ('*', ':'):
             return self[0].inverse()
+        # De Morgan's laws are applied down to surfaces. Nodes are processed
+        # in post-order using explicit stacks, since long expressions would
+        # exceed the recursion limit.
+        res = []
+        todo = [(self, False)]
+        while todo:
+            e, ready = todo.pop()
+            if ready:
+                r = res.pop()
+                l = res.pop()
+                res.append(GeomExpression((_inv[e[0]], l, r)))
+            elif isinstance(e, GeomExpression):
+                todo.append((e, True))
+                todo.append((e[2], False))
+                todo.append((e[1], False))
+            else:
+                res.append(e.inverse())
+        return res[0]
 
     def evaluate(self):
         if self[0] in '*:':
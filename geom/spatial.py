@@ -0,0 +1,281 @@
+"""
+Spatial index of cells.
+
+The index is a uniform grid of voxels over the union of finite cell bounding
+boxes (see bbox.py). For each voxel, the cells whose boxes overlap it are
+stored in compressed sparse row format: cells of voxel v are
+
+    names[idx[ptr[v]:ptr[v+1]]].
+
+Cells with infinite boxes (e.g. the outer void) are not stored in the grid and
+are candidates everywhere.
+
+Example::
+
+    cells, surfs, trans = get_geom(MIP(fname))
+    index = GridIndex.build(get_boxes(cells, surfs, trans))
+    index.save('model.npz')
+    ...
+    index = GridIndex.load('model.npz')
+    c = Locator(cells, surfs, trans).find(points, index=index)
+"""
+
+import numpy as np
+
+_inf = float('inf')
+
+
+def _ranges(starts, ends):
+    """
+    Return concatenation of ranges starts[i]:ends[i].
+    """
+    n = ends - starts
+    keep = n > 0
+    starts = starts[keep]
+    n = n[keep]
+    if len(n) == 0:
+        return np.zeros(0, dtype=int)
+    # offsets of the first element of each range in the result
+    o = np.cumsum(n) - n
+    res = np.ones(n.sum(), dtype=int)
+    res[0] = starts[0]
+    res[o[1:]] = starts[1:] - (starts[:-1] + n[:-1] - 1)
+    return np.cumsum(res)
+
+
+def box_hits(lo, hi, o, d):
+    """
+    Return distances where the ray o + t d enters and leaves boxes, given by
+    arrays lo and hi of shape (n, 3). The ray misses a box if tin > tout.
+    """
+    lo = np.asarray(lo, dtype=float)
+    hi = np.asarray(hi, dtype=float)
+    o = np.asarray(o, dtype=float)
+    d = np.asarray(d, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t1 = (lo - o) / d
+        t2 = (hi - o) / d
+    tmin = np.minimum(t1, t2)
+    tmax = np.maximum(t1, t2)
+    # Ray parallel to the box faces
+    par = d == 0
+    if par.any():
+        inside = (lo <= o) & (o <= hi)
+        tmin[:, par] = np.where(inside[:, par], -_inf, _inf)
+        tmax[:, par] = np.where(inside[:, par], _inf, -_inf)
+    return tmin.max(axis=1), tmax.min(axis=1)
+
+
+class GridIndex(object):
+    """
+    Uniform grid of voxels with lists of cells, whose boxes overlap them.
+
+    `names` is the array of cell names, `lo` and `hi` -- arrays of shape
+    (n, 3) with their boxes. The grid starts at `origin`, has voxels of size
+    `step` and `shape` voxels along each axis. `ptr` and `idx` describe cells
+    of each voxel, `unbounded` -- indices of cells with infinite boxes.
+
+    Use build() to create the index from cell boxes.
+    """
+    _arrays = ('names', 'lo', 'hi', 'origin', 'step', 'shape', 'ptr', 'idx',
+               'unbounded')
+
+    def __init__(self, names, lo, hi, origin, step, shape, ptr, idx,
+                 unbounded):
+        self.names = np.asarray(names)
+        self.lo = np.asarray(lo, dtype=float)
+        self.hi = np.asarray(hi, dtype=float)
+        self.origin = np.asarray(origin, dtype=float)
+        self.step = np.asarray(step, dtype=float)
+        self.shape = np.asarray(shape, dtype=int)
+        self.ptr = np.asarray(ptr, dtype=int)
+        self.idx = np.asarray(idx, dtype=int)
+        self.unbounded = np.asarray(unbounded, dtype=int)
+        # Memoized results of columns()
+        self._columns = {}
+        return
+
+    @classmethod
+    def build(cls, boxes, per_voxel=1.0, max_dim=512):
+        """
+        Return index for `boxes`, a dictionary of cell boxes as returned by
+        bbox.get_boxes().
+
+        The voxel size is chosen to have about `per_voxel` finite cells per
+        voxel, but not more than `max_dim` voxels along each axis.
+        """
+        names = np.array(boxes.keys())
+        lo = np.array([b[0] for b in boxes.values()], dtype=float)
+        hi = np.array([b[1] for b in boxes.values()], dtype=float)
+        lo = lo.reshape(-1, 3)
+        hi = hi.reshape(-1, 3)
+        empty = (lo > hi).any(axis=1)
+        finite = np.isfinite(lo).all(axis=1) & np.isfinite(hi).all(axis=1)
+        finite &= ~empty
+        unbounded = np.nonzero(~finite & ~empty)[0]
+        if finite.any():
+            glo = lo[finite].min(axis=0)
+            ghi = hi[finite].max(axis=0)
+        else:
+            glo = np.zeros(3)
+            ghi = np.ones(3)
+        ext = ghi - glo
+        # Flat dimensions
+        ext[ext <= 0] = max(ext.max(), 1.0) * 1e-3
+        h = (np.prod(ext) * per_voxel / max(finite.sum(), 1))**(1./3)
+        shape = np.clip(np.ceil(ext / h), 1, max_dim).astype(int)
+        step = ext / shape
+
+        # Voxel ranges of finite boxes
+        cf = np.nonzero(finite)[0]
+        i1 = np.clip(np.floor((lo[cf] - glo) / step), 0, shape - 1)
+        i2 = np.clip(np.floor((hi[cf] - glo) / step), 0, shape - 1)
+        i1 = i1.astype(int)
+        n = (i2.astype(int) - i1 + 1)
+        # Pairs (voxel, cell), cell by cell
+        cnt = n.prod(axis=1)
+        cell = np.repeat(cf, cnt)
+        k = np.arange(cnt.sum()) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+        nr = np.repeat(n, cnt, axis=0)
+        ijk = np.repeat(i1, cnt, axis=0)
+        ijk[:, 2] += k % nr[:, 2]
+        ijk[:, 1] += (k // nr[:, 2]) % nr[:, 1]
+        ijk[:, 0] += k // (nr[:, 2] * nr[:, 1])
+        vox = np.ravel_multi_index(ijk.T, shape)
+        order = np.argsort(vox, kind='mergesort')
+        ptr = np.zeros(shape.prod() + 1, dtype=int)
+        ptr[1:] = np.cumsum(np.bincount(vox, minlength=shape.prod()))
+        return cls(names, lo, hi, glo, step, shape, ptr, cell[order],
+                   unbounded)
+
+    def save(self, fname):
+        """
+        Save index to file `fname` in NumPy .npz format.
+        """
+        np.savez(fname, **dict((a, getattr(self, a)) for a in self._arrays))
+
+    @classmethod
+    def load(cls, fname):
+        """
+        Return index saved with save().
+        """
+        d = np.load(fname)
+        return cls(*[d[a] for a in cls._arrays])
+
+    def voxels(self, points):
+        """
+        Return voxel numbers for an (N, 3) array of points. Points outside the
+        grid get -1. Points on its upper faces are in the last voxels, as are
+        points beyond them by less than a voxel, so that rounding errors do
+        not lose points on the boundary of boxes.
+        """
+        p = np.asarray(points, dtype=float).reshape(-1, 3)
+        ijk = np.floor((p - self.origin) / self.step)
+        out = ((ijk < 0) | (ijk > self.shape)).any(axis=1)
+        ijk = np.minimum(ijk, self.shape - 1)
+        ijk[out] = 0
+        res = np.ravel_multi_index(ijk.astype(int).T, self.shape)
+        res[out] = -1
+        return res
+
+    def candidates(self, point):
+        """
+        Return names of cells whose boxes contain `point`.
+        """
+        p = np.asarray(point, dtype=float)
+        v = self.voxels(p)[0]
+        i = self.unbounded
+        if v >= 0:
+            i = np.concatenate((self.idx[self.ptr[v]:self.ptr[v + 1]], i))
+        i = i[((self.lo[i] <= p) & (p <= self.hi[i])).all(axis=1)]
+        return self.names[np.sort(i)]
+
+    def columns(self, i):
+        """
+        Return first voxels and lengths of the columns of voxels along z,
+        which cover the box of the finite cell with index i.
+        """
+        if i not in self._columns:
+            i1 = np.floor((self.lo[i] - self.origin) / self.step)
+            i2 = np.floor((self.hi[i] - self.origin) / self.step)
+            i1 = np.clip(i1, 0, self.shape - 1).astype(int)
+            i2 = np.clip(i2, 0, self.shape - 1).astype(int)
+            ix, iy = np.mgrid[i1[0]:i2[0] + 1, i1[1]:i2[1] + 1]
+            ix = ix.ravel()
+            iy = iy.ravel()
+            v1 = np.ravel_multi_index((ix, iy, np.repeat(i1[2], len(ix))),
+                                      self.shape)
+            self._columns[i] = v1, i2[2] - i1[2] + 1
+        return self._columns[i]
+
+    def cell_points(self, points, vox=None):
+        """
+        Return function that gives, for a cell index, indices of points in
+        the cell's box.
+
+        `vox` are voxels of points, if already known.
+        """
+        p = np.asarray(points, dtype=float)
+        if vox is None:
+            vox = self.voxels(p)
+        order = np.argsort(vox, kind='mergesort')
+        first = np.searchsorted(vox[order], np.arange(self.shape.prod() + 1))
+        unbounded = set(self.unbounded.tolist())
+
+        def rows(i):
+            if i in unbounded:
+                if np.isinf(self.lo[i]).all() and np.isinf(self.hi[i]).all():
+                    return np.arange(len(p))
+                r = np.arange(len(p))
+            else:
+                # voxels along z are contiguous
+                v1, nz = self.columns(i)
+                r = order[_ranges(first[v1], first[v1 + nz])]
+            q = p[r]
+            return r[((self.lo[i] <= q) & (q <= self.hi[i])).all(axis=1)]
+        return rows
+
+    def ray_candidates(self, o, d, tmax=_inf):
+        """
+        Return names of cells whose boxes are crossed by the ray o + t d,
+        0 <= t <= tmax, and distances where the ray enters and leaves the
+        boxes. Cells are sorted by the entry distance.
+        """
+        o = np.asarray(o, dtype=float)
+        d = np.asarray(d, dtype=float)
+        i = set(self.unbounded.tolist())
+        # Voxels crossed by the ray (3D DDA)
+        gt1, gt2 = box_hits(self.origin[np.newaxis],
+                            (self.origin + self.shape * self.step)[np.newaxis],
+                            o, d)
+        t = max(gt1[0], 0.0)
+        tend = min(gt2[0], tmax)
+        if t <= tend:
+            p = o + t * d
+            ijk = np.clip(np.floor((p - self.origin) / self.step),
+                          0, self.shape - 1).astype(int)
+            sign = np.sign(d).astype(int)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                dt = np.where(d != 0, self.step / abs(d), _inf)
+                nxt = self.origin + (ijk + (sign > 0)) * self.step
+                tn = np.where(d != 0, (nxt - o) / d, _inf)
+            while True:
+                v = np.ravel_multi_index(ijk, self.shape)
+                i.update(self.idx[self.ptr[v]:self.ptr[v + 1]].tolist())
+                k = tn.argmin()
+                if tn[k] > tend:
+                    break
+                ijk[k] += sign[k]
+                if not 0 <= ijk[k] < self.shape[k]:
+                    break
+                tn[k] += dt[k]
+        i = np.array(sorted(i), dtype=int)
+        t1, t2 = box_hits(self.lo[i], self.hi[i], o, d)
+        t1 = np.maximum(t1, 0.0)
+        t2 = np.minimum(t2, tmax)
+        hit = t1 <= t2
+        i = i[hit]
+        t1 = t1[hit]
+        t2 = t2[hit]
+        order = np.argsort(t1, kind='mergesort')
+        return self.names[i[order]], t1[order], t2[order]
@@ -12,18 +12,26 @@ def get_surfaces(input, lim=None):
     d = OrderedDict()
     n = 0
     for c in input.cards(blocks='s', skipcomments=True):
-        name, tr, t, params = c.parts()
-        bc, name = re_name.match(name).groups()
-        name = int(name)
-        t = t.strip().lower()
-        params = map(float, params.split())
-        d[name] = (bc, tr, t, params)
+        name, v = get_surface(c)
+        d[name] = v
         n += 1
         if lim and n > lim:
             break
     return d
 
 
+def get_surface(c):
+    """
+    Return name and (bc, transform, type, parameters) tuple for surface card c.
+    """
+    name, tr, t, params = c.parts()
+    bc, name = re_name.match(name).groups()
+    name = int(name)
+    t = t.strip().lower()
+    params = map(float, params.split())
+    return name, (bc, tr, t, params)
+
+
 if __name__ == '__main__':
     from sys import argv
     from mcrp_splitters import InputSplitter
@@ -1,25 +1,254 @@
 # Return dictionary describing transformations
 from collections import OrderedDict
 from math import cos, radians
+import re
+
+import numpy as np
+
+# Tolerance for non-orthogonal rotation matrices, as in MCNP
+_otol = 1e-3
+
+re_jump = re.compile('^(\d*)j$', re.IGNORECASE)
 
 
 def to_cos(a):
+    """
+    Return cosine of angle a, in degrees. Multiples of 90 give exact values.
+    """
+    if a % 90 == 0:
+        return (1.0, 0.0, -1.0, 0.0)[int(a // 90) % 4]
     return cos(radians(a))
 
 
+class Transform(tuple):
+    """
+    Immutable transformation.
+
+    The tuple contains 12 parameters as on the tr card: the origin o of the
+    local system in the main one and the rotation matrix B1, ..., B9, complete
+    and orthonormal. Attribute `matrix` is the read-only 4x4 matrix that
+    maps homogeneous local coordinates to the main ones:
+
+        main = R^T local + o,
+
+    where R is B1, ..., B9 reshaped to 3x3. See also compose().
+    """
+    def __new__(cls, params):
+        self = tuple.__new__(cls, map(float, params))
+        if len(self) != 12:
+            raise ValueError('Transformation needs 12 parameters, '
+                             '{} given'.format(len(self)))
+        M = np.eye(4)
+        M[:3, :3] = np.reshape(self[3:], (3, 3)).T
+        M[:3, 3] = self[:3]
+        M.flags.writeable = False
+        self.matrix = M
+        return self
+
+    def __reduce__(self):
+        return (Transform, (tuple(self), ))
+
+    @classmethod
+    def from_matrix(cls, M):
+        """
+        Return transformation for the 4x4 matrix M.
+        """
+        M = np.asarray(M, dtype=float)
+        return cls(M[:3, 3].tolist() + M[:3, :3].T.ravel().tolist())
+
+    def inverse(self):
+        """
+        Return inverse transformation.
+        """
+        return compose_inverse(self)
+
+    def point(self, p):
+        """
+        Return main coordinates of points p, an (N, 3) array of local ones.
+        """
+        M = self.matrix
+        return np.asarray(p, dtype=float).dot(M[:3, :3].T) + M[:3, 3]
+
+    def vector(self, v):
+        """
+        Return main components of vectors v, an (N, 3) array of local ones.
+        """
+        return np.asarray(v, dtype=float).dot(self.matrix[:3, :3].T)
+
+
+identity = Transform((0, 0, 0, 1, 0, 0, 0, 1, 0, 0, 0, 1))
+
+
+def complete_matrix(B):
+    """
+    Return complete orthonormal rotation matrix for the 3x3 matrix B, where
+    missing entries are nan.
+
+    As in MCNP, B can be given completely, by two rows or two columns (the
+    third one is their vector product), by one row and one column, or by one
+    row or column only (the other ones are chosen arbitrarily). Without
+    entries, the identity is returned. A complete matrix, not orthogonal
+    within tolerance _otol, raises ValueError; otherwise it is
+    orthonormalized.
+    """
+    B = np.array(B, dtype=float).reshape(3, 3)
+    given = ~np.isnan(B)
+    rows = given.all(axis=1)
+    cols = given.all(axis=0)
+    n = given.sum()
+    if n == 0:
+        return np.eye(3)
+    if n == 9:
+        pass
+    elif rows.sum() == 2 and n == 6:
+        i, j = np.nonzero(rows)[0]
+        k = 3 - i - j
+        B[k] = np.cross(B[(k + 1) % 3], B[(k + 2) % 3])
+    elif cols.sum() == 2 and n == 6:
+        return complete_matrix(B.T).T
+    elif rows.sum() == 1 and cols.sum() == 1 and n == 5:
+        i = np.nonzero(rows)[0][0]
+        j = np.nonzero(cols)[0][0]
+        a = B[i] / np.linalg.norm(B[i])
+        # Rows k and l are orthogonal to a, their j-th entries are given
+        k = (i + 1) % 3
+        l = (i + 2) % 3
+        p = -a[j] * a
+        p[j] += 1
+        e1 = p / np.linalg.norm(p)
+        e2 = np.cross(a, e1)
+        c = np.clip(B[k, j] / np.linalg.norm(p), -1, 1)
+        for s in (1, -1):
+            rk = c*e1 + s*(1 - c*c)**0.5*e2
+            rl = np.cross(a, rk)
+            if abs(rl[j] - B[l, j]) <= _otol:
+                break
+        else:
+            raise ValueError('Inconsistent rotation matrix {}'.format(
+                B.tolist()))
+        B[i] = a
+        B[k] = rk
+        B[l] = rl
+    elif rows.sum() == 1 and n == 3:
+        i = np.nonzero(rows)[0][0]
+        a = B[i] / np.linalg.norm(B[i])
+        e = np.eye(3)[abs(a).argmin()]
+        B[i] = a
+        B[(i + 1) % 3] = np.cross(e, a) / np.linalg.norm(np.cross(e, a))
+        B[(i + 2) % 3] = np.cross(a, B[(i + 1) % 3])
+    elif cols.sum() == 1 and n == 3:
+        return complete_matrix(B.T).T
+    else:
+        raise ValueError('Cannot complete rotation matrix {}'.format(
+            B.tolist()))
+    d = abs(B.dot(B.T) - np.eye(3)).max()
+    if d > _otol:
+        raise ValueError('Rotation matrix is not orthogonal: {}'.format(
+            B.tolist()))
+    if d > 4 * np.finfo(float).eps:
+        # The nearest orthonormal matrix
+        U, S, V = np.linalg.svd(B)
+        B = U.dot(V)
+    # no negative zeros
+    return B + 0.0
+
+
+def parse_transform(params, degrees=False):
+    """
+    Return Transform for the list of tr card entries `params` (strings or
+    numbers): origin, up to 9 entries of the rotation matrix and the m flag.
+    Jumps (j, nj) denote missing entries.
+
+    If `degrees` is True (for *tr cards), the matrix entries are angles in
+    degrees. If m is -1, the origin is that of the main system in the local
+    one.
+    """
+    pl = []
+    for e in params:
+        m = re_jump.match(str(e))
+        if m:
+            pl.extend([None] * int(m.group(1) or 1))
+        else:
+            pl.append(float(e))
+    pl = pl + [None] * (13 - len(pl))
+    if len(pl) > 13 or None in pl[:3]:
+        raise ValueError('Wrong transformation parameters: {}'.format(
+            params))
+    B = [np.nan if b is None else (to_cos(b) if degrees else b)
+         for b in pl[3:12]]
+    R = complete_matrix(B)
+    o = np.array(pl[:3])
+    if pl[12] == -1:
+        o = -R.T.dot(o)
+    elif pl[12] not in (None, 1):
+        raise ValueError('Wrong m flag: {}'.format(pl[12]))
+    return Transform(o.tolist() + R.ravel().tolist())
+
+
 def normalize_transform(name, dtype, params):
     """
-    return complete list of paramters for the tr card.
+    return name and Transform for the tr card.
     """
     name = int(name)
-    pl = map(float, params.split())
-    if len(pl) == 3:
-        # no rotational matrix is given. Use the identical one
-        dtype = dtype.replace('*', '')
-        pl = pl + [1, 0, 0, 0, 1, 0, 0, 0, 1]
-    if dtype[0] == '*':
-        pl[3:] = map(to_cos, pl[3:])
-    return name, pl
+    return name, parse_transform(params.split(), dtype[0] == '*')
+
+
+# Composed transformations, see compose(). Least recently used ones are
+# dropped when there are more than _composed_max.
+_composed = OrderedDict()
+_composed_max = 2**14
+
+
+def _memo(key, make):
+    """
+    Return _composed[key], calling make() to compute it if missing.
+    """
+    r = _composed.pop(key, None)
+    if r is None:
+        r = make()
+        while len(_composed) >= _composed_max:
+            _composed.popitem(last=False)
+    _composed[key] = r
+    return r
+
+
+def compose(*trs):
+    """
+    Return transformation equivalent to applying transformations `trs` (from
+    the last to the first), i.e. the product of their matrices. Products are
+    memoized.
+    """
+    if not trs:
+        return identity
+    if len(trs) == 1:
+        return trs[0]
+    return _memo(trs, lambda: Transform.from_matrix(
+        compose(*trs[:-1]).matrix.dot(trs[-1].matrix)))
+
+
+def compose_inverse(tr):
+    """
+    Return inverse of the transformation `tr`, memoized as compose().
+    """
+    return _memo(('inverse', tr),
+                 lambda: Transform.from_matrix(np.linalg.inv(tr.matrix)))
+
+
+def cell_transform(value, transforms, degrees=False):
+    """
+    Return Transform for the trcl entry (or the transformation of a fill
+    entry) of a cell: either the number of a tr card in `transforms`, or the
+    parameters (a string in parentheses or a list). `degrees` is True
+    for *trcl.
+    """
+    if isinstance(value, (list, tuple)) and len(value) == 1:
+        value = value[0]
+    if not isinstance(value, (list, tuple)):
+        value = str(value).strip('() ').split()
+    if len(value) > 1:
+        return parse_transform(value, degrees)
+    n = int(value[0])
+    return transforms[n] if n != 0 else identity
 
 
 def get_transforms(input, lim=None):
@@ -29,9 +258,9 @@ def get_transforms(input, lim=None):
     d = OrderedDict()
     n = 0
     for c in input.cards(blocks='d', skipcomments=True):
-        name, dtype, params = c.parts()
-        if dtype.lower() in ('tr', '*tr'):
-            name, params = normalize_transform(name, dtype, params)
+        r = get_transform(c)
+        if r:
+            name, params = r
             d[name] = params
             n += 1
             if lim and n > lim:
@@ -39,6 +268,17 @@ def get_transforms(input, lim=None):
     return d
 
 
+def get_transform(c):
+    """
+    Return name and Transform for data card c, if it is a tr card.
+    Otherwise return None.
+    """
+    name, dtype, params = c.parts()
+    if dtype.lower() in ('tr', '*tr'):
+        return normalize_transform(name, dtype, params)
+    return None
+
+
 def transform_vector(v, tr):
     b1, b2, b3, b4, b5, b6, b7, b8, b9 = tr[3:]
     x, y, z = v
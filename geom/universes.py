@@ -0,0 +1,358 @@
+"""
+Universes, fills and lattices.
+
+Cells with the u option belong to universes; cells without it form universe
+0, the real world. Cells with the fill (or *fill) option are filled with a
+universe, lattice cells (lat=1 or lat=2) -- with a universe in each lattice
+element, see parse_fill().
+
+Universes class builds the tree of universes from the cell options. Geometry
+of each cell is parsed only once, and the universes are instantiated lazily
+at each fill location by Universes.instances(): instances reference the
+memoized geometry and carry the composed transformation (see
+transforms.compose()), so nested lattices are flattened without parsing the
+same geometry again.
+
+Example::
+
+    u = Universes(*get_raw_geom(MIP(fname)))
+    for inst in u.instances():
+        ast = u.geometry(inst.cell)
+        print inst.cell, inst.index, inst.transform[:3]
+"""
+
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from cells import parse_options, get_universe
+from parsegeom import get_ast
+from points import get_shapes
+from semantics import Surface, Cell
+from transforms import Transform, identity, compose, cell_transform
+
+# Instance of a cell in the flattened geometry. `cell` is the cell name,
+# `index` -- the lattice element (i, j, k) or None, `transform` maps the cell
+# coordinates (in which its surfaces are defined) to the main ones. `path` is
+# the tuple of (cell, index, transform) for the filled cells and lattice
+# elements that contain the instance, from the real world down. The instance
+# region is the intersection of the cell regions in path and of its own
+# region, each transformed by its transform.
+Instance = namedtuple('Instance', 'cell index transform path')
+
+
+def parse_fill(entries, transforms, degrees=False):
+    """
+    Return ordered dictionary of (universe, transformation) for the entries of
+    the fill option. Transformation is a transforms.Transform or None.
+
+    For a single universe, e.g. fill=5 or fill=5 (2), the only key is None.
+    Array fills of lattice cells, e.g. fill=0:1 0:0 0:0 5 6 (2), start with
+    the ranges of i, j and k indices, followed by the universes of elements
+    (i varies fastest, nr repeats the previous entry n times), each optionally
+    followed by its transformation; keys are the (i, j, k) tuples.
+
+    `degrees` is True for *fill.
+    """
+    if ':' not in entries[0]:
+        tr = None
+        if len(entries) > 1:
+            tr = cell_transform(entries[1], transforms, degrees)
+        return OrderedDict([(None, (int(entries[0]), tr))])
+    ranges = []
+    for e in entries[:3]:
+        i1, i2 = e.split(':')
+        ranges.append(range(int(i1), int(i2) + 1))
+    values = []
+    for e in entries[3:]:
+        if e.startswith('('):
+            u, tr = values[-1]
+            values[-1] = (u, cell_transform(e, transforms, degrees))
+        elif e[-1] in 'rR':
+            values.extend(values[-1:] * int(e[:-1] or 1))
+        else:
+            values.append((int(e), None))
+    keys = [(i, j, k) for k in ranges[2] for j in ranges[1] for i in ranges[0]]
+    if len(values) != len(keys):
+        raise ValueError('Fill array needs {} entries, {} given'.format(
+            len(keys), len(values)))
+    return OrderedDict(zip(keys, values))
+
+
+def ordered_surfaces(ast):
+    """
+    Return list of surfaces in ast in the order of their first appearance.
+    """
+    res = []
+    todo = [ast]
+    while todo:
+        e = todo.pop()
+        if isinstance(e, Surface):
+            if abs(e) not in res:
+                res.append(abs(e))
+        elif not isinstance(e, Cell):
+            todo.append(e[2])
+            todo.append(e[1])
+    return res
+
+
+def translation(t):
+    """
+    Return Transform for translation by vector t.
+    """
+    return Transform(list(t) + [1, 0, 0, 0, 1, 0, 0, 0, 1])
+
+
+def lattice_translations(lat, pairs):
+    """
+    Return (3, 3) array with translations to the lattice elements [1, 0, 0],
+    [0, 1, 0] and [0, 0, 1] for lattice type `lat`.
+
+    `pairs` is the list of (n, d1, d2) tuples for the pairs of opposite faces
+    of the lattice element, in the order of MCNP: the faces are planes
+    n.x = d1 and n.x = d2, the element with positive index is beyond the
+    first one.
+
+    For lat=1, the translation across a pair of faces is parallel to the
+    faces of the other pairs, i.e. it is the edge of the hexahedron. For
+    lat=2, the translation across a side face is the sum of the vertices of
+    the face relative to the hexagon center, the one across the bases is
+    parallel to the side faces.
+    """
+    res = np.zeros((3, 3))
+    if lat == 2 and len(pairs) < 3:
+        raise ValueError('hexagonal lattice needs 6 side faces')
+    N = np.array([n for n, d1, d2 in pairs]).reshape(-1, 3)
+    D = np.array([d1 - d2 for n, d1, d2 in pairs])
+    if lat == 1:
+        if np.linalg.matrix_rank(N) < len(N):
+            raise ValueError('faces of different pairs are parallel')
+        # Rows of pinv(N) are orthogonal to the other normals; for missing
+        # pairs, the translations lie in the span of the given normals
+        res[:len(N)] = (np.linalg.pinv(N) * D).T
+        return res
+
+    axis = np.cross(N[0], N[1])
+    if np.linalg.norm(axis) < 1e-12 or abs(N[2].dot(axis)) > 1e-6:
+        raise ValueError('side faces do not form a hexagonal prism')
+    # Sides in the order around the hexagon: [1, 0, 0], [0, 1, 0], [-1, 1, 0],
+    # [-1, 0, 0], [0, -1, 0], [1, -1, 0]
+    sides = [(n, d1) for n, d1, d2 in pairs[:3]]
+    sides += [(n, d2) for n, d1, d2 in pairs[:3]]
+    vertices = []
+    for k in range(6):
+        (na, da), (nb, db) = sides[k], sides[(k + 1) % 6]
+        vertices.append(np.linalg.solve(np.array([na, nb, axis]),
+                                        [da, db, 0.0]))
+    vertices = np.array(vertices)
+    c = vertices.mean(axis=0)
+    res[0] = vertices[5] + vertices[0] - 2 * c
+    res[1] = vertices[0] + vertices[1] - 2 * c
+    if len(pairs) > 3:
+        if abs(N[3].dot(axis)) < 1e-6:
+            raise ValueError('bases are parallel to the axis')
+        res[2] = np.linalg.solve(np.array([N[0], N[1], N[3]]), [0, 0, D[3]])
+    return res
+
+
+class Universes(object):
+    """
+    Tree of universes.
+
+    `cells`, `surfaces` and `transforms` are dictionaries as returned by
+    main.get_raw_geom(): cell geometry and options are not parsed yet, "like
+    n but" cells are resolved.
+    """
+    def __init__(self, cells, surfaces, transforms):
+        self.cells = cells
+        self.surfaces = surfaces
+        self.transforms = transforms
+        self.options = OrderedDict()
+        # Universe of each cell, and cells of each universe
+        self.universe = OrderedDict()
+        self.members = OrderedDict([(0, [])])
+        for k, (mat, geom, opts) in cells.items():
+            o = self.options[k] = parse_options(opts)
+            u = self.universe[k] = get_universe(o)
+            self.members.setdefault(u, []).append(k)
+        # Memoized results of geometry(), fill() and lattice_vectors()
+        self._geom = {}
+        self._fill = {}
+        self._lattice = {}
+        return
+
+    def geometry(self, cell):
+        """
+        Return geometry of the cell parsed to tree. Each geometry string is
+        parsed once, cells with the same string (e.g. "like n but" cells
+        resolved by cells.resolve_like()) share the tree.
+        """
+        geom = self.cells[cell][1]
+        ast = self._geom.get(geom)
+        if ast is None:
+            ast = self._geom[geom] = get_ast(geom)
+        return ast
+
+    def universe_geometry(self, u):
+        """
+        Return ordered dictionary of cells of universe u with their geometry.
+        """
+        return OrderedDict((k, self.geometry(k)) for k in self.members[u])
+
+    def trcl(self, cell):
+        """
+        Return Transform of the trcl (or *trcl) option of the cell, or None.
+        """
+        o = self.options[cell]
+        for key in ('trcl', '*trcl'):
+            if key in o:
+                return cell_transform(o[key], self.transforms, key[0] == '*')
+        return None
+
+    def lattice(self, cell):
+        """
+        Return lattice type of the cell, 0 if it is not a lattice.
+        """
+        return int(self.options[cell].get('lat', ['0'])[0])
+
+    def fill(self, cell):
+        """
+        Return result of parse_fill() for the cell, or None if it is not
+        filled (fill=0 is no fill as well).
+        """
+        if cell not in self._fill:
+            o = self.options[cell]
+            r = None
+            for key in ('fill', '*fill'):
+                if key in o:
+                    r = parse_fill(o[key], self.transforms, key[0] == '*')
+            if r is not None and r.keys() == [None] and r[None][0] == 0:
+                r = None
+            self._fill[cell] = r
+        return self._fill[cell]
+
+    def tree(self):
+        """
+        Return ordered dictionary with list of universes filling cells of each
+        universe.
+        """
+        res = OrderedDict()
+        for u, members in self.members.items():
+            s = res[u] = []
+            for k in members:
+                for v, tr in (self.fill(k) or {}).values():
+                    if v not in s and v not in (0, u):
+                        s.append(v)
+        return res
+
+    def lattice_vectors(self, cell):
+        """
+        Return (3, 3) array with translations to the lattice elements [1, 0,
+        0], [0, 1, 0] and [0, 0, 1] in the cell coordinates.
+
+        As in MCNP, the element [1, 0, 0] is beyond the first surface of the
+        lattice cell, [-1, 0, 0] beyond the second one, and so on. For lat=2
+        (hexagonal prisms), the 5th and 6th surfaces are the [-1, 1, 0] and
+        [1, -1, 0] faces, the 7th and 8th ones -- the [0, 0, 1] and [0, 0, -1]
+        bases. Surfaces must be planes. Elements need not be rectangular: the
+        translations follow the edges of skewed hexahedra, or the vertices of
+        hexagons (see lattice_translations()). Missing pairs give zero
+        vectors.
+        """
+        if cell in self._lattice:
+            return self._lattice[cell]
+        lat = self.lattice(cell)
+        names = ordered_surfaces(self.geometry(cell))
+        names = names[:{1: 6, 2: 8}[lat]]
+        shapes = get_shapes(self.surfaces, self.transforms, names)
+        pairs = []
+        for i in range(0, len(names) - 1, 2):
+            planes = []
+            for s in names[i:i + 2]:
+                Q = shapes[s].Qm
+                if Q is None or Q[:3, :3].any():
+                    raise ValueError(
+                        'Surface {} of lattice cell {} is not a plane'.format(
+                            s, cell))
+                # Plane a.x + c = 0
+                a = 2 * Q[:3, 3]
+                na = np.linalg.norm(a)
+                planes.append((a / na, -Q[3, 3] / na))
+            (n1, d1), (n2, d2) = planes
+            if n1.dot(n2) < 0:
+                d2 = -d2
+            pairs.append((n1, d1, d2))
+        try:
+            res = lattice_translations(lat, pairs)
+        except ValueError as e:
+            raise ValueError('Lattice cell {}: {}'.format(cell, e))
+        self._lattice[cell] = res
+        return res
+
+    def instances(self, u=0, tr=identity, path=()):
+        """
+        Generator of Instance tuples for the cells of universe u, whose
+        coordinates are mapped to the main ones by `tr`. Filled cells and
+        lattice elements are replaced by the instances of their universes,
+        lattice elements filled with the universe of the lattice cell itself
+        are instances of the lattice cell.
+
+        Lattice elements are generated for the array fill only (elements
+        filled with universe 0 are skipped); a lattice filled with a single
+        universe is infinite and raises ValueError.
+        """
+        ancestors = set(self.universe[c] for c, i, t in path)
+        for k in self.members[u]:
+            ctr = self.trcl(k)
+            ctr = tr if ctr is None else compose(tr, ctr)
+            fill = self.fill(k)
+            if fill is None:
+                yield Instance(k, None, ctr, path)
+                continue
+            lat = self.lattice(k)
+            if lat and fill.keys() == [None]:
+                raise ValueError(
+                    'Lattice cell {} needs array fill'.format(k))
+            if lat:
+                vectors = self.lattice_vectors(k)
+            for index, (v, ftr) in fill.items():
+                etr = ctr
+                if index is not None:
+                    etr = compose(ctr, translation(np.dot(index, vectors)))
+                if v == u and index is not None:
+                    yield Instance(k, index, etr, path)
+                    continue
+                if v == 0:
+                    continue
+                if v == u or v in ancestors:
+                    raise ValueError(
+                        'Universe {} filled into itself in cell {}'.format(
+                            v, k))
+                if v not in self.members:
+                    raise ValueError('Universe {} in cell {} not found'.format(
+                        v, k))
+                utr = etr if ftr is None else compose(etr, ftr)
+                for inst in self.instances(v, utr,
+                                           path + ((k, index, etr), )):
+                    yield inst
+
+
+def get_universes(i, lim=None):
+    """
+    Return Universes instance for the input i, an instance of mip.MIP class.
+    """
+    from main import get_raw_geom
+    return Universes(*get_raw_geom(i, lim))
+
+
+if __name__ == '__main__':
+    from sys import argv
+    from mip import MIP
+
+    u = get_universes(MIP(argv[1]))
+    for k, v in u.tree().items():
+        print 'universe', k, len(u.members[k]), 'cells, filled with', v
+    n = 0
+    for inst in u.instances():
+        n += 1
+    print n, 'cell instances'
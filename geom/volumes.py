@@ -0,0 +1,146 @@
+"""
+Stochastic estimation of cell volumes.
+
+Random points are sampled uniformly in a box or in a sphere, that must contain
+the cells of interest, and located in cells (see points.py). The volume of a
+cell is estimated as the fraction of points inside the cell, multiplied by the
+volume of the sampling region. The relative statistical error of the estimate
+is sqrt((1 - p)/n), where n is the number of points in the cell and p is their
+fraction.
+
+Points are sampled in batches. Each batch has its own random number generator,
+seeded with the pair (seed, batch number). Thus the result does not depend on
+the number of worker processes.
+
+Cells are located as they are in the input: if cells of different universes
+overlap, a point is counted for the first one.
+"""
+
+from collections import OrderedDict
+from multiprocessing import Pool
+from math import pi
+
+import numpy as np
+
+from points import Locator
+
+
+def sample(region, n, rng):
+    """
+    Return (n, 3) array of points uniformly distributed in the region.
+
+    The region is either ('box', (x1, y1, z1), (x2, y2, z2)), or ('sphere',
+    (x, y, z), R). `rng` is an instance of numpy.random.RandomState.
+    """
+    if region[0] == 'box':
+        lo = np.array(region[1], dtype=float)
+        hi = np.array(region[2], dtype=float)
+        return lo + rng.rand(n, 3) * (hi - lo)
+    elif region[0] == 'sphere':
+        c = np.array(region[1], dtype=float)
+        d = rng.normal(size=(n, 3))
+        d /= np.sqrt((d**2).sum(axis=1))[:, np.newaxis]
+        r = region[2] * rng.rand(n)**(1./3)
+        return c + d * r[:, np.newaxis]
+    raise ValueError('Unknown sampling region {}'.format(region[0]))
+
+
+def region_volume(region):
+    """
+    Return volume of the sampling region.
+    """
+    if region[0] == 'box':
+        return np.prod(np.subtract(region[2], region[1]))
+    elif region[0] == 'sphere':
+        return 4./3 * pi * region[2]**3
+    raise ValueError('Unknown sampling region {}'.format(region[0]))
+
+
+# Locator used by _count(). In worker processes it is set by _init().
+_locator = None
+
+
+def _init(cells, surfaces, transforms):
+    global _locator
+    _locator = Locator(cells, surfaces, transforms)
+
+
+def _count(args):
+    """
+    Sample points of one batch and return dictionary with number of points in
+    each cell.
+    """
+    region, seed, n = args
+    rng = np.random.RandomState(seed)
+    c = _locator.find(sample(region, n, rng))
+    names, counts = np.unique(c, return_counts=True)
+    return dict(zip(names.tolist(), counts.tolist()))
+
+
+def estimate_volumes(cells, surfaces, transforms, region, rel_err=0.01,
+                     names=None, batch=10**5, max_points=10**8, workers=None,
+                     seed=0):
+    """
+    Return dictionary with volumes of cells and their relative errors.
+
+    `cells`, `surfaces` and `transforms` are dictionaries as returned by
+    main.get_geom(). For `region` see sample().
+
+    Points are sampled until the relative error of all cells in `names` (all
+    cells by default) becomes less than `rel_err`, or `max_points` points are
+    sampled. Cells that are not hit by any point have zero volume and infinite
+    error.
+
+    If `workers` is greater than 1, batches of `batch` points are sampled in a
+    pool of worker processes. The result does not depend on `workers`.
+    """
+    if names is None:
+        names = cells.keys()
+    if workers > 1:
+        pool = Pool(workers, _init, (cells, surfaces, transforms))
+        mapf = pool.map
+    else:
+        _init(cells, surfaces, transforms)
+        pool = None
+        mapf = map
+
+    counts = {}
+    ntot = 0
+    nb = 0   # batch number
+    done = False
+    try:
+        while not done and ntot < max_points:
+            # Batches of a round, one for each worker. The stopping rule is
+            # checked after each batch in batch order, batches of the round
+            # after the stop are discarded.
+            args = []
+            n0 = ntot
+            while len(args) < (workers or 1) and n0 < max_points:
+                n = min(batch, max_points - n0)
+                args.append((region, (seed, nb + len(args)), n))
+                n0 += n
+            for a, d in zip(args, mapf(_count, args)):
+                for c, n in d.items():
+                    counts[c] = counts.get(c, 0) + n
+                ntot += a[2]
+                nb += 1
+                # check the error of cells of interest
+                n = min(counts.get(c, 0) for c in names)
+                if n > 0 and (1 - float(n)/ntot)/n < rel_err**2:
+                    done = True
+                    break
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    vr = region_volume(region)
+    res = OrderedDict()
+    for c in cells.keys():
+        n = counts.get(c, 0)
+        if n > 0:
+            p = float(n) / ntot
+            res[c] = (p * vr, ((1 - p)/n)**0.5)
+        else:
+            res[c] = (0.0, float('inf'))
+    return res
@@ -1,5 +1,9 @@
 # -*- coding: utf-8 -*-
 
+# Must be the same as in setup.py
+__version__ = '0.0a.0'
+
 from main import MIP
+from stream import read_cards, open_input
 
 
@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import re
+from utils import iterlines
 
 """
 """
@@ -11,14 +12,6 @@ re_continuation_spaces = re.compile('^\s{5,}')
 re_continuation_prev = re.compile('[^$]*&$')
 
 
-# Function used at two places below
-def _yield(c1, n1, f, c2, n2):
-    if c1:
-        yield c1, n1, 'card'
-    if not f and c2:
-        yield c2, n2, 'cmnt'
-
-
 def get_cards(block, skipcomments=False):
     """
     Split text in `block` into cards. Return card text, line number in the block
@@ -40,46 +33,88 @@ def get_cards(block, skipcomments=False):
     including the C-comments.
 
     """
+    for n, t, s, e in iter_cards(iterlines(block), skipcomments=skipcomments):
+        yield get_lines(block, s, e, skipcomments and t == 'card'), n, t
+
+
+def get_lines(text, start, end, skipcomments=False):
+    """
+    Return list of lines of the card, occupying text[start:end].
+
+    If `skipcomments` is True, C-comments are not included into the result.
+    """
+    lines = text[start:end].splitlines()
+    if skipcomments:
+        lines = [l for l in lines if not re_comment.match(l)]
+    return lines
 
-    # List of comment lines
-    cmnt = []
-    # List of lines describing a card
-    card = []
-    # Line number where card or block of comments starts:
-    n_card = 0
-    n_cmnt = 0
+
+def iter_cards(lines, skipcomments=False):
+    """
+    Split lines into cards. Return line number, type ('card' or 'cmnt') and
+    position of the card.
+
+    This is the same as get_cards(), but instead of text of the cards, their
+    start and end positions are returned. Argument `lines` is an iterable of
+    (line, start, end) tuples, as returned by utils.iterlines(). Text of the
+    card is not copied and can be obtained later with get_lines().
+
+    The card's end position points to the end of its last line (new-line
+    characters are not included).
+    """
+    # Current card and current block of comments: [line number, start, end]
+    card = None
+    cmnt = None
 
     lprev = None  # previous card line
-    for n, l in enumerate(block.splitlines()):
+    for n, (l, s, e) in enumerate(lines):
+        # exclude new-line characters from the card position
+        e = s + len(l)
         # if comment, then  add to block of comments
         # if continuation, then append block of comment this line to current
         # card
         # if new card, then yield current card or current block of comments and
         # create a new current card
         if re_comment.match(l):
-            cmnt.append(l)
+            if cmnt is None:
+                cmnt = [n, s, e]
+            else:
+                cmnt[2] = e
         elif is_continuation(l, lprev):
-            if not skipcomments:
-                card.extend(cmnt)
-            cmnt = []
-            n_cmnt = n + 1
-            card.append(l)
+            if card is None:
+                # Continuation line at the begin of the block.
+                if cmnt is None or skipcomments:
+                    card = [n, s, e]
+                else:
+                    card = cmnt
+            # The card's span includes the C-comments. They are filtered out
+            # (if necessary) when lines of the card are extracted.
+            card[2] = e
+            cmnt = None
             lprev = l
         else:
             # this must be begin of a new card
-            for r in _yield(card, n_card, skipcomments, cmnt, n_cmnt):
+            for r in _yield(card, cmnt, skipcomments):
                 yield r
-            cmnt = []
-            n_cmnt = n + 1
-            card = [l]
-            n_card = n
+            cmnt = None
+            card = [n, s, e]
             lprev = l
     # At the end of block, yield the last card and comments (this code must be
     # the same as in `else` clause above)
-    for r in _yield(card, n_card, skipcomments, cmnt, n_cmnt):
+    for r in _yield(card, cmnt, skipcomments):
         yield r
 
 
+# Function used at two places above
+def _yield(card, cmnt, f):
+    if card:
+        n, s, e = card
+        yield n, 'card', s, e
+    if not f and cmnt:
+        n, s, e = cmnt
+        yield n, 'cmnt', s, e
+
+
 def is_continuation(l, prev=None):
     """
     Check if l is a continuation line.
@@ -78,3 +78,12 @@ def split(txt):
         else:
             name, mat, geom = re_nonvoid.findall(txt)[0]
     return name, mat, geom, opts
+
+
+def get_name(txt):
+    """
+    Return name of the cell card txt, as integer.
+
+    Only the first line of the card is needed.
+    """
+    return int(txt.split(None, 1)[0])
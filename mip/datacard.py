@@ -10,3 +10,22 @@ re_data = re.compile('^\s*(\**[a-zA-Z]+[^0-9]*)([0-9]*)(.*)$')
 def split(txt):
     m = re_data.search(txt)
     return m.groups()
+
+
+def get_name(txt):
+    """
+    Return type and number of the data card txt, e.g. ('m', 5) for `m5`.
+
+    The type is lower-case and the star prefix is removed, i.e. `*tr1` and
+    `tr1` both give ('tr', 1). For data cards without number, e.g. `mode`, the
+    number is None.
+
+    Only the first line of the card is needed.
+    """
+    typ, num, _ = split(txt.split(None, 1)[0])
+    typ = typ.lstrip('*').lower()
+    if num:
+        num = int(num)
+    else:
+        num = None
+    return typ, num
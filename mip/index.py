@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Index of cards, for direct access to a card by its name.
+
+Only the first line of each card is analysed to get the card name, cards are
+not split into parts.
+"""
+
+from array import array
+
+from cards import iter_cards
+from utils import iterlines, count
+import cellcard
+import surfacecard
+import datacard
+
+# Functions returning card name from the card's 1-st line, for each block
+get_name = {'c': cellcard.get_name,
+            's': surfacecard.get_name,
+            'd': datacard.get_name}
+
+
+class CardIndex(object):
+    """
+    Positions of cards in the input text, accessible by block and card name.
+
+    Positions are stored in arrays, the dictionary maps (block, name) to the
+    index in these arrays.
+    """
+    def __init__(self):
+        self.rows = {}
+        self.start = array('l')
+        self.end = array('l')
+        self.line = array('l')
+        self.nlines = array('l')
+        return
+
+    def add(self, key, start, end, line, nlines):
+        """
+        Add card position. If key is already in the index, the card is ignored.
+        """
+        if key not in self.rows:
+            self.rows[key] = len(self.start)
+            self.start.append(start)
+            self.end.append(end)
+            self.line.append(line)
+            self.nlines.append(nlines)
+        return
+
+    def __getitem__(self, key):
+        """
+        Return start and end positions, line number and number of lines of the
+        card specified by key = (block, name).
+        """
+        r = self.rows[key]
+        return self.start[r], self.end[r], self.line[r], self.nlines[r]
+
+    def __contains__(self, key):
+        return key in self.rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def keys(self, block=None):
+        """
+        Return list of (block, name) keys, in the order of cards in the input.
+        """
+        keys = sorted(self.rows, key=self.rows.get)
+        if block is not None:
+            keys = [k for k in keys if k[0] == block]
+        return keys
+
+
+class CardTable(object):
+    """
+    Cards of the input as parallel typed arrays, one element per card.
+
+    `block` is the block id, `type` -- code of Card.type (block id, or 'cmnt'
+    for comments) in `types`, `start` and `end` -- card position in the input
+    text, `line` -- line number of the card's first line.
+
+    Card names (as in CardIndex keys) are stored in two columns: `number` is
+    the cell or surface name, or the number of the data card (-1 for data
+    cards without number and for comments), `dtype` -- code of the data card
+    type in `dtypes` (-1 for other cards). See name() and names().
+    """
+    # Card types by code
+    types = ('c', 's', 'd', 'cmnt')
+
+    def __init__(self):
+        self.block = array('c')
+        self.type = array('b')
+        self.start = array('l')
+        self.end = array('l')
+        self.line = array('l')
+        self.number = array('l')
+        self.dtype = array('h')
+        # Data card types by code, and their codes
+        self.dtypes = []
+        self._dcodes = {}
+        return
+
+    def add(self, block, type, start, end, line, name):
+        self.block.append(block)
+        self.type.append(self.types.index(type))
+        self.start.append(start)
+        self.end.append(end)
+        self.line.append(line)
+        if isinstance(name, tuple):
+            t, name = name
+            if t not in self._dcodes:
+                self._dcodes[t] = len(self.dtypes)
+                self.dtypes.append(t)
+            self.dtype.append(self._dcodes[t])
+        else:
+            self.dtype.append(-1)
+        self.number.append(-1 if name is None else name)
+        return
+
+    def name(self, i):
+        """
+        Return name of the i-th card: integer for cells and surfaces, (type,
+        number) tuple for data cards (number is None for cards without it),
+        None for comments.
+        """
+        n = self.number[i]
+        n = None if n < 0 else n
+        if self.dtype[i] >= 0:
+            return self.dtypes[self.dtype[i]], n
+        return n
+
+    def names(self):
+        """
+        Generator of card names, see name().
+        """
+        for i in xrange(len(self.start)):
+            yield self.name(i)
+
+    def __len__(self):
+        return len(self.start)
+
+
+def build_table(text, bi, blocks='csd', skipcomments=False):
+    """
+    Return CardTable for `blocks` of the input text, where `bi` is the
+    dictionary of block positions returned by blocks.get_block_positions().
+    """
+    table = CardTable()
+    for b in blocks:
+        if b not in bi:
+            continue
+        (i1, i2), n0 = bi[b]
+        f = get_name[b]
+        lines = iterlines(text, i1, i2)
+        for n, t, s, e in iter_cards(lines, skipcomments=skipcomments):
+            if t == 'card':
+                # the 1-st line of the card
+                i = text.find('\n', s, e)
+                if i < 0:
+                    i = e
+                table.add(b, b, s, e, n0 + n, f(text[s:i]))
+            else:
+                table.add(b, t, s, e, n0 + n, None)
+    return table
+
+
+def build_index(text, bi, blocks='csd'):
+    """
+    Return CardIndex for `blocks` of the input text, where `bi` is the
+    dictionary of block positions returned by blocks.get_block_positions().
+    """
+    index = CardIndex()
+    t = build_table(text, bi, blocks, skipcomments=True)
+    for b, s, e, l, name in zip(t.block, t.start, t.end, t.line, t.names()):
+        index.add((b, name), s, e, l, count(text, '\n', s, e) + 1)
+    return index
@@ -1,8 +1,13 @@
 import re
-from datetime import datetime
+import sys
+from hashlib import sha1
+from mmap import mmap as mapfile, ACCESS_READ
 
 from blocks import get_block_positions
-from cards import get_cards
+from cards import iter_cards, get_lines
+from index import build_index, build_table
+from utils import iterlines
+from timing import instrument
 
 import cellcard
 import surfacecard
@@ -31,13 +36,66 @@ class Card(object):
 
     The methods helps to get a content of a card (stripping out the comments)
     and split a card into logical parts.
+
+    Instead of `lines`, a card can be defined by the text (a string or an mmap
+    object) and the `span` of the card in it, stored as `start` and `end`
+    offsets. In this case, the lines are extracted from the text only when the
+    `lines` attribute is accessed for the first time. If `skipcomments` is
+    True, C-comments are not included into the extracted lines.
+
+    Results of content() and parts() are computed once. If the lines are
+    changed in place, invalidate() must be called; assigning new lines to the
+    `lines` attribute invalidates the results automatically.
     """
-    def __init__(self, lines=[], position=0, type=None):
-        self.lines = lines
+    __slots__ = ('_lines', 'position', 'type', 'text', 'start', 'end',
+                 'skipcomments', '_content', '_parts')
+
+    def __init__(self, lines=[], position=0, type=None, text=None, span=None,
+                 skipcomments=False):
+        if text is not None:
+            lines = None
+        self._lines = lines
         self.position = position
         self.type = type
+        self.text = text
+        self.span = span
+        self.skipcomments = skipcomments
+        self._content = None
+        self._parts = None
         return
 
+    def invalidate(self):
+        """
+        Forget results of content() and parts().
+        """
+        self._content = None
+        self._parts = None
+
+    @property
+    def span(self):
+        """
+        Start and end positions of the card in the text.
+        """
+        if self.start is None:
+            return None
+        return self.start, self.end
+
+    @span.setter
+    def span(self, span):
+        self.start, self.end = span or (None, None)
+
+    @property
+    def lines(self):
+        if self._lines is None:
+            self._lines = get_lines(self.text, self.start, self.end,
+                                    skipcomments=self.skipcomments)
+        return self._lines
+
+    @lines.setter
+    def lines(self, lines):
+        self._lines = lines
+        self.invalidate()
+
     @card_debugger
     def content(self):
         """
@@ -51,7 +109,11 @@ class Card(object):
         (i.e.  that this text is obtained from
         cards.get_cards(skipcomments=True) generator.
         """
+        if self._content is None:
+            self._content = self._clean()
+        return self._content
 
+    def _clean(self):
         # Remove in-line comments denoted by $ or &
         res = []
         for l in self.lines:
@@ -78,21 +140,37 @@ class Card(object):
 
             A data card is splitted into its name, type and parameters.
         """
+        if self._parts is None:
+            self._parts = self._split(self.content())
+        return self._parts
+
+    def _split(self, content):
         if self.type == 'c':
-            name, mat, geom, opts = cellcard.split(self.content())
+            name, mat, geom, opts = cellcard.split(content)
             return name, mat, geom, opts
 
         if self.type == 's':
-            name, tr, typ, params = surfacecard.split(self.content())
+            name, tr, typ, params = surfacecard.split(content)
             return name, tr, typ, params
 
         if self.type == 'd':
-            typ, name, params = datacard.split(self.content())
+            typ, name, params = datacard.split(content)
             return name, typ, params
         else:
             raise NotImplementedError
 
 
+def read_text(fname, mmap=False):
+    """
+    Return text of the file `fname`, or the memory-mapped file if `mmap` is
+    True.
+    """
+    if mmap:
+        with open(fname, 'rb') as f:
+            return mapfile(f.fileno(), 0, access=ACCESS_READ)
+    return open(fname, 'r').read()
+
+
 class MIP(object):
     """
     Class to read general structure of an MCNP input file.
@@ -100,19 +178,72 @@ class MIP(object):
     When created a new instance, it reads the content of the specified input
     file.  Methods of the class help to access separate blocks and cards of the
     input file.
+
+    If `mmap` is True, the input file is not read but memory-mapped. Text of
+    blocks and cards is copied from the mapped buffer only when requested, thus
+    memory consumption does not depend on the input file size.
+
+    If `reuse` is True, Card instances are kept and returned again by later
+    calls of cards() and card(), together with their content and parts
+    computed before. invalidate() drops them. This trades memory for speed
+    when the same cards are processed repeatedly; it is off by default, since
+    the kept text of all cards defeats the purpose of `mmap`.
     """
-    def __init__(self, fname, firstblock=None):
+    def __init__(self, fname, firstblock=None, mmap=False, reuse=False):
 
-        print datetime.now().isoformat()
         # Text from the input file
-        self.text = open(fname, 'r').read()
-        print datetime.now().isoformat()
+        self.text = read_text(fname, mmap)
 
         # Dictioary of indices describing position of blocks
         self.bi = get_block_positions(self.text, firstblock=firstblock)
-        print datetime.now().isoformat()
+
+        # Index of cards, built on first use
+        self._index = None
+
+        # Card instances, by start position and skipcomments flag
+        self._cards = {} if reuse else None
+
+        # Known parts of cards not created yet, see preset()
+        self._preset = {}
+        return
+
+    def invalidate(self):
+        """
+        Drop Card instances kept for reuse, and parts given to preset().
+        """
+        if self._cards is not None:
+            self._cards.clear()
+        self._preset.clear()
+
+    def preset(self, cards):
+        """
+        Make cards() and card() return Card instances with known parts, e.g.
+        restored from a cache. `cards` is a list of (position, type, span,
+        skipcomments, parts) tuples.
+
+        Parts are given to the Card instance created for the card. Unless
+        `reuse` is True, they are then dropped, and later instances of the
+        card split it again.
+        """
+        for position, type, span, skipcomments, parts in cards:
+            self._preset[span[0], skipcomments] = parts
         return
 
+    def _card(self, position, type, span, skipcomments):
+        """
+        Return Card instance for the card at span, reusing the existing one.
+        """
+        key = span[0], skipcomments
+        if self._cards is not None and key in self._cards:
+            return self._cards[key]
+        c = Card(position=position, type=type, text=self.text, span=span,
+                 skipcomments=skipcomments)
+        if self._preset:
+            c._parts = self._preset.pop(key, None)
+        if self._cards is not None:
+            self._cards[key] = c
+        return c
+
     def block(self, bid):
         """
         Return text of the specififed block.
@@ -129,6 +260,15 @@ class MIP(object):
                 ii, l = self.bi[b]
                 yield b, l, self.text[slice(*ii)]
 
+    def view(self, bid):
+        """
+        Return text of the specified block as a buffer object.
+
+        Unlike block(), the text is not copied.
+        """
+        (i1, i2), l = self.bi[bid]
+        return l, buffer(self.text, i1, i2 - i1)
+
     def cards(self, blocks='csd', skipcomments=False):
         """
         Generator returns instances of Card class for blocks specified by the
@@ -136,25 +276,110 @@ class MIP(object):
 
         The c-comment lines between cards can be skipped if `skipcomments` is
         True.
+
+        Cards refer to the input file text; their lines are extracted only
+        when needed. See also `reuse` in the class description.
         """
-        for b, n0, txt in self.blocks(blocks):
-            for c, n, t in get_cards(txt, skipcomments=skipcomments):
+        for b in blocks:
+            if b not in self.bi:
+                continue
+            (i1, i2), n0 = self.bi[b]
+            lines = iterlines(self.text, i1, i2)
+            for n, t, s, e in iter_cards(lines, skipcomments=skipcomments):
                 if t == 'card':
                     t = b
-                yield Card(lines=c, position=n0 + n, type=t)
+                yield self._card(n0 + n, t, (s, e), skipcomments and t == b)
+
+    def index(self):
+        """
+        Return index.CardIndex for the cell, surface and data blocks.
+
+        The index is built on the first call.
+        """
+        if self._index is None:
+            self._index = build_index(self.text, self.bi)
+        return self._index
+
+    def card_table(self, blocks='csd', skipcomments=False):
+        """
+        Return all cards of `blocks` as index.CardTable, i.e. as parallel
+        arrays of block ids, type codes, start and end positions, line numbers
+        and names. No Card instances are created.
+
+        For example, the number of material cards is
+
+            t = input.card_table('d', True)
+            t.dtype.count(t.dtypes.index('m'))
+        """
+        return build_table(self.text, self.bi, blocks, skipcomments)
+
+    def card(self, block, name):
+        """
+        Return card with the specified name from the block.
+
+        Only the requested card is split into lines; comment lines are
+        skipped. For the form of `name` see cell(), surface() and data().
+        """
+        s, e, l, nl = self.index()[block, name]
+        return self._card(l, block, (s, e), True)
+
+    def cell(self, name):
+        """
+        Return cell card with the integer `name`.
+        """
+        return self.card('c', name)
+
+    def surface(self, name):
+        """
+        Return surface card with the integer `name`.
+        """
+        return self.card('s', name)
+
+    def data(self, typ, name=None):
+        """
+        Return data card of type `typ` and number `name`.
+
+        For example, data('m', 5) returns material card `m5`, data('tr', 1)
+        returns either `tr1` or `*tr1`, data('mode') returns the mode card.
+        """
+        return self.card('d', (typ.lower(), name))
+
+    def fingerprints(self):
+        """
+        Return dictionary mapping (block, name) to the fingerprint of the
+        card's text.
+
+        Cards with equal fingerprints have the same text (including comments
+        inside the card). Comparing fingerprints of two versions of an input
+        file shows what cards were changed.
+        """
+        index = self.index()
+        res = {}
+        for k, r in index.rows.items():
+            res[k] = sha1(self.text[index.start[r]:index.end[r]]).digest()
+        return res
+
+
+# Stages of the parse pipeline, see timing.py
+_module = sys.modules[__name__]
+instrument(_module, 'read_text', 'file read', lambda a, r: len(r))
+instrument(_module, 'get_block_positions', 'block split',
+           lambda a, r: len(a[0]))
+instrument(MIP, 'cards', 'card split', lambda a, r: r.end - r.start)
+instrument(Card, '_clean', 'content', lambda a, r: len(r))
+instrument(Card, '_split', 'parts', lambda a, r: len(a[1]))
 
 
 if __name__ == '__main__':
     from sys import argv
+    from timing import timing
     import utils
 
-    input = MIP(argv[1])
-
-    print 'Start cycling cards', datetime.now().isoformat()
-    for c in input.cards():
-        print c.position
-        pass
-    print 'End   cycling cards', datetime.now().isoformat()
+    with timing() as stats:
+        input = MIP(argv[1])
+        for c in input.cards(blocks='csd', skipcomments=True):
+            c.parts()
+    print stats.report()
 
     exit(0)
     # print blocs
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Read cards from a stream.
+
+Unlike MIP, that needs the whole input file, cards are read here from any
+iterable of lines, e.g. an open file, a pipe or a gzip stream. Blocks are
+detected while reading, and only lines of the current card are kept in
+memory. Cards have the same positions (line numbers) and lines as returned by
+MIP.cards().
+
+Blocks are separated by single blank lines. Without `firstblock`, the input
+is assumed to start with the title (and optionally the message block); a
+continue-run input, consisting of the data block only, must be read with
+firstblock=bid.d.
+"""
+
+from collections import deque
+from gzip import GzipFile
+from itertools import groupby
+import sys
+
+from blocks import bid
+from cards import iter_cards, re_comment
+from main import Card
+
+
+def open_input(fname):
+    """
+    Return file object for the input file `fname`. Files with the .gz
+    extension are decompressed while reading, '-' means the standard input.
+    """
+    if fname == '-':
+        return sys.stdin
+    if fname.endswith('.gz'):
+        return GzipFile(fname, 'rb')
+    return open(fname, 'r')
+
+
+def iter_lines(f):
+    """
+    Return line without new-line characters, its start and end positions and
+    its number (starting from 1), for each line in f.
+    """
+    pos = 0
+    for n, raw in enumerate(f, 1):
+        l = raw.rstrip('\n')
+        if l.endswith('\r'):
+            l = l[:-1]
+        yield l, pos, pos + len(raw), n
+        pos += len(raw)
+
+
+def iter_blocks(lines, firstblock=None):
+    """
+    Return block id and the line tuple from iter_lines() for each non-blank
+    line in `lines`. Lines after the data block are not read.
+    """
+    # Block following the message block
+    first = bid.t if firstblock is None else firstblock
+    cb = None
+    for t in lines:
+        l = t[0]
+        if cb is None:
+            words = l[:20].lower().split()
+            cb = bid.m if words[:1] == ['message:'] else first
+        if not l.strip(' \t\r\f\v'):
+            # blank line ends the block
+            if cb == bid.d:
+                return
+            cb = first if cb == bid.m else cb + 1
+            continue
+        yield bid[cb], t
+        if cb == bid.t:
+            # the title is one line, followed by the cells block
+            cb = bid.c
+
+
+def read_cards(f, blocks='csd', firstblock=None, skipcomments=False):
+    """
+    Generator returns instances of Card class for the specified blocks of the
+    input read from `f`, an iterable of lines (e.g. a file object, see
+    open_input()).
+
+    Cards have the same positions, types and lines as returned by
+    MIP.cards(). The span of a card contains its start and end positions in
+    the stream. Comment lines between cards are skipped if `skipcomments` is
+    True.
+    """
+    for b, group in groupby(iter_blocks(iter_lines(f), firstblock),
+                            key=lambda x: x[0]):
+        if b not in blocks:
+            # consume lines of the block
+            for t in group:
+                pass
+            continue
+        # Lines read but not yet returned as part of a card: (line, start,
+        # number)
+        buf = deque()
+
+        def lines():
+            for _, (l, s, e, n) in group:
+                buf.append((l, s, n))
+                yield l, s, e
+
+        for i, t, s, e in iter_cards(lines(), skipcomments=skipcomments):
+            card = []
+            position = None
+            while buf and buf[0][1] < e:
+                l, ls, n = buf.popleft()
+                if ls < s:
+                    # skipped comment lines
+                    continue
+                if position is None:
+                    position = n
+                card.append(l)
+            if t == 'card':
+                t = b
+                if skipcomments:
+                    card = [l for l in card if not re_comment.match(l)]
+            yield Card(lines=card, position=position, type=t, span=(s, e))
+
+
+if __name__ == '__main__':
+    from sys import argv
+
+    fname = argv[1] if len(argv) > 1 else '-'
+    for c in read_cards(open_input(fname), skipcomments=True):
+        print c.position, c.type, c.content()
@@ -16,3 +16,13 @@ re_surface = re.compile(r"""^\s*([+*]*\d+)\s+
 def split(txt):
     m = re_surface.search(txt)
     return m.groups()
+
+
+def get_name(txt):
+    """
+    Return name of the surface card txt, as integer. Prefixes denoting
+    boundary conditions are removed.
+
+    Only the first line of the card is needed.
+    """
+    return int(txt.split(None, 1)[0].lstrip('+*'))
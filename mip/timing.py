@@ -0,0 +1,142 @@
+"""
+Timing of the parsing stages.
+
+Functions doing the work of a stage (reading the input file, splitting it to
+blocks and cards, cleaning card content, splitting cards to parts, parsing
+cell geometry, translation of surfaces to CAD) are registered with
+instrument(), which replaces them by thin wrappers. Call the registration at
+the end of the module defining the function, so that modules importing it
+get the wrapper. The wrappers time the calls only inside the timing()
+context, otherwise they call the original functions directly.
+
+Example::
+
+    with timing() as stats:
+        cells, surfs, trans = get_geom(MIP(fname))
+    print stats.report()
+
+For each stage, the number of calls (or of returned items for generators,
+e.g. cards returned by MIP.cards()), the number of processed bytes and the
+total time are collected. Work done in worker processes (get_geom() with
+workers > 1) is not timed.
+"""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from inspect import isgeneratorfunction
+from time import time
+
+# Registered functions: (owner, attribute name, stage, size function,
+# original function)
+points = []
+
+# Stats instance of the current timing() context
+_active = None
+
+
+def instrument(owner, attr, stage, size=None):
+    """
+    Register function `attr` of `owner` (a class or a module) as doing the
+    work of `stage`.
+
+    `size` is an optional function of the call arguments and the result (for
+    generators -- of each returned item), giving the number of processed
+    bytes.
+
+    The function is replaced by a wrapper, which checks at each call whether a
+    timing() context is active.
+    """
+    func = vars(owner)[attr]
+    points.append((owner, attr, stage, size, func))
+    if isgeneratorfunction(func):
+        timed = _timed_generator(func, stage, size)
+    else:
+        timed = None
+
+    def wrapper(*a, **kwa):
+        if _active is None:
+            return func(*a, **kwa)
+        if timed is not None:
+            return timed(_active, *a, **kwa)
+        t0 = time()
+        r = func(*a, **kwa)
+        _active.add(stage, time() - t0, 1, size(a, r) if size else 0)
+        return r
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    wrapper.__module__ = func.__module__
+    setattr(owner, attr, wrapper)
+    return wrapper
+
+
+class Stats(object):
+    """
+    Counts, bytes and time for each stage. If `callback` is given, it is
+    called with the stage name, time and bytes of each timed call.
+    """
+    def __init__(self, callback=None):
+        self.stages = OrderedDict()
+        self.callback = callback
+        return
+
+    def add(self, stage, dt, count=1, nbytes=0):
+        """
+        Add `count` items of `stage` processed in time `dt`.
+        """
+        s = self.stages.get(stage)
+        if s is None:
+            s = self.stages[stage] = [0, 0, 0.0]
+        s[0] += count
+        s[1] += nbytes
+        s[2] += dt
+        if self.callback is not None:
+            self.callback(stage, dt, nbytes)
+
+    def report(self):
+        """
+        Return table with count, bytes, total time and time per item (in
+        microseconds) for each stage.
+        """
+        res = ['{:<16} {:>10} {:>12} {:>10} {:>10}'.format(
+            'stage', 'count', 'bytes', 'total, s', 'per, us')]
+        for stage, (n, b, t) in self.stages.items():
+            res.append('{:<16} {:>10} {:>12} {:>10.3f} {:>10.2f}'.format(
+                stage, n, b, t, 1e6 * t / n if n else 0.0))
+        return '\n'.join(res)
+
+
+def _timed_generator(func, stage, size):
+    """
+    Return generator function calling the generator function `func` and
+    adding time of each returned item to stats, its first argument.
+    """
+    def timed(stats, *a, **kwa):
+        g = func(*a, **kwa)
+        while True:
+            t0 = time()
+            try:
+                r = next(g)
+            except StopIteration:
+                stats.add(stage, time() - t0, 0)
+                return
+            stats.add(stage, time() - t0, 1, size(a, r) if size else 0)
+            yield r
+    return timed
+
+
+@contextmanager
+def timing(callback=None):
+    """
+    Context manager timing the registered functions. Returns Stats instance,
+    see also Stats.callback.
+
+    Contexts cannot be nested.
+    """
+    global _active
+    if _active is not None:
+        raise RuntimeError('timing() is already active')
+    _active = stats = Stats(callback)
+    try:
+        yield stats
+    finally:
+        _active = None
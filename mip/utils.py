@@ -1,5 +1,7 @@
 import re
 
+re_newline = re.compile('[\r\n]+')
+
 
 def shorten(s, N=80):
     """
@@ -16,8 +18,7 @@ def newlineindex(mlstring, start=0):
     """
     Return two indices, for the end of the 1-st line and start of the next one.
     """
-    r = re.compile('[\r\n]+')
-    m = r.search(mlstring, start)
+    m = re_newline.search(mlstring, start)
     return m.start(), m.end()
 
 
@@ -29,7 +30,59 @@ def nol(txt, start=None, end=None):
         start = 0
     if end is None:
         end = len(txt)
-    if '\r' in txt:
-        return txt.count('\r', start, end) + 1
+    if txt.find('\r') >= 0:
+        return count(txt, '\r', start, end) + 1
     else:
-        return txt.count('\n', start, end) + 1
+        return count(txt, '\n', start, end) + 1
+
+
+def count(txt, sub, start=0, end=None, chunk=2**20):
+    """
+    Return number of occurences of `sub` in txt[start:end].
+
+    Unlike str.count(), works also for buffers that have no count() method,
+    e.g. mmap objects. These are processed in chunks of `chunk` characters,
+    thus the whole text is never copied at once.
+    """
+    if end is None:
+        end = len(txt)
+    if hasattr(txt, 'count'):
+        return txt.count(sub, start, end)
+    n = 0
+    while start < end:
+        # chunks overlap by len(sub) - 1 chars, to catch sub on the boundary
+        e = min(start + chunk, end)
+        n += txt[start:e].count(sub)
+        if e == end:
+            break
+        start = e - len(sub) + 1
+    return n
+
+
+def iterlines(txt, start=0, end=None):
+    """
+    Generator, returns lines of txt[start:end] together with their positions.
+
+    For each line, a tuple (line, s, e) is returned, where line is the line
+    without new-line characters, s is the index of its 1-st character in txt
+    and e is the index where the next line starts. Both '\n' and '\r\n'
+    new-lines are recognized.
+
+    Only the current line is copied from txt, therefore txt can be a large
+    buffer, e.g. an mmap object.
+    """
+    if end is None:
+        end = len(txt)
+    s = start
+    while s < end:
+        i = txt.find('\n', s, end)
+        if i < 0:
+            i = end
+            e = end
+        else:
+            e = i + 1
+        l = txt[s:i]
+        if l[-1:] == '\r':
+            l = l[:-1]
+        yield l, s, e
+        s = e
@@ -0,0 +1,40 @@
+import sys
+import unittest
+from os import path
+
+import numpy as np
+
+root = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, path.join(root, 'geom'))
+
+from bbox import get_boxes, quadric_region, is_finite
+from parsegeom import get_ast
+from quadrics import get_quadric
+
+
+class BoxesTest(unittest.TestCase):
+    cells = {1: get_ast('-1 2'), 2: get_ast('-3 -4'), 3: get_ast('1 : -2')}
+    surfs = {1: ('', '', 'so', [5.0]), 2: ('', '', 'pz', [1.0]),
+             3: ('', '', 'cz', [2.0]), 4: ('', '', 'p', [1.0, 1.0, 0.0, 0.0])}
+
+    def test_workers(self):
+        a = get_boxes(self.cells, self.surfs, {})
+        b = get_boxes(self.cells, self.surfs, {}, workers=2)
+        self.assertEqual(a.keys(), b.keys())
+        for k in a:
+            np.testing.assert_array_equal(a[k][0], b[k][0])
+            np.testing.assert_array_equal(a[k][1], b[k][1])
+        np.testing.assert_allclose(a[1][0], (-5, -5, 1))
+        np.testing.assert_allclose(a[1][1], (5, 5, 5))
+        self.assertFalse(is_finite(a[3]))
+
+    def test_no_optimize(self):
+        # Paraboloid x^2 + y^2 - z <= 0
+        Q = get_quadric('gq', [1, 1, 0, 0, 0, 0, 0, 0, -1, 0])[0]
+        (lo, hi), N, d = quadric_region(Q, optimize=False)
+        self.assertFalse(np.isfinite(lo).any() or np.isfinite(hi).any())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import sys
+import unittest
+from os import path
+
+root = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, root)
+
+from mip.blocks import bid, get_block_positions, get_block_positions_re
+
+deck = """message: o=out
+ r=runtpe
+
+title line
+1 0 -1
+2 0 1
+
+1 so 2
+
+m1 1001 1
+nps 10
+"""
+
+
+def blocks(text, firstblock=None):
+    """
+    Return block texts and their first line numbers, without '\r'.
+    """
+    res = {}
+    for k, ((ps, pe), line) in get_block_positions(text, firstblock).items():
+        res[k] = text[ps:pe].replace('\r', ''), line
+    return res
+
+
+class BlocksTest(unittest.TestCase):
+    def test_examples(self):
+        for name in ('simple1.inp', 'simple3.inp', 'bp.inp', 'fmr.inp'):
+            text = open(path.join(root, 'examples', name)).read()
+            self.assertEqual(get_block_positions(text),
+                             get_block_positions_re(text))
+
+    def test_message(self):
+        res = blocks(deck)
+        self.assertEqual(sorted(res), ['c', 'd', 'm', 's', 't'])
+        self.assertEqual(res['m'], ('message: o=out\n r=runtpe\n', 1))
+        self.assertEqual(res['t'], ('title line', 4))
+        self.assertEqual(res['c'], ('1 0 -1\n2 0 1\n', 5))
+        self.assertEqual(res['s'], ('1 so 2\n', 8))
+        self.assertEqual(res['d'], ('m1 1001 1\nnps 10\n', 10))
+        self.assertEqual(get_block_positions(deck),
+                         get_block_positions_re(deck))
+
+    def test_crlf(self):
+        # Blank lines can contain spaces and '\r'
+        for text in (deck, deck.replace('\n\n', '\n  \n'), deck.rstrip()):
+            self.assertEqual(blocks(text.replace('\n', '\r\n')),
+                             blocks(text))
+
+    def test_firstblock(self):
+        text = 'm1 1001 1\nnps 10\n'
+        self.assertEqual(blocks(text), {'d': (text, 1)})
+        text = '1 so 2\n\nm1 1001 1\n'
+        self.assertEqual(blocks(text, bid.s),
+                         {'s': ('1 so 2\n', 1), 'd': ('m1 1001 1\n', 3)})
+        # Text after the data block is ignored
+        text = deck.replace('nps 10\n', 'nps 10\n\nnotes\n')
+        self.assertEqual(blocks(text), blocks(deck))
+
+
+if __name__ == '__main__':
+    unittest.main()
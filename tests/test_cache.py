@@ -0,0 +1,62 @@
+import shutil
+import sys
+import tempfile
+import unittest
+from os import path
+
+root = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, path.join(root, 'geom'))
+
+from mip import MIP
+from mip.timing import timing
+from main import get_raw_geom, get_geom
+
+fname = path.join(root, 'examples', 'simple3.inp')
+
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cachedir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cachedir)
+
+    def test_file_name(self):
+        ref = get_raw_geom(MIP(fname))
+        self.assertEqual(get_raw_geom(fname, cachedir=self.cachedir), ref)
+        self.assertEqual(get_raw_geom(fname, cachedir=self.cachedir), ref)
+
+    def test_card_splits(self):
+        ref = get_geom(MIP(fname))
+        self.assertEqual(get_geom(MIP(fname), cachedir=self.cachedir), ref)
+        # A new result entry, card splits are restored from the input entry
+        i = MIP(fname)
+        with timing() as stats:
+            r = get_raw_geom(i, lim=1, cachedir=self.cachedir)
+        self.assertEqual(r, get_raw_geom(MIP(fname), lim=1))
+        self.assertNotIn('parts', stats.stages)
+        # Cards are not kept without reuse
+        self.assertIsNone(i._cards)
+        self.assertTrue(all(c._parts is None
+                            for c in i.cards(skipcomments=True)))
+
+    def test_result_hit(self):
+        get_geom(MIP(fname), cachedir=self.cachedir)
+        i = MIP(fname)
+        get_geom(i, cachedir=self.cachedir)
+        # The input entry is not loaded for a cached result
+        self.assertIsNone(i._index)
+        self.assertEqual(i._preset, {})
+
+    def test_reuse(self):
+        get_geom(MIP(fname), cachedir=self.cachedir)
+        i = MIP(fname, reuse=True)
+        get_raw_geom(i, lim=1, cachedir=self.cachedir)
+        with timing() as stats:
+            list(c.parts() for c in i.cards(skipcomments=True)
+                 if c.type in 'cs')
+        self.assertNotIn('parts', stats.stages)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import sys
+import tempfile
+import unittest
+from collections import OrderedDict
+from os import path
+
+root = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, path.join(root, 'geom'))
+
+from mip import MIP
+from cells import parse_options, resolve_like
+from main import get_raw_geom, get_geom
+
+deck = """like test
+1 1 -2.5 -1 imp:n=1 u=2
+2 like 1 but mat=3 rho=-1.0 trcl=(1 0 0)
+3 like 2 but imp:n=4
+4 0 1 imp:n=0
+5 like 1 but mat=0
+
+1 so 1
+
+"""
+
+
+class LikeTest(unittest.TestCase):
+    def test_options(self):
+        self.assertEqual(parse_options('imp:n,p=1 fill=2 (1 0 0) *trcl 3'),
+                         OrderedDict([('imp:n,p', ['1']),
+                                      ('fill', ['2', '(1 0 0)']),
+                                      ('*trcl', ['3'])]))
+        self.assertRaises(ValueError, parse_options, '1 imp:n=1')
+
+    def test_resolve(self):
+        fd, fname = tempfile.mkstemp(suffix='.inp')
+        os.write(fd, deck)
+        os.close(fd)
+        self.addCleanup(os.remove, fname)
+        cells = get_raw_geom(MIP(fname))[0]
+        self.assertEqual(cells, OrderedDict([
+            (1, (' 1 -2.5', ' -1 ', 'imp:n=1 u=2')),
+            (2, (' 3 -1.0', ' -1 ', 'imp:n=1 u=2 trcl=(1 0 0)')),
+            (3, (' 3 -1.0', ' -1 ', 'imp:n=4 u=2 trcl=(1 0 0)')),
+            (4, (' 0', ' 1 ', 'imp:n=0')),
+            (5, (' 0', ' -1 ', 'imp:n=1 u=2'))]))
+        # The geometry is shared, not copied
+        for k in (2, 3, 5):
+            self.assertIs(cells[k][1], cells[1][1])
+        geom = get_geom(MIP(fname))[0]
+        for k in (2, 3, 5):
+            self.assertIs(geom[k], geom[1])
+
+    def test_errors(self):
+        cells = OrderedDict([(1, (' 0', '-1', '')),
+                             (2, ('', 'like 3 but', 'imp:n=1')),
+                             (3, ('', 'like 2 but', 'imp:n=1'))])
+        self.assertRaises(ValueError, resolve_like, cells)
+        cells[3] = ('', 'like 4 but', 'imp:n=1')
+        self.assertRaises(ValueError, resolve_like, cells)
+        del cells[2], cells[3]
+        self.assertIs(resolve_like(cells), cells)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,221 @@
+import copy
+import random
+import sys
+import unittest
+from collections import OrderedDict
+from os import path
+
+import numpy as np
+
+root = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, path.join(root, 'geom'))
+
+from forcad import translate, batch2cad, mcnp2cad, apply_transform
+from main import extract
+from mip import MIP
+from quadrics import get_quadric
+
+
+def exact(a):
+    """
+    Return a with numbers replaced by their float representation, to compare
+    results bit by bit.
+    """
+    if isinstance(a, (tuple, list)):
+        return tuple(map(exact, a))
+    if isinstance(a, str):
+        return a
+    return repr(float(a))
+
+
+def translate_each(surfaces, transform):
+    """
+    Translate surfaces one by one, with the scalar mcnp2cad functions.
+    """
+    res = surfaces.__class__()
+    for k, (bc, tr, stype, pl) in surfaces.items():
+        t, f, s, p = mcnp2cad[stype](pl)
+        if tr:
+            f, p = apply_transform(f, p, transform[int(tr)])
+        res[k] = t, f, s, p
+    return res
+
+
+class TranslateTest(unittest.TestCase):
+    def check(self, surfaces, transforms):
+        ref = translate_each(surfaces, transforms)
+        orig = copy.deepcopy(transforms)
+        res = translate(surfaces, transforms)
+        self.assertEqual(type(res), type(surfaces))
+        self.assertEqual(res.keys(), ref.keys())
+        # Results are identical, not only close
+        for k in ref:
+            self.assertEqual(exact(res[k]), exact(ref[k]))
+        self.assertEqual(transforms, orig)
+
+    def test_examples(self):
+        for name in ('simple3.inp', 'fmr.inp'):
+            d = extract(MIP(path.join(root, 'examples', name)))
+            self.check(d['surfaces'], d['transforms'])
+
+    def test_random(self):
+        rnd = random.Random(1)
+        trans = {}
+        for j in range(1, 6):
+            trans[j] = ([rnd.uniform(-100, 100) for i in range(3)] +
+                        [rnd.uniform(-1, 1) for i in range(9)])
+        surfs = OrderedDict()
+        types = sorted(batch2cad)
+        for j in range(1, 2001):
+            t = types[j % len(types)]
+            pl = [rnd.uniform(0.1, 100) for i in range(batch2cad[t][0])]
+            if t[0] == 't':
+                pl[5] = pl[4]
+            tr = str(j % 5 + 1) if j % 3 == 0 else ''
+            surfs[j] = ('', tr, t, pl)
+        self.check(surfs, trans)
+
+    def test_invalid(self):
+        # Invalid parameters, also those giving nan in the batched functions,
+        # raise the errors of the scalar functions
+        for t, good, bad, err in (
+                ('tz', [0, 0, 0, 5, 1, 1], [0, 0, 0, 5, 1, 2],
+                 NotImplementedError),
+                ('sx', [1, 2], [1], IndexError),
+                ('p', [1, 0, 0, 1], [0, 0, 0, 1], ZeroDivisionError)):
+            self.assertRaises(err, mcnp2cad[t], bad)
+            surfs = {1: ('', '', t, good), 2: ('', '', t, bad)}
+            self.assertRaises(err, translate, surfs, {})
+
+
+def gq_params(Q):
+    """
+    Return parameters of the gq card for the quadric matrix Q.
+    """
+    return [Q[0, 0], Q[1, 1], Q[2, 2], 2*Q[0, 1], 2*Q[1, 2], 2*Q[0, 2],
+            2*Q[0, 3], 2*Q[1, 3], 2*Q[2, 3], Q[3, 3]]
+
+
+def paraboloid(a, b):
+    """
+    Quadric x^2/a + y^2/b = z. Zero b means the parabolic cylinder.
+    """
+    Q = np.diag((1.0/a, 1.0/b if b else 0.0, 0, 0))
+    Q[2, 3] = Q[3, 2] = -0.5
+    return Q
+
+
+def canonical(t, x, y, s):
+    """
+    Return local coordinates of points of the canonical surface of type t
+    with parameters s (see the forcad docstring), for parameters x and y.
+    """
+    if t == 'e':
+        return (s[0]*np.cos(x)*np.sin(y), s[1]*np.sin(x)*np.sin(y),
+                s[2]*np.cos(y))
+    elif t == 'h' and s[3] == 1:
+        return (s[0]*np.cosh(y)*np.cos(x), s[1]*np.cosh(y)*np.sin(x),
+                s[2]*np.sinh(y))
+    elif t == 'h':
+        return (s[0]*np.sinh(y)*np.cos(x), s[1]*np.sinh(y)*np.sin(x),
+                s[2]*np.cosh(y))
+    elif t == 'ke':
+        return s[0]*y*np.cos(x), s[1]*y*np.sin(x), y
+    elif t == 'ce':
+        return s[0]*np.cos(x), s[1]*np.sin(x), y
+    elif t == 'ch':
+        return s[0]*np.cosh(y), s[1]*np.sinh(y), x
+    elif t == 'pe':
+        return x, y, x**2/s[0] + y**2/s[1]
+    elif t == 'ph':
+        return x, y, x**2/s[0] - y**2/s[1]
+    elif t == 'pc':
+        return x, y, x**2/s[0]
+
+
+class QuadricTest(unittest.TestCase):
+    # Local quadrics in cm, their types and parameters in m (sorted, except
+    # the last two of hyperboloids)
+    cases = [
+        (np.diag((1/36., 1/9., 1/4., -1)), 'e', (0.02, 0.03, 0.06)),
+        (np.diag((1/16., 1/9., -1/4., -1)), 'h', (0.03, 0.04, 0.02, 1)),
+        (np.diag((1/16., 1/9., -1/4., 1)), 'h', (0.03, 0.04, 0.02, 2)),
+        (np.diag((1/4., 1, -1, 0)), 'ke', (1, 2)),
+        (np.diag((1/25., 1/4., 0, -1)), 'ce', (0.02, 0.05)),
+        (np.diag((1/25., -1/4., 0, -1)), 'ch', (0.02, 0.05)),
+        (paraboloid(4, 2), 'pe', (0.02, 0.04)),
+        (paraboloid(4, -2), 'ph', (0.02, 0.04)),
+        (paraboloid(4, 0), 'pc', (0.04, )),
+        (np.diag((1, 1, 1, -9)), 's', (0.03, )),
+        (np.diag((1, 1, 0, -9)), 'c', (0.03, )),
+    ]
+
+    def setUp(self):
+        # Rotation and shift, x_local = R^T (x - x0)
+        a, b = 0.3, 1.1
+        R = np.array([[np.cos(a), -np.sin(a), 0], [np.sin(a), np.cos(a), 0],
+                      [0, 0, 1]]).dot(
+            [[1, 0, 0], [0, np.cos(b), -np.sin(b)], [0, np.sin(b), np.cos(b)]])
+        self.x0 = np.array([3.0, -2.0, 7.0])
+        self.H = np.eye(4)
+        self.H[:3, :3] = R.T
+        self.H[:3, 3] = -R.T.dot(self.x0)
+
+    def f(self, Q, x):
+        x = np.atleast_2d(x)
+        x = np.column_stack((x, np.ones(len(x))))
+        return (x.dot(Q) * x).sum(axis=1)
+
+    def test_types(self):
+        grid = np.linspace(0.1, 1.3, 7)
+        for Ql, t, srf in self.cases:
+            Q = self.H.T.dot(Ql).dot(self.H)
+            p = gq_params(Q)
+            np.testing.assert_allclose(get_quadric('gq', p)[0], Q)
+            res = mcnp2cad['gq'](p)
+            self.assertEqual(res[0], t)
+            # Inside point
+            self.assertLess(self.f(Q, np.array(res[3])*1e2)[0], 0)
+            if t in ('s', 'c'):
+                # Center of the sphere or a point on the axis of the cylinder
+                np.testing.assert_allclose(res[2], srf)
+                d = self.x0/1e2 - res[1][0]
+                if t == 'c':
+                    d = np.cross(d, res[1][1])
+                np.testing.assert_allclose(d, 0, atol=1e-12)
+                continue
+            x0, w, u = map(np.array, res[1])
+            v = np.cross(w, u)
+            np.testing.assert_allclose(np.dot([w, u, v], np.transpose(
+                [w, u, v])), np.eye(3), atol=1e-12)
+            s = res[2]
+            if t == 'h':
+                self.assertEqual(s[3], srf[3])
+                np.testing.assert_allclose(sorted(s[:2]) + [s[2]], srf[:3])
+            else:
+                np.testing.assert_allclose(sorted(s), srf)
+            # Points of the canonical surface in the frame satisfy the
+            # equation of the quadric
+            X, Y, Z = canonical(t, grid[:, np.newaxis], grid, s)
+            X, Y, Z = np.broadcast_arrays(X, Y, Z)
+            x = (x0 + X.reshape(-1, 1)*u + Y.reshape(-1, 1)*v +
+                 Z.reshape(-1, 1)*w) * 1e2
+            np.testing.assert_allclose(self.f(Q, x), 0, atol=1e-7)
+
+    def test_sq(self):
+        # Ellipsoid (x - 1)^2/36 + (y - 2)^2/9 + (z - 3)^2/4 = 1
+        res = mcnp2cad['sq']([1/36., 1/9., 1/4., 0, 0, 0, -1, 1, 2, 3])
+        self.assertEqual(res[0], 'e')
+        np.testing.assert_allclose(res[1][0], (0.01, 0.02, 0.03))
+        np.testing.assert_allclose(sorted(res[2]), (0.02, 0.03, 0.06))
+
+    def test_degenerate(self):
+        for Q in (np.diag((1, -1, 0, 0)), np.diag((1, 1, 1, 1)),
+                  np.diag((0, 0, 0, 1))):
+            self.assertRaises(NotImplementedError, mcnp2cad['gq'],
+                              gq_params(Q))
+
+
+if __name__ == '__main__':
+    unittest.main()
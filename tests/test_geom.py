@@ -0,0 +1,62 @@
+import os
+import sys
+import tempfile
+import unittest
+from os import path
+
+root = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, path.join(root, 'geom'))
+
+from mip import MIP
+from main import get_geom
+
+deck = """parallel test
+1 0 -1 imp:n=1
+2 0 -2 1 imp:n=1
+3 0 -3 2 imp:n=1
+4 like 2 but imp:n=2
+5 0 -3 2 imp:n=1
+6 0 3 imp:n=0
+
+1 so 1
+2 so 2
+3 so 3
+4 so 4
+
+"""
+
+
+class ParallelTest(unittest.TestCase):
+    def mip(self, text):
+        fd, fname = tempfile.mkstemp(suffix='.inp')
+        os.write(fd, text)
+        os.close(fd)
+        self.addCleanup(os.remove, fname)
+        return MIP(fname)
+
+    def test_workers(self):
+        for i in (self.mip(deck), MIP(path.join(root, 'examples', 'bp.inp'))):
+            ref = get_geom(i)
+            for workers in (2, 3):
+                self.assertEqual(get_geom(i, workers=workers), ref)
+
+    def test_shared(self):
+        for workers in (None, 2):
+            cells, surfs, trans = get_geom(self.mip(deck), workers=workers)
+            self.assertEqual(list(cells), [1, 2, 3, 4, 5, 6])
+            self.assertIs(cells[4], cells[2])
+            self.assertIs(cells[5], cells[3])
+            # Surface 4 is not used in cells
+            self.assertEqual(sorted(surfs), [1, 2, 3])
+
+    def test_error(self):
+        i = self.mip(deck.replace('5 0 -3 2', '5 0 -3 (2'))
+        for workers in (None, 2):
+            with self.assertRaises(ValueError) as e:
+                get_geom(i, workers=workers)
+            self.assertIn('Cell 5 on line 6', str(e.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
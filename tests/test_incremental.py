@@ -0,0 +1,71 @@
+import os
+import sys
+import tempfile
+import unittest
+from os import path
+
+root = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, path.join(root, 'geom'))
+
+from mip import MIP
+from main import get_geom
+from incremental import update_geom
+
+deck = open(path.join(root, 'examples', 'simple3.inp')).read()
+
+# Cell 3 and surface 1 are modified, cell 7 (like 3) and surface 6 are added,
+# tr4 is removed
+edited = deck.replace(
+    '3 0     -4 -3  imp:n=1', '3 0     -4 -3 -6 imp:n=1'
+).replace(
+    '6 0      4     imp:n=0', '6 0      4     imp:n=0\n7 like 3 but imp:n=2'
+).replace(
+    '1 1 so 1', '1 1 so 1.5\n6 pz 3'
+).replace('tr4 2.5 0 0 \n', '')
+
+
+class UpdateTest(unittest.TestCase):
+    def mip(self, text):
+        fd, fname = tempfile.mkstemp(suffix='.inp')
+        os.write(fd, text)
+        os.close(fd)
+        self.addCleanup(os.remove, fname)
+        return MIP(fname)
+
+    def test_update(self):
+        i = self.mip(deck)
+        res = update_geom(i)
+        self.assertEqual(res[:3], get_geom(i))
+        state = res[3]
+        self.assertEqual(res[4]['c']['added'], [1, 2, 3, 4, 5, 6])
+
+        i = self.mip(edited)
+        cells, surfs, trans, new, changes = update_geom(i, state)
+        self.assertEqual((cells, surfs, trans), get_geom(i))
+        self.assertEqual(list(cells), [1, 2, 3, 4, 5, 6, 7])
+        self.assertIs(cells[7], cells[3])
+        self.assertEqual(changes['c'], {'added': [7], 'removed': [],
+                                        'modified': [3]})
+        self.assertEqual(changes['s'], {'added': [6], 'removed': [],
+                                        'modified': [1]})
+        self.assertEqual(changes['d'], {'added': [], 'removed': [('tr', 4)],
+                                        'modified': []})
+        # Unchanged cards are not parsed again
+        self.assertIs(new.cards['c', 4], state.cards['c', 4])
+        self.assertIsNot(new.cards['c', 3], state.cards['c', 3])
+
+    def test_same(self):
+        i = self.mip(deck)
+        res = update_geom(i)
+        cells, surfs, trans, new, changes = update_geom(i, res[3])
+        self.assertEqual((cells, surfs, trans), res[:3])
+        for b in 'csd':
+            self.assertEqual(changes[b], {'added': [], 'removed': [],
+                                          'modified': []})
+        self.assertTrue(all(new.cards[k] is res[3].cards[k]
+                            for k in new.cards))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import os
+import sys
+import tempfile
+import unittest
+from os import path
+
+root = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, path.join(root, 'geom'))
+
+from mip import MIP
+from main import extract, extractors, material_extractor, get_raw_geom
+
+deck = """title
+1 1 -1.0 -1 imp:n=1
+2 0 1 imp:n=0
+
+1 so 5
+
+m1 1001.80c 2 8016.80c 1 nlib=80c
+{}
+"""
+
+
+class MaterialsTest(unittest.TestCase):
+    def mip(self, m2):
+        fd, fname = tempfile.mkstemp(suffix='.inp')
+        os.write(fd, deck.format(m2))
+        os.close(fd)
+        self.addCleanup(os.remove, fname)
+        return MIP(fname)
+
+    def test_extract(self):
+        i = self.mip('m2 26000 1')
+        d = extract(i, extractors=extractors + [material_extractor])
+        self.assertEqual(d['materials'].keys(), [1, 2])
+        comp, opts = d['materials'][1]
+        self.assertEqual(comp, [('1001.80c', 2.0), ('8016.80c', 1.0)])
+        self.assertEqual(opts, {'nlib': '80c'})
+        self.assertNotIn('materials', extract(i))
+
+    def test_bad_card(self):
+        for m2 in ('m2 26000 1 26000', 'm2 26000 x', 'm2 26000 1 nlib='):
+            i = self.mip(m2)
+            self.assertRaises(ValueError, extract, i,
+                              extractors=extractors + [material_extractor])
+            # Not parsed for the geometry
+            self.assertEqual(get_raw_geom(i)[1].keys(), [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import sys
+import unittest
+from os import path
+
+root = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, root)
+
+from mip import MIP
+
+fname = path.join(root, 'examples', 'simple3.inp')
+
+
+def summary(c):
+    """
+    Return attributes of card c, that must not depend on how it was read.
+    """
+    if c.type == 'cmnt':
+        return c.position, c.type, c.lines
+    return c.position, c.type, c.lines, c.content(), c.parts()
+
+
+class MmapTest(unittest.TestCase):
+    def test_cards(self):
+        for name in ('simple3.inp', 'fmr.inp'):
+            f = path.join(root, 'examples', name)
+            a = MIP(f)
+            b = MIP(f, mmap=True)
+            self.assertEqual(a.bi, b.bi)
+            self.assertEqual(b.text[:], a.text)
+            for skip in (False, True):
+                self.assertEqual(map(summary, a.cards(skipcomments=skip)),
+                                 map(summary, b.cards(skipcomments=skip)))
+            for bid in a.bi:
+                self.assertEqual(a.block(bid), b.block(bid))
+                l, v = b.view(bid)
+                self.assertEqual((l, str(v)), a.block(bid))
+
+    def test_lazy_lines(self):
+        i = MIP(fname, mmap=True)
+        c = next(i.cards(blocks='s', skipcomments=True))
+        self.assertIsNone(c._lines)
+        self.assertEqual(c.span, (c.start, c.end))
+        self.assertEqual(''.join(c.lines), i.text[c.start:c.end])
+        c.lines = ['1 so 2']
+        self.assertEqual(c.parts(), ('1', '', 'so', '2'))
+
+
+class ReuseTest(unittest.TestCase):
+    def test_default(self):
+        i = MIP(fname, mmap=True)
+        a = list(i.cards())
+        b = list(i.cards())
+        self.assertEqual([c.content() for c in a], [c.content() for c in b])
+        self.assertFalse(any(x is y for x, y in zip(a, b)))
+
+    def test_reuse(self):
+        i = MIP(fname, reuse=True)
+        a = list(i.cards())
+        self.assertTrue(all(x is y for x, y in zip(a, i.cards())))
+        i.invalidate()
+        self.assertFalse(any(x is y for x, y in zip(a, i.cards())))
+
+
+def name(c):
+    """
+    Return the index name of card c, found from its parts.
+    """
+    p = c.parts()
+    if c.type == 'd':
+        return p[1].lstrip('*').lower(), int(p[0]) if p[0] else None
+    return int(p[0])
+
+
+class IndexTest(unittest.TestCase):
+    def test_cards(self):
+        for f in ('simple3.inp', 'fmr.inp'):
+            i = MIP(path.join(root, 'examples', f))
+            # Number of lines, including comment lines inside cards
+            nlines = dict((c.span, len(c.lines)) for c in i.cards())
+            cards = {}
+            for c in i.cards(skipcomments=True):
+                cards.setdefault((c.type, name(c)), c)
+            index = i.index()
+            self.assertIs(i.index(), index)
+            self.assertEqual(sorted(index.rows), sorted(cards))
+            for (b, n), c in cards.items():
+                self.assertEqual(summary(i.card(b, n)), summary(c))
+                s, e, l, nl = index[b, n]
+                self.assertEqual(((s, e), l, nl),
+                                 (c.span, c.position, nlines[c.span]))
+
+    def test_access(self):
+        i = MIP(fname, mmap=True)
+        c = i.cell(4)
+        self.assertIsNone(c._lines)
+        self.assertEqual(c.parts()[:2], ('4', ' 1 -1'))
+        self.assertEqual(i.surface(3).parts()[2:], ('c/y', '-4 0 1.2'))
+        self.assertEqual(i.data('TR', 2).parts()[:2], ('2', '*tr'))
+        self.assertEqual(i.data('print').position, 21)
+        self.assertRaises(KeyError, i.cell, 7)
+        self.assertRaises(KeyError, i.data, 'm', 3)
+
+
+class CardTableTest(unittest.TestCase):
+    def test_columns(self):
+        i = MIP(fname)
+        for skip in (False, True):
+            t = i.card_table(skipcomments=skip)
+            cards = list(i.cards(skipcomments=skip))
+            self.assertEqual(len(t), len(cards))
+            self.assertEqual([t.types[k] for k in t.type],
+                             [c.type for c in cards])
+            self.assertEqual(list(t.start), [c.span[0] for c in cards])
+            self.assertEqual(list(t.line), [c.position for c in cards])
+            self.assertEqual(t.type.itemsize, 1)
+        names = list(t.names())
+        self.assertEqual(names[:6], [1, 2, 3, 4, 5, 6])
+        self.assertEqual(names[-4:], [('tr', 4), ('m', 1), ('m', 2),
+                                      ('print', None)])
+        self.assertEqual(t.dtype.count(t.dtypes.index('m')), 2)
+        self.assertEqual(sorted(i.index().keys()),
+                         sorted(zip(t.block, names)))
+
+
+if __name__ == '__main__':
+    unittest.main()
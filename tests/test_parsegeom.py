@@ -0,0 +1,79 @@
+import sys
+import unittest
+from os import path
+
+root = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, path.join(root, 'geom'))
+
+import parsegeom
+from parsegeom import get_ast, parse
+from semantics import Surface, Cell
+
+
+def tree(e):
+    """
+    Return expression as nested tuples of str and int.
+    """
+    if isinstance(e, Cell):
+        return '#' + e
+    if isinstance(e, Surface):
+        return int(e)
+    return (e[0], tree(e[1]), tree(e[2]))
+
+
+class ParseTest(unittest.TestCase):
+    def check(self, geom, ref):
+        self.assertEqual(tree(parse(geom)), ref)
+
+    def test_precedence(self):
+        self.check('1 -2 : 3', (':', ('*', 1, -2), 3))
+        self.check('1 : -2 3', (':', 1, ('*', -2, 3)))
+        self.check('1:2:3', (':', (':', 1, 2), 3))
+        self.check('1 2 3', ('*', ('*', 1, 2), 3))
+        self.check('1 (2 : 3)', ('*', 1, (':', 2, 3)))
+        self.check('(1 : 2) : (3 4)', (':', (':', 1, 2), ('*', 3, 4)))
+        self.check('+1', 1)
+
+    def test_implicit_intersection(self):
+        # No delimiter between operands, or spaces around parentheses
+        for g in ('1(2:3)-4', '1 ( 2 : 3 ) -4', ' 1 (2:3) -4 '):
+            self.check(g, ('*', ('*', 1, (':', 2, 3)), -4))
+        self.check('(1:2)(3:4)', ('*', (':', 1, 2), (':', 3, 4)))
+        self.check('1#2', ('*', 1, '#2'))
+
+    def test_complements(self):
+        self.check('#5', '#5')
+        self.check('-1 #5 # 6', ('*', ('*', -1, '#5'), '#6'))
+        self.check('#(1 -2)', (':', -1, 2))
+        self.check('# ( 1 : (2 -3) )', ('*', -1, (':', -2, 3)))
+        self.check('#(-4)', 4)
+        self.check('1 #(2:3)', ('*', 1, ('*', -2, -3)))
+
+    def test_long(self):
+        # Deep nesting and long expressions do not hit the recursion limit
+        n = 5000
+        e = parse('(' * n + '1' + ')' * n)
+        self.assertEqual(e, 1)
+        e = parse(' '.join(str(i) for i in range(1, n)))
+        self.assertEqual(e[2], n - 1)
+
+    def test_malformed(self):
+        for g in ('', '1 :', ': 1', '1 :: 2', '(1 2', '1 2)', '()', '1 ( )',
+                  '#', '#(', '1 x', '1 * 2', '1.5'):
+            self.assertRaises(ValueError, parse, g)
+
+    def test_like(self):
+        self.assertEqual(get_ast('like 5 but'), '5')
+
+    def test_no_tatsu(self):
+        tatsu = parsegeom.tatsu
+        parsegeom.tatsu = None
+        try:
+            self.assertRaises(ImportError, parsegeom.get_ast_tatsu, '1 -2')
+        finally:
+            parsegeom.tatsu = tatsu
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import sys
+import unittest
+from os import path
+
+root = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, path.join(root, 'geom'))
+
+from plot import parse_plot
+
+
+class ParsePlotTest(unittest.TestCase):
+    def test_keep_origin(self):
+        r = parse_plot('or 1 2 3 ext 50\npz 7\npx 4 ext 10 20\n')
+        self.assertEqual(r[0]['or'], (1.0, 2.0, 3.0))
+        self.assertEqual(r[0]['ext'], (50.0, 50.0))
+        self.assertEqual(r[1]['or'], (1.0, 2.0, 7.0))
+        self.assertEqual(r[1]['bas'], (1.0, 0.0, 0.0, 0.0, 1.0, 0.0))
+        self.assertEqual(r[2]['or'], (4.0, 2.0, 7.0))
+        self.assertEqual(r[2]['bas'], (0.0, 1.0, 0.0, 0.0, 0.0, 1.0))
+        self.assertEqual(r[2]['ext'], (10.0, 20.0))
+
+    def test_names(self):
+        ref = parse_plot('or 1 2 3 bas 0 1 0 0 0 1 ext 5 &\n  6\n')
+        for text in ('ORIGIN 1 2 3 basis 0 1 0 0 0 1 extent 5 6',
+                     'orig 1 2 3 ba 0 1 0 0 0 1 ex 5 6'):
+            self.assertEqual(parse_plot(text), ref)
+
+    def test_sizes(self):
+        for text in ('or 1 2', 'bas 1 0 0 0 1', 'ext 1 2 3', 'or 1 2 3 4'):
+            self.assertRaises(ValueError, parse_plot, text)
+
+
+if __name__ == '__main__':
+    unittest.main()
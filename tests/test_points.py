@@ -0,0 +1,79 @@
+import sys
+import unittest
+from os import path
+
+import numpy as np
+
+root = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, path.join(root, 'geom'))
+
+from bbox import get_boxes
+from parsegeom import get_ast
+from cells import cell_universes
+from points import Locator, find_cells
+from spatial import GridIndex
+
+
+class IndexedFindTest(unittest.TestCase):
+    def setUp(self):
+        # Row of spheres sharing the outer cylinder surface
+        cells = {}
+        surfs = {100: ('', '', 'cx', [3.0])}
+        for i in range(1, 6):
+            surfs[i] = ('', '', 's', [10.0 * i, 0.0, 0.0, 2.0])
+            cells[i] = get_ast('-{} -100'.format(i))
+        cells[10] = get_ast(' '.join(str(i) for i in range(1, 6)) + ' -100')
+        cells[11] = get_ast('100')
+        self.locator = Locator(cells, surfs, {})
+        self.index = GridIndex.build(get_boxes(cells, surfs, {}))
+
+    def test_chunks(self):
+        p = np.random.RandomState(1).rand(1000, 3) * (60, 8, 8) - (0, 4, 4)
+        ref = self.locator.find(p)
+        self.assertEqual(set(ref.tolist()), set([1, 2, 3, 4, 5, 10, 11]))
+        for chunk in (7, 100, 2**16):
+            np.testing.assert_array_equal(
+                self.locator.find(p, chunk=chunk, index=self.index), ref)
+
+
+class BoundaryTest(unittest.TestCase):
+    def test_upper_face(self):
+        # Half sphere x <= 10, the upper x face of its box is the grid face
+        cells = {1: get_ast('2 -1'), 2: get_ast('1 : -2')}
+        surfs = {1: ('', '', 'so', [20.0]),
+                 2: ('', '', 'p', [-1.0, 0.0, 0.0, -10.0])}
+        boxes = get_boxes(cells, surfs, {})
+        self.assertEqual(boxes[1][1][0], 10.0)
+        index = GridIndex.build(boxes)
+        p = np.array([[10.0, 0.0, 0.0], [10.0, 20.0, 0.0], [41.0, 0.0, 0.0],
+                      [-20.0, 0.0, 0.0], [0.0, 0.0, 0.0]])
+        # The last voxel along x
+        self.assertEqual(index.voxels([p[0], (9.999, 0, 0), p[2]]).tolist(),
+                         index.voxels([(9.999, 0, 0)]).tolist() * 2 + [-1])
+        self.assertEqual(index.candidates(p[0]).tolist(), [1, 2])
+        locator = Locator(cells, surfs, {})
+        ref = locator.find(p)
+        self.assertEqual(ref.tolist(), [1, 2, 2, 2, 1])
+        np.testing.assert_array_equal(locator.find(p, index=index), ref)
+
+
+class UniversesTest(unittest.TestCase):
+    def test_real_world(self):
+        raw = {1: ('0', '-1', 'u=1 imp:n=1'), 2: ('0', '1', 'u=1 imp:n=1'),
+               3: ('0', '-3', 'fill=1 imp:n=1'), 4: ('0', '3', 'imp:n=0')}
+        surfs = {1: ('', '', 'so', [2.0]), 3: ('', '', 'so', [10.0])}
+        cells = dict((k, get_ast(v[1])) for k, v in raw.items())
+        p = [(0, 0, 0), (5, 0, 0), (20, 0, 0)]
+        self.assertEqual(find_cells(cells, surfs, {}, p).tolist(), [1, 2, 2])
+        u = cell_universes(raw)
+        self.assertEqual(u, {1: 1, 2: 1, 3: 0, 4: 0})
+        self.assertEqual(find_cells(cells, surfs, {}, p,
+                                    universes=u).tolist(), [3, 3, 4])
+        # Cells of filled universes are still found when asked for
+        locator = Locator(cells, surfs, {}, u)
+        self.assertEqual(locator.find(p, names=[1, 2]).tolist(), [1, 2, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import sys
+import unittest
+from os import path
+
+import numpy as np
+
+root = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, path.join(root, 'geom'))
+
+from quadrics import Shape
+
+
+class TorusTest(unittest.TestCase):
+    # Torus with major radius 5, axial semi-axis 1 and radial one 2, centered
+    # at (1, 2, 3).
+    center = np.array([1.0, 2.0, 3.0])
+
+    def check(self, stype, axis, tr=None):
+        e = np.eye(3)
+        a = e[axis]
+        r = e[(axis + 1) % 3]
+        s = e[(axis + 2) % 3]
+        local = np.array([5*r, -5*s, 5*r + 0.9*a, 6.9*r, 3.1*s,
+                          0*r, 5*r + 1.1*a, 7.1*r, 2.9*s, 10*a])
+        inside = [True] * 5 + [False] * 5
+        p = local + self.center
+        if tr is not None:
+            R = np.reshape(tr[3:], (3, 3))
+            p = p.dot(R) + tr[:3]
+        shape = Shape(stype, list(self.center) + [5.0, 1.0, 2.0], tr)
+        self.assertEqual(shape.sense(p).tolist(), inside)
+        self.assertTrue((shape.f(p)[:5] < 0).all())
+
+    def test_axes(self):
+        for axis, stype in enumerate(('tx', 'ty', 'tz')):
+            self.check(stype, axis)
+
+    def test_transformed(self):
+        c = np.cos(0.3)
+        s = np.sin(0.3)
+        tr = [10.0, -4.0, 2.0, c, s, 0.0, -s, c, 0.0, 0.0, 0.0, 1.0]
+        for axis, stype in enumerate(('tx', 'ty', 'tz')):
+            self.check(stype, axis, tr)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import sys
+import unittest
+from os import path
+
+import numpy as np
+
+root = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, path.join(root, 'geom'))
+
+from parsegeom import get_ast
+from raytrace import RayTracer
+
+
+class SegmentsTest(unittest.TestCase):
+    def setUp(self):
+        # Two concentric spheres
+        cells = {1: get_ast('-1'), 2: get_ast('1 -2'), 3: get_ast('2')}
+        surfs = {1: ('', '', 'so', [5.0]), 2: ('', '', 'so', [10.0])}
+        self.tracer = RayTracer(cells, surfs, {})
+
+    def test_tmax(self):
+        # No crossings before tmax
+        o = np.array([[0.0, 0.0, 0.0], [0.0, 0.0, 7.0], [0.0, 0.0, 7.0]])
+        d = np.array([[0.0, 0.0, 1.0], [0.0, 0.0, 1.0], [0.0, 0.0, -1.0]])
+        s = self.tracer.segments(o, d, tmax=1.5)
+        self.assertEqual(s.ray.tolist(), [0, 1, 2])
+        self.assertEqual(s.t2.tolist(), [1.5] * 3)
+
+        # Two crossings of the first ray, one of the others
+        s = self.tracer.segments(o, d, tmax=11.0)
+        self.assertEqual(s.ray.tolist(), [0, 0, 0, 1, 1, 2, 2])
+        self.assertEqual(s.cell.tolist(), [1, 2, 3, 2, 3, 2, 1])
+        np.testing.assert_allclose(s.t1, [0, 5, 10, 0, 3, 0, 2])
+        np.testing.assert_allclose(s.t2, [5, 10, 11, 3, 11, 2, 11])
+
+    def test_infinite(self):
+        s = self.tracer.segments((0, 0, 0), [[1.0, 0.0, 0.0]])
+        self.assertEqual(s.cell.tolist(), [1, 2, 3])
+        self.assertEqual(s.t2.tolist(), [5.0, 10.0, np.inf])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import pickle
+import sys
+import unittest
+from os import path
+
+import numpy as np
+
+root = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, path.join(root, 'geom'))
+
+from main import get_geom, extract_surfaces
+from parsegeom import get_ast
+from rpn import RPN, from_cells
+from semantics import Surface, Cell
+
+
+def contains(ast, sense, cells):
+    """
+    Evaluate the geometry tree recursively, as reference for RPN.contains().
+    """
+    if isinstance(ast, Surface):
+        v = sense(abs(ast))
+        return v if ast < 0 else ~v
+    elif isinstance(ast, Cell):
+        return ~cells(int(ast))
+    l = contains(ast[1], sense, cells)
+    r = contains(ast[2], sense, cells)
+    return l & r if ast[0] == '*' else l | r
+
+
+class RPNTest(unittest.TestCase):
+    def setUp(self):
+        rnd = np.random.RandomState(5)
+        values = {}
+
+        # Random results for 100 points, the same for repeated calls
+        def value(n):
+            if n not in values:
+                values[n] = rnd.rand(100) < 0.5
+            return values[n]
+        self.sense = lambda s: value(('s', s))
+        self.cells = lambda c: value(('c', c))
+
+    def check(self, ast):
+        r = RPN.from_tree(ast)
+        self.assertEqual(r.evaluate(), ast.evaluate())
+        self.assertEqual(r.to_tree(), ast)
+        self.assertEqual(r.surfaces(), extract_surfaces(ast))
+        ref = contains(ast, self.sense, self.cells)
+        np.testing.assert_array_equal(r.contains(self.sense, self.cells), ref)
+        np.testing.assert_array_equal(
+            r.complement().contains(self.sense, self.cells), ~ref)
+        self.assertEqual(pickle.loads(pickle.dumps(r, 2)), r)
+
+    def test_examples(self):
+        cells = get_geom(path.join(root, 'examples', 'bp.inp'))[0]
+        rpn = from_cells(cells)
+        self.assertEqual(list(rpn), list(cells))
+        for k, ast in cells.items():
+            self.check(ast)
+
+    def test_cells(self):
+        for g in ('1', '-1 2', '1 : -2 3', '-1 (2 : #3) #(4 -5)', '#7 : 8'):
+            self.check(get_ast(g))
+        r = RPN.from_tree(get_ast('-1 #3'))
+        self.assertEqual(r.cells(), set([3]))
+        self.assertEqual(r.surfaces(), set([1]))
+        # Complement of a cell complement is the cell itself
+        self.assertRaises(ValueError, r.complement().to_tree)
+
+    def test_long(self):
+        # Trees deeper than the recursion limit
+        g = ' : '.join(str(-i) for i in range(1, 3001))
+        r = RPN.from_tree(get_ast(g))
+        self.assertEqual(len(r), 5999)
+        self.assertEqual(r.surfaces(), set(range(1, 3001)))
+        self.assertTrue(r.contains(lambda s: s == 3000))
+        self.assertFalse(r.contains(lambda s: False))
+
+
+if __name__ == '__main__':
+    unittest.main()
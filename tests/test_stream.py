@@ -0,0 +1,76 @@
+import gzip
+import os
+import sys
+import tempfile
+import unittest
+from os import path
+
+root = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, root)
+
+from mip import MIP, read_cards, open_input
+from mip.blocks import bid
+
+fname = path.join(root, 'examples', 'simple3.inp')
+
+
+def summary(c):
+    """
+    Return attributes of card c, that must not depend on how it was read.
+    """
+    if c.type == 'cmnt':
+        return c.position, c.type, c.span, c.lines
+    return c.position, c.type, c.span, c.lines, c.content(), c.parts()
+
+
+class StreamTest(unittest.TestCase):
+    def tempfile(self, suffix):
+        fd, name = tempfile.mkstemp(suffix=suffix)
+        os.close(fd)
+        self.addCleanup(os.remove, name)
+        return name
+
+    def test_cards(self):
+        for name in ('simple3.inp', 'bp.inp', 'fmr.inp'):
+            f = path.join(root, 'examples', name)
+            i = MIP(f)
+            for blocks in ('csd', 's', 'cd'):
+                for skip in (False, True):
+                    self.assertEqual(
+                        map(summary, read_cards(open_input(f), blocks,
+                                                skipcomments=skip)),
+                        map(summary, i.cards(blocks, skipcomments=skip)))
+
+    def test_gzip(self):
+        gz = self.tempfile('.inp.gz')
+        f = gzip.open(gz, 'wb')
+        f.write(open(fname).read())
+        f.close()
+        self.assertEqual(map(summary, read_cards(open_input(gz))),
+                         map(summary, MIP(fname).cards()))
+
+    def test_crlf(self):
+        # Lines are the same, positions are shifted by the '\r' characters
+        f = self.tempfile('.inp')
+        open(f, 'wb').write(open(fname).read().replace('\n', '\r\n'))
+        a = list(read_cards(open_input(f), skipcomments=True))
+        b = list(MIP(fname).cards(skipcomments=True))
+        self.assertEqual([(c.position, c.type, c.lines) for c in a],
+                         [(c.position, c.type, c.lines) for c in b])
+        self.assertEqual([c.span[0] - c.position + 1 for c in a],
+                         [c.span[0] for c in b])
+
+    def test_firstblock(self):
+        text = 'mode n\nm1 1001 1\n\nnotes\n'
+        cards = list(read_cards(text.splitlines(True), firstblock=bid.d))
+        self.assertEqual([(c.position, c.type, c.lines) for c in cards],
+                         [(1, 'd', ['mode n']), (2, 'd', ['m1 1001 1'])])
+        # The message block
+        text = 'message: o=out\n\ntitle\n1 0 -1\n\n1 so 1\n\n'
+        cards = list(read_cards(text.splitlines(True)))
+        self.assertEqual([(c.position, c.type, c.lines) for c in cards],
+                         [(4, 'c', ['1 0 -1']), (6, 's', ['1 so 1'])])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import sys
+import unittest
+from os import path
+
+root = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, path.join(root, 'geom'))
+
+from mip import MIP
+from mip.timing import timing
+from main import get_geom
+from forcad import translate
+from parsegeom import get_ast
+
+fname = path.join(root, 'examples', 'simple3.inp')
+
+
+class TimingTest(unittest.TestCase):
+    def test_stages(self):
+        with timing() as stats:
+            i = MIP(fname)
+            cells, surfs, trans = get_geom(i)
+            translate(surfs, trans)
+        st = stats.stages
+        for s in ('file read', 'block split', 'card split', 'parts',
+                  'geometry parsing', 'CAD translation'):
+            self.assertIn(s, st)
+        self.assertEqual(st['file read'][:2], [1, len(i.text)])
+        self.assertEqual(st['geometry parsing'][0], len(cells))
+        self.assertEqual(st['CAD translation'][0], 1)
+        self.assertEqual(st['card split'][0],
+                         len(list(i.cards(skipcomments=True))))
+        self.assertIn('CAD translation', stats.report())
+
+    def test_inactive(self):
+        calls = []
+        with timing(lambda stage, dt, nbytes: calls.append(stage)):
+            get_ast('1 -2')
+        get_ast('1 -2')
+        self.assertEqual(calls, ['geometry parsing'])
+
+    def test_nested(self):
+        with timing():
+            def nested():
+                with timing():
+                    pass
+            self.assertRaises(RuntimeError, nested)
+
+
+if __name__ == '__main__':
+    unittest.main()
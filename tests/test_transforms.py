@@ -0,0 +1,51 @@
+import sys
+import unittest
+from os import path
+
+import numpy as np
+
+root = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, path.join(root, 'geom'))
+
+import transforms
+from transforms import Transform, compose, compose_inverse, identity
+
+
+def shift(x):
+    return Transform([x, 0, 0, 1, 0, 0, 0, 1, 0, 0, 0, 1])
+
+
+class ComposeTest(unittest.TestCase):
+    def setUp(self):
+        self.size = transforms._composed_max
+        transforms._composed_max = 10
+        transforms._composed.clear()
+
+    def tearDown(self):
+        transforms._composed_max = self.size
+        transforms._composed.clear()
+
+    def test_products(self):
+        c = np.cos(0.5)
+        s = np.sin(0.5)
+        rot = Transform([1, 2, 3, c, s, 0, -s, c, 0, 0, 0, 1])
+        t = compose(shift(1), rot, shift(2))
+        np.testing.assert_allclose(
+            t.matrix, shift(1).matrix.dot(rot.matrix).dot(shift(2).matrix))
+        np.testing.assert_allclose(compose(t, compose_inverse(t)).matrix,
+                                   identity.matrix, atol=1e-12)
+
+    def test_bounded(self):
+        a = shift(1)
+        first = compose(a, shift(0))
+        for x in range(2, 40):
+            compose(a, shift(x))
+            # Recently used products are kept
+            self.assertIs(compose(a, shift(2)), compose(a, shift(2)))
+        self.assertEqual(len(transforms._composed), 10)
+        self.assertNotIn((a, shift(0)), transforms._composed)
+        self.assertEqual(compose(a, shift(0)), first)
+
+
+if __name__ == '__main__':
+    unittest.main()
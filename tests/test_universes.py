@@ -0,0 +1,123 @@
+import os
+import sys
+import tempfile
+import unittest
+from os import path
+
+import numpy as np
+
+root = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, path.join(root, 'geom'))
+
+from mip import MIP
+from main import get_raw_geom
+from universes import Universes
+
+# Lattice of universes 1 and 2, and universe 2 filled into a transformed cell
+lattice = """lattice test
+1 0 -10 fill=1 imp:n=1
+2 0 10 imp:n=0
+3 0 -1 2 -3 4 u=1 lat=1 fill=0:1 0:1 0:0 2 2 2 1 imp:n=1
+4 1 -1.0 -20 u=2 imp:n=1
+5 0 20 u=2 imp:n=1
+6 0 -30 trcl=(50 0 0) fill=3 (1) imp:n=1
+7 0 -21 u=3 *fill=2 (0 0 0 90 0 90 180 90 90 90 90 0) imp:n=1
+8 0 21 u=3 imp:n=1
+
+10 so 20
+30 so 5
+1 {}
+2 {}
+3 {}
+4 {}
+20 so 0.5
+21 so 1
+
+tr1 0 0 1
+"""
+
+# Hexagonal lattice, the hexagon is stretched along y by `s`
+hexagonal = """hex test
+1 0 -10 fill=1 imp:n=1
+2 0 10 imp:n=0
+3 0 -1 2 -3 4 -5 6 -7 8 u=1 lat=2 fill=-1:1 -1:1 0:0 0 2 2 2 1 2 2 2 0
+4 0 -20 u=2 imp:n=1
+5 0 20 u=2 imp:n=1
+
+10 so 20
+1 px 1
+2 px -1
+3 p 0.5 {0} 0 1
+4 p 0.5 {0} 0 -1
+5 p -0.5 {0} 0 1
+6 p -0.5 {0} 0 -1
+7 pz 5
+8 pz -5
+20 so 0.5
+"""
+
+
+class UniversesTest(unittest.TestCase):
+    def universes(self, text):
+        fd, fname = tempfile.mkstemp(suffix='.inp')
+        os.write(fd, text)
+        os.close(fd)
+        self.addCleanup(os.remove, fname)
+        return Universes(*get_raw_geom(MIP(fname)))
+
+    def test_flatten(self):
+        u = self.universes(lattice.format('px 1', 'px -1', 'py 1', 'py -1'))
+        self.assertEqual(u.tree(), {0: [1, 3], 1: [2], 2: [], 3: [2]})
+        res = [(i.cell, i.index, tuple(np.round(i.transform[:3], 9)),
+                [(c, k) for c, k, t in i.path]) for i in u.instances()]
+        self.assertEqual(res, [
+            (4, None, (0, 0, 0), [(1, None), (3, (0, 0, 0))]),
+            (5, None, (0, 0, 0), [(1, None), (3, (0, 0, 0))]),
+            (4, None, (2, 0, 0), [(1, None), (3, (1, 0, 0))]),
+            (5, None, (2, 0, 0), [(1, None), (3, (1, 0, 0))]),
+            (4, None, (0, 2, 0), [(1, None), (3, (0, 1, 0))]),
+            (5, None, (0, 2, 0), [(1, None), (3, (0, 1, 0))]),
+            (3, (1, 1, 0), (2, 2, 0), [(1, None)]),
+            (2, None, (0, 0, 0), []),
+            (4, None, (50, 0, 1), [(6, None), (7, None)]),
+            (5, None, (50, 0, 1), [(6, None), (7, None)]),
+            (8, None, (50, 0, 1), [(6, None)])])
+        # *fill rotation: x of universe 2 is along y, y -- along -x
+        tr = [i.transform for i in u.instances() if i.path][-2].matrix
+        np.testing.assert_allclose(tr[:3, :2], [(0, -1), (1, 0), (0, 0)],
+                                   atol=1e-12)
+
+    def test_skewed(self):
+        # Parallelogram -1 < x < 1, -1 < y - x < 1
+        u = self.universes(lattice.format('px 1', 'px -1', 'p -1 1 0 1',
+                                          'p -1 1 0 -1'))
+        np.testing.assert_allclose(u.lattice_vectors(3),
+                                   [(2, 2, 0), (0, 2, 0), (0, 0, 0)],
+                                   atol=1e-12)
+
+    def test_parallel(self):
+        u = self.universes(lattice.format('px 1', 'px -1', 'px 3', 'px -3'))
+        self.assertRaises(ValueError, u.lattice_vectors, 3)
+
+    def test_hexagonal(self):
+        for s in (1.0, 2.0):
+            u = self.universes(hexagonal.format(0.75**0.5 / s))
+            np.testing.assert_allclose(
+                u.lattice_vectors(3),
+                [(2, 0, 0), (1, 3**0.5 * s, 0), (0, 0, 10)], atol=1e-12)
+            # Lattice element (0, 0, 0) is the lattice cell itself, its six
+            # neighbours are filled with universe 2
+            inst = list(u.instances())
+            self.assertEqual(len(inst), 14)
+            self.assertEqual([i.index for i in inst if i.cell == 3],
+                             [(0, 0, 0)])
+            h = 3**0.5 * s
+            t = sorted(tuple(np.round(i.transform[:2], 9)) for i in inst
+                       if i.cell == 4)
+            np.testing.assert_allclose(t, [(-2, 0), (-1, -h), (-1, h),
+                                           (1, -h), (1, h), (2, 0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
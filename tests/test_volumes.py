@@ -0,0 +1,38 @@
+import sys
+import unittest
+from os import path
+
+root = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, path.join(root, 'geom'))
+
+from parsegeom import get_ast
+from volumes import estimate_volumes
+
+
+class VolumesTest(unittest.TestCase):
+    cells = {1: get_ast('-1'), 2: get_ast('1 -2'), 3: get_ast('2')}
+    surfs = {1: ('', '', 'so', [5.0]), 2: ('', '', 'so', [8.0])}
+    region = ('box', (-10, -10, -10), (10, 10, 10))
+
+    def estimate(self, **kw):
+        return estimate_volumes(self.cells, self.surfs, {}, self.region,
+                                batch=1000, seed=3, **kw)
+
+    def test_workers(self):
+        # The stopping rule fires after 7 batches, not at a round boundary
+        ref = self.estimate(rel_err=0.045)
+        for w in (2, 3):
+            self.assertEqual(self.estimate(rel_err=0.045, workers=w), ref)
+        self.assertAlmostEqual(ref[1][0], 4./3 * 3.14159 * 125,
+                               delta=5 * ref[1][0] * ref[1][1])
+        self.assertLess(ref[1][1], 0.045)
+
+    def test_max_points(self):
+        r = self.estimate(rel_err=0.0, max_points=2500, workers=2)
+        self.assertEqual(r, self.estimate(rel_err=0.0, max_points=2500))
+        self.assertAlmostEqual(sum(v for v, e in r.values()), 8000.0)
+
+
+if __name__ == '__main__':
+    unittest.main()